@@ -2,7 +2,7 @@
 import eventlet
 eventlet.monkey_patch()
 
-from flask import Flask
+from flask import Flask, request
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, current_user
 from flask_migrate import Migrate
@@ -12,6 +12,7 @@ from app.utils import get_current_local_time, to_local_time
 from flask_socketio import SocketIO
 from flask_cors import CORS
 from flask_mail import Mail
+from werkzeug.local import LocalProxy
 
 db = SQLAlchemy()
 login_manager = LoginManager()
@@ -27,7 +28,7 @@ socketio = SocketIO(
     engineio_logger=True,
     ping_timeout=60,
     ping_interval=25,
-    max_http_buffer_size=1e8,
+    max_http_buffer_size=1e6,
     allow_upgrades=True,
     transports=['websocket', 'polling']
 )
@@ -52,12 +53,40 @@ def create_app(test_config=None):
     )
     
     app.config.update(
-        MAIL_SERVER='smtp.gmail.com',
-        MAIL_PORT=587,
-        MAIL_USE_TLS=True,
+        MAIL_SERVER=os.environ.get('MAIL_SERVER', 'smtp.gmail.com'),
+        MAIL_PORT=int(os.environ.get('MAIL_PORT', 587)),
+        MAIL_USE_TLS=os.environ.get('MAIL_USE_TLS', 'true').lower() == 'true',
         MAIL_USERNAME='k.ganda@alustudent.com',    
         MAIL_PASSWORD=os.environ.get('MAIL_PASSWORD'),
         MAIL_DEFAULT_SENDER='k.ganda@alustudent.com',
+        # Email outbox dispatcher (see app/email_outbox.py)
+        MAIL_OUTBOX_INTERVAL=5,
+        MAIL_OUTBOX_BATCH_SIZE=20,
+        MAIL_OUTBOX_MAX_ATTEMPTS=5,
+        MAIL_OUTBOX_BACKOFF=30,
+        MAIL_DEDUPE_WINDOW=600,
+        # bed_stats_update coalescing, in seconds (see app/bed_updates.py)
+        BED_UPDATE_WINDOW=0.15,
+        BED_UPDATE_MAX_LATENCY=0.5,
+        # Serve MessagePack to Socket.IO clients that ask for it (see app/socket_codec.py)
+        SOCKETIO_MSGPACK=True,
+        # Per-connection send queue bounds (see app/socket_backpressure.py)
+        SOCKETIO_MAX_QUEUE=200,
+        SOCKETIO_SUPERSEDED_EVENTS=('bed_stats_update',),
+        SOCKETIO_MAX_HTTP_BUFFER_SIZE=1_000_000,
+        # Referral events kept per hospital for reconnect replay (see app/event_replay.py)
+        REPLAY_BUFFER_SIZE=100,
+        # Staff presence per hospital (see app/presence.py); share it when running several workers
+        PRESENCE_SHARED=os.environ.get('PRESENCE_SHARED', 'false').lower() == 'true',
+        PRESENCE_HEARTBEAT_INTERVAL=15,
+        PRESENCE_WARMUP=30,
+        # Most hospitals one multicast referral is offered to at once
+        REFERRAL_MULTICAST_MAX=3,
+        # Accepted referrals hold a bed this long, in seconds (see app/bed_reservations.py)
+        BED_RESERVATION_TTL=7200,
+        BED_RESERVATION_SWEEP_INTERVAL=60,
+        # Bearer token for scraping /metrics; without it only logged-in admins can read it
+        METRICS_TOKEN=os.environ.get('METRICS_TOKEN'),
     )
     
     # Initialize extensions
@@ -66,6 +95,7 @@ def create_app(test_config=None):
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
     mail.init_app(app)
+    from app.socket_backpressure import BackpressureManager
     socketio.init_app(
         app, 
         cors_allowed_origins="*", 
@@ -74,7 +104,10 @@ def create_app(test_config=None):
         engineio_logger=True,
         ping_timeout=60,
         ping_interval=25,
-        max_http_buffer_size=1e8,
+        max_http_buffer_size=app.config['SOCKETIO_MAX_HTTP_BUFFER_SIZE'],
+        client_manager=BackpressureManager(
+            max_queue=app.config['SOCKETIO_MAX_QUEUE'],
+            superseded_events=app.config['SOCKETIO_SUPERSEDED_EVENTS']),
         allow_upgrades=True,
         transports=['websocket', 'polling']
     )
@@ -90,7 +123,8 @@ def create_app(test_config=None):
         if current_user.is_authenticated and hasattr(current_user, 'get_type'):
             return {
                 'current_user_type': current_user.get_type(),
-                'current_user_hospital': current_user.get_hospital()
+                # Only hits the database if a template actually uses it
+                'current_user_hospital': LocalProxy(current_user.get_hospital)
             }
         return {}
 
@@ -116,49 +150,77 @@ def create_app(test_config=None):
         app.register_blueprint(referral_bp, url_prefix='/referrals')
         app.register_blueprint(transfer_bp, url_prefix='/transfers')
         
+        # Password hashing runs on its own worker pool (see app/passwords.py)
+        from app.passwords import configure_password_hashing
+        configure_password_hashing(app)
+        
+        # Flask-Login serves current_user from a short-TTL snapshot cache (see app/identity.py)
+        from app.identity import identity_cache
+        identity_cache.ttl = app.config.get('IDENTITY_CACHE_TTL', 30)
+        
+        # In-memory hospital metadata, invalidated through cache_versions (see app/hospital_registry.py)
+        from app.hospital_registry import init_hospital_registry
+        init_hospital_registry(app)
+        
+        # Version counters behind the ETags of the polled JSON APIs (see app/cache_versions.py)
+        from app.cache_versions import init_cache_versions
+        init_cache_versions(app)
+        
+        # Merge bursts of bed changes into one bed_stats_update broadcast
+        from app.bed_updates import init_bed_updates
+        init_bed_updates(app)
+        
+        # Per-hospital history of referral events for reconnect replay
+        from app.event_replay import init_event_replay
+        init_event_replay(app)
+        
+        # Connected staff per hospital, used to route urgent referrals
+        from app.presence import init_presence
+        init_presence(app)
+        
+        # Fingerprinted, precompressed static assets (see app/assets.py)
+        from app.assets import init_assets
+        init_assets(app)
+        
+        # Request, SQL and template timing metrics (served at /metrics)
+        from app.metrics import init_metrics
+        init_metrics(app)
+        
         # Test route for WebSocket connectivity
         @app.route('/test-websocket')
         def test_websocket():
             return {'status': 'WebSocket server is running'}
         
-        # WebSocket event handlers
+        # WebSocket event handlers. Only logged-in users may connect; every
+        # broadcast comes from the server (see app/socket_auth.py)
         @socketio.on('connect')
-        def handle_connect():
-            print('Client connected')
-            socketio.emit('connected', {'data': 'Connected'})
+        def handle_connect(auth=None):
+            from app.socket_auth import authenticate_connection
+            from app.socket_codec import negotiate
+            from app.presence import presence
+            identity = authenticate_connection()
+            if identity is None:
+                return False
+            presence.connect(request.sid, identity['hospital_id'])
+            serializer = negotiate(auth, identity['hospital_id'])
+            app.logger.debug(f"Socket.IO client connected: {identity['user_id']} ({serializer})")
         
         @socketio.on('disconnect')
         def handle_disconnect():
-            print('Client disconnected')
+            from app.presence import presence
+            presence.disconnect(request.sid)
+            app.logger.debug('Socket.IO client disconnected')
         
         @socketio.on('error')
         def handle_error(error):
             print(f'WebSocket error: {error}')
         
-        # Handle bed stats updates
-        @socketio.on('bed_stats_update')
-        def handle_bed_stats_update(data):
-            socketio.emit('bed_stats_update', data)
-        
-        # Handle transfer status updates
-        @socketio.on('transfer_status_update')
-        def handle_transfer_status_update(data):
-            socketio.emit('transfer_status_update', data)
-        
-        # Handle new referrals
-        @socketio.on('new_referral')
-        def handle_new_referral(data):
-            socketio.emit('new_referral', data)
-        
-        # Handle referral responses
-        @socketio.on('referral_response')
-        def handle_referral_response(data):
-            socketio.emit('referral_response', data)
-        
-        # Handle referral escalations
-        @socketio.on('referral_escalated')
-        def handle_referral_escalated(data):
-            socketio.emit('referral_escalated', data)
+        # Reconnecting clients catch up on the referral events they missed
+        @socketio.on('replay')
+        def handle_replay(last_seen):
+            from app.event_replay import replay_buffer
+            from app.socket_auth import socket_identity
+            return replay_buffer.reply(socket_identity()['hospital_id'], last_seen)
         
         # Global context processor for all templates
         @app.context_processor
@@ -176,54 +238,30 @@ def create_app(test_config=None):
 
             return dict(get_greeting=get_greeting, current_datetime=current_datetime)
         
-        # Initialize database (skip for test configurations)
+        # Schema setup is the one-time `flask init-db` command; boot only checks the revision
+        from app.schema import check_schema_version, register_schema_commands
+        register_schema_commands(app)
+        if test_config is None:
+            check_schema_version(app)
+        
+        # Watch for code that blocks the eventlet hub (skip for test configurations)
         if test_config is None:
-            _initialize_database(app)
+            from app.hub_monitor import start_hub_monitor
+            start_hub_monitor(app)
+        
+        # Deliver queued emails in the background (skip for test configurations)
+        if test_config is None:
+            from app.email_outbox import start_email_dispatcher
+            start_email_dispatcher(app)
+        
+        # Release expired bed reservations in the background (skip for test configurations)
+        if test_config is None:
+            from app.bed_reservations import start_reservation_sweeper
+            start_reservation_sweeper(app)
+        
+        # Publish presence for the other workers (skip for test configurations)
+        if test_config is None:
+            from app.presence import start_presence_heartbeat
+            start_presence_heartbeat(app)
 
     return app
-
-def _initialize_database(app, reset=False):
-    """Initialize or update the PostgreSQL database."""
-    from flask_migrate import init, migrate, upgrade
-    from app.models import Hospital, Admin
-    import shutil
-    import os
-
-    try:
-        # Migration setup (same as before)
-        migrations_path = os.path.join(os.getcwd(), 'migrations')
-        if reset and os.path.exists(migrations_path):
-            shutil.rmtree(migrations_path)
-
-        if not os.path.exists(migrations_path):
-            init(directory=migrations_path)
-
-        # migrate(message='Initial migration', directory=migrations_path)
-        # upgrade(directory=migrations_path)
-        #migrate(message='Initial migration', directory=migrations_path)
-        #upgrade(directory=migrations_path)
-
-        # Create tables
-        db.create_all()
-
-        # Check if system hospital exists before creating
-        if not Hospital.query.filter_by(name="System Hospital").first():
-            hospital = Hospital(name="System Hospital", verification_code="SYSADMIN")
-            db.session.add(hospital)
-            db.session.commit()
-
-            # Only create admin if it doesn't exist
-            if not Admin.query.first():
-                admin = Admin(
-                    hospital_id=hospital.id,
-                    email="admin@icuconnect.com",
-                    privilege_level="super"
-                )
-                admin.set_password("temp1234")
-                db.session.add(admin)
-                db.session.commit()
-
-    except Exception as e:
-        db.session.rollback()
-        app.logger.error(f"Database initialization error: {str(e)}")
-        raise
@@ -0,0 +1,65 @@
+"""Fingerprinted static assets built by scripts/build_assets.py.
+
+Templates call ``asset_url('js/admissions.js')`` (or ``asset_urls`` for a
+bundle) instead of ``url_for('static', ...)``. Built files live under
+/static/dist/ with a content hash in their name and are served precompressed
+with a one-year ``immutable`` Cache-Control, so repeat page loads make no
+asset requests at all.
+
+With ASSETS_USE_SOURCES (default: on in debug mode), or for names missing
+from the manifest, the helpers point at the original files instead, so
+edits show up without rebuilding.
+"""
+import json
+import mimetypes
+import os
+
+from flask import current_app, url_for
+
+from app.precompressed import send_precompressed
+
+DIST_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'dist')
+
+_manifest = None
+
+
+def asset_manifest():
+    global _manifest
+    if _manifest is None:
+        try:
+            with open(os.path.join(DIST_DIR, 'manifest.json')) as f:
+                _manifest = json.load(f)
+        except FileNotFoundError:
+            current_app.logger.warning("No asset manifest; run scripts/build_assets.py. Serving source files.")
+            _manifest = {'files': {}, 'bundles': {}}
+    return _manifest
+
+
+def _use_sources():
+    return current_app.config.get('ASSETS_USE_SOURCES', current_app.debug)
+
+
+def asset_urls(name):
+    """URLs to load for a logical asset name: one fingerprinted file, or a bundle's sources"""
+    manifest = asset_manifest()
+    built = manifest['files'].get(name)
+    if built and not _use_sources():
+        return [url_for('asset', filename=built)]
+    return [url_for('static', filename=source) for source in manifest['bundles'].get(name, [name])]
+
+
+def asset_url(name):
+    """Fingerprinted URL of a single (non-bundle) asset"""
+    return asset_urls(name)[0]
+
+
+def serve_asset(filename):
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    return send_precompressed(DIST_DIR, filename, mimetype, immutable=True)
+
+
+def init_assets(app):
+    """Register the /static/dist route and the asset_url/asset_urls template globals."""
+    app.add_url_rule('/static/dist/<path:filename>', 'asset', serve_asset)
+    app.add_template_global(asset_url)
+    app.add_template_global(asset_urls)
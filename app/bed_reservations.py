@@ -0,0 +1,135 @@
+"""Timed bed holds for accepted referrals.
+
+Accepting a referral used to mark a bed occupied straight away; if the
+patient never arrived the bed stayed taken until somebody noticed. Now the
+accepting hospital's bed is *reserved* for the referral until
+BED_RESERVATION_TTL seconds have passed:
+
+* ``reserve_bed`` holds the first available bed (``reserved_until`` and
+  ``reserved_for_referral_id``); the hold is converted into an occupied bed
+  when the transferred patient is admitted into it (``occupy_bed``).
+* ``Bed.available_filter`` treats an expired hold as free the moment it
+  expires, so capacity never depends on the sweeper running.
+* ``ReservationSweeper`` clears expired holds every
+  BED_RESERVATION_SWEEP_INTERVAL seconds with one UPDATE over the
+  ``reserved_until`` index, bumps the ``beds:<hospital>`` versions the bulk
+  update bypasses, and publishes a bed update for the hospitals affected.
+
+Bed aggregates report available, reserved and occupied beds separately.
+"""
+import logging
+from datetime import datetime, timedelta
+
+import eventlet
+from sqlalchemy import case, func, update
+
+from app import db
+from app.bed_updates import bed_updates
+from app.cache_versions import bump_versions
+from app.metrics import registry
+from app.models import Bed
+
+logger = logging.getLogger(__name__)
+
+bed_reservations = registry.counter(
+    'icuconnect_bed_reservations_total',
+    'Bed holds for accepted referrals by outcome (reserved, admitted, expired)',
+    labels=('outcome',))
+
+
+def bed_counts(hospital_ids=None):
+    """Total, available and reserved beds per hospital in one query (occupied is the rest)."""
+    now = datetime.utcnow()
+    query = db.session.query(
+        Bed.hospital_id,
+        func.count(Bed.id),
+        func.sum(case((Bed.available_filter(now), 1), else_=0)),
+        func.sum(case((Bed.reserved_filter(now), 1), else_=0))
+    )
+    if hospital_ids is not None:
+        query = query.filter(Bed.hospital_id.in_(hospital_ids))
+    return {hospital_id: {'total': total, 'available': available or 0, 'reserved': reserved or 0}
+            for hospital_id, total, available, reserved in query.group_by(Bed.hospital_id).all()}
+
+
+def reserve_bed(hospital_id, referral_id, ttl, now=None):
+    """Hold the first available bed at hospital_id for a referral; returns it, or None when full."""
+    now = now or datetime.utcnow()
+    bed = Bed.query.filter(Bed.hospital_id == hospital_id, Bed.available_filter(now)).order_by(
+        Bed.bed_number).with_for_update(skip_locked=True).first()
+    if bed is None:
+        return None
+    bed.reserved_until = now + timedelta(seconds=ttl)
+    bed.reserved_for_referral_id = referral_id
+    bed_reservations.inc(outcome='reserved')
+    return bed
+
+
+def reserved_bed_for(referral_id):
+    """The bed still held for a referral, if its hold has not expired"""
+    return Bed.query.filter(Bed.reserved_for_referral_id == referral_id, Bed.reserved_filter()).first()
+
+
+def occupy_bed(bed):
+    """Mark a bed occupied, turning any hold on it into the admission."""
+    if bed.is_reserved:
+        bed_reservations.inc(outcome='admitted')
+    bed.is_occupied = True
+    bed.reserved_until = None
+    bed.reserved_for_referral_id = None
+
+
+def release_expired(now=None):
+    """Clear every expired hold in one statement; returns the ids of the hospitals affected."""
+    now = now or datetime.utcnow()
+    expired = Bed.reserved_until <= now
+    hospital_ids = [row[0] for row in db.session.query(Bed.hospital_id).filter(expired).distinct()]
+    if not hospital_ids:
+        return []
+    released = db.session.execute(
+        update(Bed).where(expired).values(reserved_until=None, reserved_for_referral_id=None),
+        execution_options={'synchronize_session': False}).rowcount
+    bump_versions(db.session.connection(), db.session, *(f'beds:{hospital_id}' for hospital_id in hospital_ids))
+    db.session.commit()
+    bed_reservations.inc(released, outcome='expired')
+    logger.info(f"Released {released} expired bed reservation(s) at hospitals {hospital_ids}")
+    return hospital_ids
+
+
+class ReservationSweeper:
+    """Releases expired bed holds in the background"""
+
+    def __init__(self, interval=60):
+        self.interval = interval
+        self._running = False
+
+    def start(self, app):
+        if self._running:
+            return
+        self._running = True
+        eventlet.spawn(self._run, app)
+
+    def stop(self):
+        self._running = False
+
+    def _run(self, app):
+        while self._running:
+            with app.app_context():
+                try:
+                    for hospital_id in release_expired():
+                        bed_updates.publish(hospital_id)
+                except Exception:
+                    db.session.rollback()
+                    logger.exception("Bed reservation sweep failed")
+                finally:
+                    db.session.remove()
+            eventlet.sleep(self.interval)
+
+
+reservation_sweeper = ReservationSweeper()
+
+
+def start_reservation_sweeper(app):
+    """Release expired bed reservations in the background."""
+    reservation_sweeper.interval = app.config.get('BED_RESERVATION_SWEEP_INTERVAL', reservation_sweeper.interval)
+    reservation_sweeper.start(app)
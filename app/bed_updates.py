@@ -0,0 +1,139 @@
+"""Coalesced ``bed_stats_update`` broadcasts.
+
+Every admission, discharge and accepted referral changes bed counts, and
+each used to broadcast a full map snapshot to every client immediately.
+During a mass-casualty intake that is dozens of broadcasts (and browser map
+re-renders) a minute. Routes now call ``bed_updates.publish(hospital_id)``;
+changes are collected for BED_UPDATE_WINDOW seconds after the last one and
+flushed as a single event, and never held longer than BED_UPDATE_MAX_LATENCY
+after the first. The snapshot is built once per flush:
+
+    {'hospital_stats': [{'hospital_id', 'total_beds', 'available_beds'}, ...],
+     'hospitals': [{'id', 'name', 'lat', 'lng', 'level', 'beds', 'available'}, ...]}
+
+``hospital_stats`` lists each hospital that changed during the window.
+A window of 0 flushes inline, inside the publishing request.
+"""
+import logging
+import threading
+import time
+
+import eventlet
+
+from app.metrics import registry
+from app.socket_codec import broadcast
+
+logger = logging.getLogger(__name__)
+
+bed_update_events = registry.counter(
+    'icuconnect_bed_update_events_total',
+    'Bed updates published by routes (merged) and bed_stats_update broadcasts sent (emitted)',
+    labels=('outcome',))
+
+
+def bed_snapshot(changed_ids):
+    """Build a bed_stats_update payload: per-hospital counts plus the map pins."""
+    from app.hospital_registry import hospital_registry
+    from app.bed_reservations import bed_counts
+    from app.presence import presence
+    hospitals = hospital_registry.all()
+    counts_by_hospital = bed_counts([h.id for h in hospitals])
+    empty = {'total': 0, 'available': 0, 'reserved': 0}
+    hospitals_data = []
+    for h in hospitals:
+        counts = counts_by_hospital.get(h.id, empty)
+        hospitals_data.append({
+            'id': h.id,
+            'name': h.name,
+            'lat': h.latitude,
+            'lng': h.longitude,
+            'level': h.level,
+            'beds': counts['total'],
+            'available': counts['available'],
+            'reserved': counts['reserved'],
+            'staff_online': presence.online_count(h.id)
+        })
+    hospital_stats = []
+    for hospital_id in sorted(changed_ids):
+        counts = counts_by_hospital.get(hospital_id, empty)
+        hospital_stats.append({
+            'hospital_id': hospital_id,
+            'total_beds': counts['total'],
+            'available_beds': counts['available'],
+            'reserved_beds': counts['reserved'],
+        })
+    return {'hospital_stats': hospital_stats, 'hospitals': hospitals_data}
+
+
+class BedUpdateCoalescer:
+    """Merges bed changes per hospital and flushes them as one broadcast"""
+
+    def __init__(self, window=0.15, max_latency=0.5, emit=None):
+        self.window = window
+        self.max_latency = max_latency
+        self.emit = emit
+        self._app = None
+        self._pending = set()
+        self._first_at = None
+        self._last_at = None
+        self._lock = threading.Lock()
+
+    def configure(self, app):
+        self._app = app
+        self.window = app.config.get('BED_UPDATE_WINDOW', self.window)
+        self.max_latency = app.config.get('BED_UPDATE_MAX_LATENCY', self.max_latency)
+
+    def publish(self, hospital_id):
+        """Record a bed change; the broadcast follows within max_latency seconds."""
+        bed_update_events.inc(outcome='merged')
+        if self.window <= 0:
+            self._send({hospital_id})
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._pending.add(hospital_id)
+            self._last_at = now
+            start = self._first_at is None
+            if start:
+                self._first_at = now
+        if start:
+            eventlet.spawn(self._wait_and_flush)
+
+    def _deadline(self):
+        return min(self._last_at + self.window, self._first_at + self.max_latency)
+
+    def _wait_and_flush(self):
+        # Each publish pushes the deadline back, up to first + max_latency
+        while True:
+            with self._lock:
+                if self._first_at is None:  # already flushed explicitly
+                    return
+                delay = self._deadline() - time.monotonic()
+            if delay <= 0:
+                break
+            eventlet.sleep(delay)
+        self.flush()
+
+    def flush(self):
+        """Broadcast everything pending now."""
+        with self._lock:
+            changed, self._pending = self._pending, set()
+            self._first_at = self._last_at = None
+        if not changed:
+            return
+        try:
+            with self._app.app_context():
+                self._send(changed)
+        except Exception:
+            logger.exception("Failed to broadcast bed updates")
+
+    def _send(self, changed):
+        (self.emit or broadcast)('bed_stats_update', bed_snapshot(changed))
+        bed_update_events.inc(outcome='emitted')
+
+
+bed_updates = BedUpdateCoalescer()
+
+
+def init_bed_updates(app):
+    bed_updates.configure(app)
@@ -0,0 +1,151 @@
+"""Shared version counters (the ``cache_versions`` table) and conditional GETs.
+
+Mapper events bump a named counter in the same flush as the change it
+describes: ``beds:<hospital>``, ``admissions:<hospital>``,
+``transfers:<hospital>``, ``settings:user:<user>``, ``bed_capacity`` (beds
+added or removed anywhere) and ``hospitals`` (see app/hospital_registry.py).
+
+``VersionTracker`` keeps a process-local copy of all counters, reloaded in a
+single query at most every ETAG_VERSION_CHECK_INTERVAL seconds and right
+after this process commits a change. ``conditional`` turns those versions
+into an ETag for a GET view and answers ``304 Not Modified`` without running
+the view - or touching the database - when the client's copy is current.
+"""
+import hashlib
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, request
+from flask_login import current_user
+from sqlalchemy import event, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, object_session
+
+from app import db
+from app.models import Admission, Bed, CacheVersion, PatientTransfer, UserSettings
+
+_UPSERTS = {'postgresql': postgresql_insert, 'sqlite': sqlite_insert}
+
+
+def bump_versions(connection, session, *names):
+    """Increment the named counters on the flush connection, creating them as needed."""
+    table = CacheVersion.__table__
+    upsert = _UPSERTS.get(connection.dialect.name)
+    for name in names:
+        if upsert is not None:
+            statement = upsert(table).values(name=name, version=1)
+            connection.execute(statement.on_conflict_do_update(
+                index_elements=[table.c.name], set_={'version': table.c.version + 1}))
+        elif connection.execute(
+                update(table).where(table.c.name == name).values(version=table.c.version + 1)).rowcount == 0:
+            connection.execute(table.insert().values(name=name, version=1))
+    if session is not None:
+        session.info.setdefault('bumped_versions', set()).update(names)
+
+
+class VersionTracker:
+    """Process-local copy of cache_versions, refreshed at most every check_interval seconds"""
+
+    def __init__(self, check_interval=2):
+        self.check_interval = check_interval
+        self._versions = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def get(self, *names):
+        """Return the current version of each name (0 if it was never bumped)."""
+        now = time.monotonic()
+        if self._loaded_at is None or now - self._loaded_at >= self.check_interval:
+            rows = db.session.execute(select(CacheVersion.name, CacheVersion.version)).all()
+            with self._lock:
+                self._versions = dict(rows)
+                self._loaded_at = now
+        versions = self._versions
+        return tuple(versions.get(name, 0) for name in names)
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+
+version_tracker = VersionTracker()
+
+
+def conditional(*version_names, refresh_every=None):
+    """Serve a GET view with an ETag built from version counters, answering 304 when unchanged.
+
+    Each entry of version_names is a counter name or a callable returning
+    one, evaluated per request (e.g. lambda: f'beds:{current_user.hospital_id}').
+    The ETag also covers the endpoint, query string and logged-in user.
+    Views whose body also depends on the clock pass refresh_every (seconds)
+    so the ETag changes at least that often.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+            names = [name() if callable(name) else name for name in version_names]
+            digest = hashlib.sha1(repr((
+                request.endpoint,
+                sorted(request.args.items(multi=True)),
+                current_user.get_id() if current_user.is_authenticated else None,
+                version_tracker.get(*names),
+                int(time.time() // refresh_every) if refresh_every else None,
+            )).encode('utf-8')).hexdigest()
+
+            if digest in request.if_none_match:
+                response = current_app.response_class(status=304)
+            else:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(digest)
+            # Cached by the browser but always revalidated
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
+
+
+def _bump_bed(mapper, connection, target):
+    bump_versions(connection, object_session(target), f'beds:{target.hospital_id}', 'bed_capacity')
+
+
+def _bump_bed_status(mapper, connection, target):
+    bump_versions(connection, object_session(target), f'beds:{target.hospital_id}')
+
+
+def _bump_admission(mapper, connection, target):
+    bump_versions(connection, object_session(target), f'admissions:{target.hospital_id}')
+
+
+def _bump_transfer(mapper, connection, target):
+    bump_versions(connection, object_session(target),
+                  f'transfers:{target.from_hospital_id}', f'transfers:{target.to_hospital_id}')
+
+
+def _bump_settings(mapper, connection, target):
+    bump_versions(connection, object_session(target), f'settings:user:{target.user_id}')
+
+
+def _refresh_on_commit(session):
+    if session.info.pop('bumped_versions', None):
+        version_tracker.invalidate()
+
+
+def init_cache_versions(app):
+    """Register the version-bumping listeners and apply config."""
+    version_tracker.check_interval = app.config.get('ETAG_VERSION_CHECK_INTERVAL', 2)
+    if event.contains(Session, 'after_commit', _refresh_on_commit):
+        return
+    event.listen(Bed, 'after_insert', _bump_bed)
+    event.listen(Bed, 'after_delete', _bump_bed)
+    event.listen(Bed, 'after_update', _bump_bed_status)
+    for model, listener in ((Admission, _bump_admission), (PatientTransfer, _bump_transfer),
+                            (UserSettings, _bump_settings)):
+        for identifier in ('after_insert', 'after_update', 'after_delete'):
+            event.listen(model, identifier, listener)
+    event.listen(Session, 'after_commit', _refresh_on_commit)
@@ -0,0 +1,175 @@
+"""Persistent email outbox and background dispatcher.
+
+Request handlers only insert a row into ``email_outbox``; a dispatcher
+greenlet delivers pending rows in batches over a single SMTP connection, so
+response times no longer depend on the mail server. Failed deliveries are
+retried with exponential backoff, and identical messages queued within the
+dedupe window are dropped.
+
+The transport is anything with Flask-Mail's ``connect()`` interface. The
+default is the app's Flask-Mail instance; point MAIL_SERVER/MAIL_PORT at a
+local debugging server (e.g. ``python -m aiosmtpd -n -l localhost:1025``)
+during development, or pass a recording transport in tests.
+"""
+import hashlib
+import logging
+from datetime import datetime, timedelta
+
+import eventlet
+from eventlet.queue import Empty, LightQueue
+from flask_mail import Message
+
+from app import db
+from app.metrics import registry
+from app.models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+emails_sent = registry.counter('icuconnect_emails_sent_total', 'Emails delivered by the outbox dispatcher')
+email_failures = registry.counter(
+    'icuconnect_email_failures_total', 'Failed email delivery attempts', labels=('final',))
+
+
+def _dedupe_key(subject, recipients, body, html):
+    digest = hashlib.sha256()
+    for part in (subject, ','.join(sorted(recipients)), body, html or ''):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def enqueue_email(subject, recipients, body, html=None, dedupe_window=None):
+    """Queue an email for background delivery.
+
+    Returns the outbox row, or None when an identical email was already
+    queued within the dedupe window.
+    """
+    from flask import current_app
+    if dedupe_window is None:
+        dedupe_window = current_app.config.get('MAIL_DEDUPE_WINDOW', 600)
+    key = _dedupe_key(subject, recipients, body, html)
+    cutoff = datetime.utcnow() - timedelta(seconds=dedupe_window)
+    duplicate = EmailOutbox.query.filter(
+        EmailOutbox.dedupe_key == key,
+        EmailOutbox.created_at >= cutoff,
+        EmailOutbox.status != 'failed'
+    ).first()
+    if duplicate:
+        logger.info(f"Skipping duplicate email '{subject}' (outbox id {duplicate.id})")
+        return None
+
+    email = EmailOutbox(
+        subject=subject,
+        recipients=','.join(recipients),
+        body=body,
+        html=html,
+        dedupe_key=key
+    )
+    db.session.add(email)
+    db.session.commit()
+    email_dispatcher.notify()
+    return email
+
+
+class EmailDispatcher:
+    """Delivers queued emails in batches with retry and backoff"""
+
+    def __init__(self, interval=5, batch_size=20, max_attempts=5, backoff=30):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.transport = None
+        self._wakeup = LightQueue(maxsize=1)
+        self._running = False
+
+    def notify(self):
+        """Wake the dispatcher so newly queued mail goes out without waiting a full interval."""
+        if self._running and self._wakeup.qsize() == 0:
+            self._wakeup.put_nowait(True)
+
+    def start(self, app):
+        if self._running:
+            return
+        self._running = True
+        eventlet.spawn(self._run, app)
+
+    def stop(self):
+        self._running = False
+        self.notify()
+
+    def _run(self, app):
+        while self._running:
+            with app.app_context():
+                try:
+                    while self.dispatch_batch() == self.batch_size:
+                        pass
+                except Exception:
+                    db.session.rollback()
+                    logger.exception("Email dispatch failed")
+                finally:
+                    db.session.remove()
+            try:
+                self._wakeup.get(timeout=self.interval)
+            except Empty:
+                pass
+
+    def dispatch_batch(self):
+        """Send one batch of due emails over a single connection; returns the batch size."""
+        from app import mail
+        transport = self.transport or mail
+        now = datetime.utcnow()
+        batch = EmailOutbox.query.filter(
+            EmailOutbox.status == 'pending',
+            EmailOutbox.next_attempt_at <= now
+        ).order_by(EmailOutbox.next_attempt_at).limit(self.batch_size).with_for_update(skip_locked=True).all()
+        if not batch:
+            return 0
+
+        handled = set()
+        try:
+            with transport.connect() as connection:
+                for email in batch:
+                    try:
+                        connection.send(Message(
+                            email.subject, recipients=email.recipient_list, body=email.body, html=email.html))
+                    except Exception as e:
+                        self._record_failure(email, e)
+                    else:
+                        email.status = 'sent'
+                        email.sent_at = datetime.utcnow()
+                        email.attempts += 1
+                        emails_sent.inc()
+                    handled.add(email.id)
+        except Exception as e:
+            # Could not connect (or the connection dropped): retry everything not yet attempted
+            for email in batch:
+                if email.id not in handled:
+                    self._record_failure(email, e)
+
+        db.session.commit()
+        return len(batch)
+
+    def _record_failure(self, email, error):
+        email.attempts += 1
+        email.last_error = str(error)
+        if email.attempts >= self.max_attempts:
+            email.status = 'failed'
+            email_failures.inc(final='true')
+            logger.error(f"Giving up on email {email.id} '{email.subject}' after {email.attempts} attempts: {error}")
+        else:
+            email.next_attempt_at = datetime.utcnow() + timedelta(seconds=self.backoff * 2 ** (email.attempts - 1))
+            email_failures.inc(final='false')
+            logger.warning(f"Email {email.id} attempt {email.attempts} failed, retrying: {error}")
+
+
+email_dispatcher = EmailDispatcher()
+
+
+def start_email_dispatcher(app):
+    """Start delivering the email outbox in the background."""
+    email_dispatcher.interval = app.config.get('MAIL_OUTBOX_INTERVAL', email_dispatcher.interval)
+    email_dispatcher.batch_size = app.config.get('MAIL_OUTBOX_BATCH_SIZE', email_dispatcher.batch_size)
+    email_dispatcher.max_attempts = app.config.get('MAIL_OUTBOX_MAX_ATTEMPTS', email_dispatcher.max_attempts)
+    email_dispatcher.backoff = app.config.get('MAIL_OUTBOX_BACKOFF', email_dispatcher.backoff)
+    email_dispatcher.start(app)
@@ -0,0 +1,126 @@
+"""Per-hospital replay buffer for referral notifications.
+
+A ``new_referral`` broadcast while a hospital's browser is reconnecting (a
+dropped network, or just navigating between pages) used to be lost until
+the client re-polled /referrals/api/pending-referrals. ``notify_hospital``
+now stamps each referral event with its target hospital's next sequence
+number and keeps the last REPLAY_BUFFER_SIZE of them in a ring buffer:
+
+    data['replay'] = {'hospital_id': 7, 'epoch': 'c0ffee...', 'seq': 42}
+
+On (re)connect notifications.js emits ``replay`` with the last epoch/seq it
+saw and gets back only the events it missed. When it cannot be answered
+from the buffer (the gap is older than the buffer, or the process restarted
+and the epoch changed) the reply asks for a snapshot and the client loads
+the pending referrals once.
+
+Replayed countdowns (``time_remaining``) are reduced by the time the event
+spent in the buffer, and ``withdraw`` drops a referral from replay once it
+has been answered or escalated.
+"""
+import threading
+import time
+import uuid
+from collections import deque
+
+from app.metrics import registry
+from app.socket_codec import send_to_hospital
+
+replay_requests = registry.counter(
+    'icuconnect_replay_requests_total',
+    'Reconnect replay requests by outcome (replayed, current, snapshot)',
+    labels=('outcome',))
+
+
+class ReplayBuffer:
+    """Bounded, sequence-numbered history of recent events per hospital"""
+
+    def __init__(self, size=100):
+        self.size = size
+        # Sequence numbers are only meaningful within one process lifetime
+        self.epoch = uuid.uuid4().hex[:12]
+        self._events = {}
+        self._seq = {}
+        self._lock = threading.Lock()
+
+    def configure(self, app):
+        self.size = app.config.get('REPLAY_BUFFER_SIZE', self.size)
+
+    def record(self, hospital_id, event, data):
+        """Assign the next sequence number for hospital_id; returns data stamped with it."""
+        with self._lock:
+            seq = self._seq.get(hospital_id, 0) + 1
+            self._seq[hospital_id] = seq
+            data = dict(data, replay={'hospital_id': hospital_id, 'epoch': self.epoch, 'seq': seq})
+            if hospital_id not in self._events:
+                self._events[hospital_id] = deque(maxlen=self.size)
+            self._events[hospital_id].append([seq, event, data, time.monotonic()])
+        return data
+
+    def withdraw(self, hospital_id, event, **match):
+        """Stop replaying buffered events whose data matches, e.g. a referral already answered."""
+        with self._lock:
+            for entry in self._events.get(hospital_id, ()):
+                if entry[1] == event and entry[2] is not None and \
+                        all(entry[2].get(key) == value for key, value in match.items()):
+                    entry[2] = None
+
+    def since(self, hospital_id, epoch, seq):
+        """Return (current seq, events after seq as [{'event', 'data'}]).
+
+        The events are None when only a snapshot can fill the gap.
+        """
+        with self._lock:
+            current = self._seq.get(hospital_id, 0)
+            events = [tuple(entry) for entry in self._events.get(hospital_id, ())]
+        if epoch is None:
+            # First connection of the session: nothing was missed yet
+            return current, []
+        if epoch != self.epoch or not isinstance(seq, int) or seq > current:
+            return current, None
+        if seq == current:
+            return current, []
+        if not events or events[0][0] > seq + 1:
+            return current, None
+        now = time.monotonic()
+        missed = []
+        for event_seq, event, data, recorded_at in events:
+            if event_seq <= seq or data is None:
+                continue
+            if data.get('time_remaining') is not None:
+                data = dict(data, time_remaining=max(0, data['time_remaining'] - (now - recorded_at)))
+            missed.append({'event': event, 'data': data})
+        return current, missed
+
+    def reply(self, hospital_id, last_seen):
+        """Answer a client's replay request with its missed events or a snapshot marker."""
+        last_seen = last_seen if isinstance(last_seen, dict) else {}
+        current, events = self.since(hospital_id, last_seen.get('epoch'), last_seen.get('seq'))
+        if events is None:
+            outcome = 'snapshot'
+        else:
+            outcome = 'replayed' if events else 'current'
+        replay_requests.inc(outcome=outcome)
+        return {
+            'epoch': self.epoch,
+            'seq': current,
+            'snapshot': events is None,
+            'events': events or [],
+        }
+
+    def clear(self):
+        with self._lock:
+            self._events.clear()
+            self._seq.clear()
+
+
+replay_buffer = ReplayBuffer()
+
+
+def notify_hospital(hospital_id, event, data):
+    """Send an event to one hospital's connections, keeping it for replay on reconnect."""
+    send_to_hospital(hospital_id, event, replay_buffer.record(hospital_id, event, data))
+
+
+def init_event_replay(app):
+    replay_buffer.configure(app)
@@ -0,0 +1,106 @@
+"""Forecasting artifacts shared across worker processes.
+
+The prediction endpoints need the trained ARIMA model and the daily occupancy
+series from Dataset1.xlsx. Parsing the workbook is slow and every worker used
+to keep its own DataFrame, so the series is now written once to ``.npy``
+files (``python -m app.forecast_artifacts``, run by the gunicorn master on
+start) and each worker memory-maps them read-only: all workers share the same
+physical pages through the OS page cache. Workers load the artifacts in
+``post_worker_init`` so the first request is served warm.
+
+The model is an ordinary pickle and is still loaded once per worker.
+"""
+import os
+import pickle
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_PATH = os.path.join(ROOT, 'models', 'arima_model1.pkl')
+DATASET_PATH = os.path.join(ROOT, 'app', 'Dataset', 'Dataset1.xlsx')
+
+
+def default_cache_dir():
+    return os.environ.get('FORECAST_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'icuconnect-forecast')
+
+
+def build_dataset_cache(dataset_path=DATASET_PATH, cache_dir=None):
+    """Parse the workbook once and save its date and occupancy columns as .npy files."""
+    cache_dir = cache_dir or default_cache_dir()
+    df = pd.read_excel(dataset_path)
+    occ_col = 'total_ped_icu_patients' if 'total_ped_icu_patients' in df.columns else 'occupied_ped_icu_beds'
+    arrays = {
+        'dates': pd.to_datetime(df['date']).to_numpy(dtype='datetime64[ns]'),
+        'occupancy': df[occ_col].to_numpy(dtype='float64'),
+    }
+    os.makedirs(cache_dir, exist_ok=True)
+    for name, array in arrays.items():
+        # Write then rename, so a worker never maps a half-written file
+        partial = os.path.join(cache_dir, f'{name}.{os.getpid()}.partial.npy')
+        np.save(partial, array)
+        os.replace(partial, os.path.join(cache_dir, f'{name}.npy'))
+    return cache_dir
+
+
+def _cache_is_fresh(dataset_path, cache_dir):
+    paths = [os.path.join(cache_dir, f'{name}.npy') for name in ('dates', 'occupancy')]
+    if not all(os.path.exists(path) for path in paths):
+        return False
+    return min(os.path.getmtime(path) for path in paths) >= os.path.getmtime(dataset_path)
+
+
+class ForecastArtifacts:
+    """Lazily loaded ARIMA model and memory-mapped occupancy series"""
+
+    def __init__(self, model_path=MODEL_PATH, dataset_path=DATASET_PATH, cache_dir=None):
+        self.model_path = model_path
+        self.dataset_path = dataset_path
+        self.cache_dir = cache_dir
+        self._model = None
+        self._occupancy = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._model is not None and self._occupancy is not None
+
+    def get_model(self):
+        """Return the trained ARIMA model, or None if it cannot be loaded."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    try:
+                        with open(self.model_path, 'rb') as f:
+                            self._model = pickle.load(f)
+                    except Exception as e:
+                        print(f"Error loading model: {e}")
+        return self._model
+
+    def get_occupancy(self):
+        """Return daily system occupancy as a Series backed by read-only memory-mapped arrays."""
+        if self._occupancy is None:
+            with self._lock:
+                if self._occupancy is None:
+                    cache_dir = self.cache_dir or default_cache_dir()
+                    if not _cache_is_fresh(self.dataset_path, cache_dir):
+                        build_dataset_cache(self.dataset_path, cache_dir)
+                    dates = np.load(os.path.join(cache_dir, 'dates.npy'), mmap_mode='r')
+                    occupancy = np.load(os.path.join(cache_dir, 'occupancy.npy'), mmap_mode='r')
+                    self._occupancy = pd.Series(occupancy, index=pd.DatetimeIndex(dates, name='date'), copy=False)
+        return self._occupancy
+
+    def load(self):
+        """Load everything up front (called in each worker before it serves requests)."""
+        self.get_model()
+        self.get_occupancy()
+        return self
+
+
+forecast_artifacts = ForecastArtifacts()
+
+
+if __name__ == '__main__':
+    print(f"Forecast dataset cache written to {build_dataset_cache()}")
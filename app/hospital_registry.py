@@ -0,0 +1,131 @@
+"""Process-wide, read-mostly registry of hospital metadata.
+
+Hospital names, coordinates, levels, timezones and notification durations
+change only when admins edit them, yet nearly every request looked them up.
+The registry loads every hospital once into frozen ``HospitalRecord``s and
+serves lookups from memory.
+
+Any insert, update or delete of a Hospital bumps the ``hospitals`` row in
+``cache_versions`` inside the same flush and, on commit, drops this process's
+copy. Other workers notice the bumped version the next time they check it
+(at most every HOSPITAL_REGISTRY_CHECK_INTERVAL seconds) and reload.
+"""
+import threading
+import time
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, object_session
+
+from app import db
+from app.cache_versions import bump_versions
+from app.models import CacheVersion, Hospital
+from app.utils import get_timezone
+
+REGISTRY_NAME = 'hospitals'
+
+
+class HospitalRecord:
+    """Immutable snapshot of a hospital row"""
+
+    __slots__ = ('id', 'name', 'latitude', 'longitude', 'level', 'timezone',
+                 'notification_duration', 'is_active', 'is_test')
+
+    def __init__(self, hospital):
+        for name in self.__slots__:
+            object.__setattr__(self, name, getattr(hospital, name))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('HospitalRecord is immutable')
+
+    def get_timezone(self):
+        """Get the timezone object for this hospital"""
+        return get_timezone(self.timezone)
+
+    def __repr__(self):
+        return f"<HospitalRecord {self.id} {self.name}>"
+
+
+class HospitalRegistry:
+    """In-memory hospital records, reloaded when the shared version changes"""
+
+    def __init__(self, check_interval=5):
+        self.check_interval = check_interval
+        self._records = None
+        self._ordered = ()
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, hospital_id):
+        """Return the HospitalRecord for hospital_id, or None."""
+        try:
+            return self._load().get(int(hospital_id))
+        except (TypeError, ValueError):
+            return None
+
+    def all(self, include_test=True, active_only=False):
+        """Return records in id order, optionally without test or inactive hospitals."""
+        self._load()
+        return [
+            record for record in self._ordered
+            if (include_test or not record.is_test) and (not active_only or record.is_active)
+        ]
+
+    def invalidate(self):
+        """Drop this process's copy; the next lookup reloads from the database."""
+        with self._lock:
+            self._records = None
+
+    def _load(self):
+        records = self._records
+        now = time.monotonic()
+        if records is not None and now - self._checked_at < self.check_interval:
+            return records
+        version = self._shared_version()
+        if records is not None and version == self._version:
+            self._checked_at = now
+            return records
+        with self._lock:
+            hospitals = Hospital.query.order_by(Hospital.id).all()
+            ordered = tuple(HospitalRecord(h) for h in hospitals)
+            self._ordered = ordered
+            self._records = {record.id: record for record in ordered}
+            self._version = version
+            self._checked_at = now
+            return self._records
+
+    def _shared_version(self):
+        return db.session.execute(
+            select(CacheVersion.version).where(CacheVersion.name == REGISTRY_NAME)
+        ).scalar() or 0
+
+
+hospital_registry = HospitalRegistry()
+
+
+def _bump_version(mapper, connection, target):
+    session = object_session(target)
+    bump_versions(connection, session, REGISTRY_NAME)
+    if session is not None:
+        session.info['hospitals_changed'] = True
+
+
+def _bump_version_on_update(mapper, connection, target):
+    # after_update also fires when only a relationship collection changed (e.g. a bed was added)
+    if object_session(target).is_modified(target, include_collections=False):
+        _bump_version(mapper, connection, target)
+
+
+def _invalidate_on_commit(session):
+    if session.info.pop('hospitals_changed', False):
+        hospital_registry.invalidate()
+
+
+def init_hospital_registry(app):
+    """Register the version-bumping listeners and apply config."""
+    hospital_registry.check_interval = app.config.get('HOSPITAL_REGISTRY_CHECK_INTERVAL', 5)
+    if not event.contains(Hospital, 'after_insert', _bump_version):
+        event.listen(Hospital, 'after_insert', _bump_version)
+        event.listen(Hospital, 'after_update', _bump_version_on_update)
+        event.listen(Hospital, 'after_delete', _bump_version)
+        event.listen(Session, 'after_commit', _invalidate_on_commit)
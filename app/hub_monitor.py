@@ -0,0 +1,121 @@
+"""Eventlet hub lag watchdog.
+
+A watchdog greenlet sleeps for a fixed interval and measures how late it wakes
+up; that delay is the time every other greenlet (HTTP requests, Socket.IO
+delivery) was also kept waiting. A real OS thread watches the watchdog's
+heartbeat and, when the hub stops switching for longer than the threshold,
+captures the stack of whatever code is holding it. The watchdog logs that
+stack once the hub is free again, so the sampler thread never touches green
+locks or the logging machinery.
+"""
+import logging
+import os
+import sys
+import traceback
+from collections import deque
+
+import eventlet
+from eventlet import patcher
+
+from app.metrics import registry
+
+_real_thread = patcher.original('_thread')
+_real_threading = patcher.original('threading')
+_real_time = patcher.original('time')
+
+logger = logging.getLogger(__name__)
+
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+LAG_QUANTILES = (0.5, 0.95, 0.99)
+
+hub_lag = registry.histogram(
+    'icuconnect_hub_lag_seconds', 'Delay between a scheduled and actual greenlet wake-up', buckets=LAG_BUCKETS)
+hub_lag_quantiles = registry.gauge(
+    'icuconnect_hub_lag_quantile_seconds', 'Hub lag percentiles over the recent sample window', labels=('quantile',))
+hub_blocks = registry.counter(
+    'icuconnect_hub_blocks_total', 'Times the hub was blocked for longer than the threshold')
+
+
+class HubMonitor:
+    """Measures eventlet hub scheduling lag and reports blocking code"""
+
+    def __init__(self, interval=0.1, threshold=0.25, window=600):
+        self.interval = interval
+        self.threshold = threshold
+        self.samples = deque(maxlen=window)
+        self._heartbeat = None
+        self._hub_thread_id = None
+        self._reported_heartbeat = None
+        self._blocked_stack = None
+        self._running = False
+        self._pid = None
+
+    def start(self):
+        """Start the watchdog greenlet and the sampler thread (once per process)."""
+        if self._running and self._pid == os.getpid():
+            return
+        self._running = True
+        self._pid = os.getpid()
+        self._hub_thread_id = _real_thread.get_ident()
+        self._heartbeat = None
+        eventlet.spawn(self._watch)
+        sampler = _real_threading.Thread(target=self._sample_blocked_hub, name='hub-monitor', daemon=True)
+        sampler.start()
+
+    def stop(self):
+        self._running = False
+
+    def record_lag(self, lag):
+        self.samples.append(lag)
+        hub_lag.observe(lag)
+        for quantile, value in self.percentiles().items():
+            hub_lag_quantiles.set(value, quantile=str(quantile))
+
+    def percentiles(self):
+        """Return the configured lag percentiles over the sample window."""
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {quantile: 0.0 for quantile in LAG_QUANTILES}
+        return {
+            quantile: ordered[min(len(ordered) - 1, int(quantile * len(ordered)))]
+            for quantile in LAG_QUANTILES
+        }
+
+    def _watch(self):
+        while self._running:
+            expected = _real_time.monotonic() + self.interval
+            eventlet.sleep(self.interval)
+            now = _real_time.monotonic()
+            self._heartbeat = now
+            lag = max(0.0, now - expected)
+            self.record_lag(lag)
+            if self._blocked_stack is not None:
+                stack, self._blocked_stack = self._blocked_stack, None
+                hub_blocks.inc()
+                logger.warning(f"Eventlet hub blocked for {lag:.3f}s; blocking stack:\n{stack}")
+
+    def _sample_blocked_hub(self):
+        while self._running:
+            _real_time.sleep(self.interval)
+            heartbeat = self._heartbeat
+            if heartbeat is None:
+                # The hub has not run the watchdog yet (e.g. a CLI script with no server loop)
+                continue
+            stalled = _real_time.monotonic() - heartbeat
+            # Report each stall once, while the blocking code is still on the stack
+            if stalled > self.threshold + self.interval and heartbeat != self._reported_heartbeat:
+                self._reported_heartbeat = heartbeat
+                frame = sys._current_frames().get(self._hub_thread_id)
+                self._blocked_stack = ''.join(traceback.format_stack(frame)) if frame else '<no frame>'
+
+
+hub_monitor = HubMonitor()
+
+
+def start_hub_monitor(app):
+    """Start the hub watchdog when running under eventlet."""
+    if not app.config.get('HUB_MONITOR_ENABLED', True):
+        return
+    hub_monitor.interval = app.config.get('HUB_MONITOR_INTERVAL', hub_monitor.interval)
+    hub_monitor.threshold = app.config.get('HUB_MONITOR_THRESHOLD', hub_monitor.threshold)
+    hub_monitor.start()
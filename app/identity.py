@@ -0,0 +1,156 @@
+"""Short-TTL identity cache for Flask-Login.
+
+Flask-Login resolves ``current_user`` on every authenticated request and
+Socket.IO event. Instead of loading the Admin/User row each time, the loader
+keeps an immutable snapshot of the fields hot paths read (id, email, name,
+role, privilege level, hospital id, name and timezone) for a few seconds.
+Anything outside the snapshot - relationships, ``set_password`` and other
+methods - transparently loads the real row on first use.
+
+Entries are evicted whenever an Admin or User row is updated or deleted
+(approval, removal, password change) and the whole cache is dropped when a
+hospital changes, so the TTL only bounds staleness for other processes.
+"""
+import threading
+import time
+from types import MappingProxyType
+
+from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+SNAPSHOT_FIELDS = {
+    'admin': ('id', 'email', 'name', 'hospital_id', 'hospital_name', 'hospital_timezone',
+              'privilege_level', 'is_verified'),
+    'user': ('id', 'email', 'name', 'hospital_id', 'hospital_name', 'hospital_timezone',
+             'role', 'is_approved', 'is_verified'),
+}
+
+
+class IdentitySnapshot:
+    """Immutable copy of the identity fields of an Admin or User row"""
+
+    __slots__ = ('model', 'kind', 'fields')
+
+    def __init__(self, row):
+        kind = row.get_id().split('-', 1)[0]
+        fields = {name: getattr(row, name) for name in SNAPSHOT_FIELDS[kind]}
+        object.__setattr__(self, 'model', type(row))
+        object.__setattr__(self, 'kind', kind)
+        object.__setattr__(self, 'fields', MappingProxyType(fields))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('IdentitySnapshot is immutable')
+
+
+class CachedIdentity(UserMixin):
+    """current_user built from a snapshot; falls back to the database row for anything else"""
+
+    def __init__(self, snapshot):
+        object.__setattr__(self, '_snapshot', snapshot)
+        object.__setattr__(self, '_row', None)
+
+    @property
+    def __class__(self):
+        # Keeps isinstance(current_user, Admin) checks working
+        return self._snapshot.model
+
+    def get_id(self):
+        return f"{self._snapshot.kind}-{self._snapshot.fields['id']}"
+
+    def get_type(self):
+        return self._snapshot.kind
+
+    def get_hospital(self):
+        return self._load_row().hospital
+
+    def _load_row(self):
+        if self._row is None:
+            from app import db
+            object.__setattr__(self, '_row', db.session.get(self._snapshot.model, self._snapshot.fields['id']))
+        return self._row
+
+    def __getattr__(self, name):
+        fields = object.__getattribute__(self, '_snapshot').fields
+        if name in fields:
+            return fields[name]
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self._load_row(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._load_row(), name, value)
+
+    def __repr__(self):
+        return f"<CachedIdentity {self.get_id()}>"
+
+
+class IdentityCache:
+    """Process-local map of Flask-Login ids to identity snapshots with a TTL"""
+
+    def __init__(self, ttl=30, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, id_with_type, load_row):
+        """Return a CachedIdentity for id_with_type, calling load_row(id_with_type) on a miss."""
+        now = time.monotonic()
+        entry = self._entries.get(id_with_type)
+        if entry is not None and entry[0] > now:
+            return CachedIdentity(entry[1])
+
+        row = load_row(id_with_type)
+        if row is None:
+            self.invalidate(id_with_type)
+            return None
+        snapshot = IdentitySnapshot(row)
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries = {key: value for key, value in self._entries.items() if value[0] > now}
+            self._entries[id_with_type] = (now + self.ttl, snapshot)
+        return CachedIdentity(snapshot)
+
+    def invalidate(self, id_with_type):
+        with self._lock:
+            self._entries.pop(id_with_type, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+identity_cache = IdentityCache()
+
+
+def _evict_row(mapper, connection, target):
+    identity_cache.invalidate(target.get_id())
+    # Evict again on commit: another greenlet may have re-cached the old row since the flush
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('evicted_identities', set()).add(target.get_id())
+
+
+def _clear_all(mapper, connection, target):
+    identity_cache.clear()
+    session = object_session(target)
+    if session is not None:
+        session.info['clear_identities'] = True
+
+
+def _evict_on_commit(session):
+    if session.info.pop('clear_identities', False):
+        identity_cache.clear()
+    for id_with_type in session.info.pop('evicted_identities', ()):
+        identity_cache.invalidate(id_with_type)
+
+
+def register_identity_invalidation(admin_model, user_model, hospital_model):
+    """Evict cached identities whenever the rows they were built from change."""
+    for model in (admin_model, user_model):
+        event.listen(model, 'after_update', _evict_row)
+        event.listen(model, 'after_delete', _evict_row)
+    event.listen(hospital_model, 'after_update', _clear_all)
+    event.listen(hospital_model, 'after_delete', _clear_all)
+    event.listen(Session, 'after_commit', _evict_on_commit)
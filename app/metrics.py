@@ -0,0 +1,231 @@
+"""In-process request and SQL metrics, exposed in Prometheus text format at /metrics.
+
+The metrics name hospitals and show which are staffed right now, so /metrics
+answers only a scraper presenting ``Authorization: Bearer <METRICS_TOKEN>``
+or a logged-in admin.
+"""
+import hmac
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, abort, current_app, g, has_request_context, request, template_rendered, before_render_template
+from flask_login import current_user
+from sqlalchemy import event
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels
+    )
+    return '{' + pairs + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """Monotonic counter keyed by label values"""
+
+    kind = 'counter'
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = tuple(labels.get(name, '') for name in self.label_names)
+        return self._values.get(key, 0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, tuple(zip(self.label_names, key)), value
+
+
+class Gauge(Counter):
+    """Value that can go up and down"""
+
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.label_names)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram:
+    """Cumulative bucket histogram keyed by label values"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, description, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.label_names)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            series['counts'][index] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def count(self, **labels):
+        key = tuple(labels.get(name, '') for name in self.label_names)
+        series = self._series.get(key)
+        return series['count'] if series else 0
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(s['counts']), s['sum'], s['count']) for key, s in self._series.items()]
+        for key, counts, total, count in items:
+            labels = tuple(zip(self.label_names, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f'{self.name}_bucket', labels + (('le', _format_value(bound)),), cumulative
+            yield f'{self.name}_sum', labels, total
+            yield f'{self.name}_count', labels, count
+
+
+class MetricsRegistry:
+    """Process-wide collection of metrics"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name, description, labels=()):
+        return self._register(Counter, name, description, labels)
+
+    def gauge(self, name, description, labels=()):
+        return self._register(Gauge, name, description, labels)
+
+    def histogram(self, name, description, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, description, labels, buckets)
+
+    def render(self):
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f'# HELP {metric.name} {metric.description}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for sample_name, labels, value in metric.samples():
+                lines.append(f'{sample_name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+request_duration = registry.histogram(
+    'icuconnect_request_duration_seconds', 'Total time spent serving a request', labels=('endpoint',))
+request_db_time = registry.histogram(
+    'icuconnect_request_db_seconds', 'Time spent in SQL queries per request', labels=('endpoint',))
+request_render_time = registry.histogram(
+    'icuconnect_request_render_seconds', 'Time spent rendering templates per request', labels=('endpoint',))
+request_query_count = registry.histogram(
+    'icuconnect_request_queries', 'SQL queries issued per request', labels=('endpoint',),
+    buckets=QUERY_COUNT_BUCKETS)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and hasattr(g, 'metrics_start'):
+        g.metrics_query_count += 1
+        started = getattr(context, '_metrics_query_start', None)
+        if started is not None:
+            g.metrics_db_time += time.perf_counter() - started
+
+
+def _before_render(sender, template, context, **extra):
+    if has_request_context() and hasattr(g, 'metrics_start'):
+        g.metrics_render_start = time.perf_counter()
+
+
+def _after_render(sender, template, context, **extra):
+    if has_request_context() and getattr(g, 'metrics_render_start', None) is not None:
+        g.metrics_render_time += time.perf_counter() - g.metrics_render_start
+        g.metrics_render_start = None
+
+
+def _may_read_metrics():
+    from app.models import Admin
+    token = current_app.config.get('METRICS_TOKEN')
+    supplied = request.headers.get('Authorization', '')
+    if token and hmac.compare_digest(supplied.encode(), f'Bearer {token}'.encode()):
+        return True
+    return current_user.is_authenticated and isinstance(current_user, Admin)
+
+
+def init_metrics(app):
+    """Register request hooks, SQL listeners and the /metrics endpoint."""
+    with app.app_context():
+        from app import db
+        engine = db.engine
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_start = time.perf_counter()
+        g.metrics_query_count = 0
+        g.metrics_db_time = 0.0
+        g.metrics_render_time = 0.0
+        g.metrics_render_start = None
+
+    @app.after_request
+    def record_request_metrics(response):
+        if hasattr(g, 'metrics_start') and request.endpoint != 'metrics':
+            endpoint = request.endpoint or 'unmatched'
+            request_duration.observe(time.perf_counter() - g.metrics_start, endpoint=endpoint)
+            request_db_time.observe(g.metrics_db_time, endpoint=endpoint)
+            request_render_time.observe(g.metrics_render_time, endpoint=endpoint)
+            request_query_count.observe(g.metrics_query_count, endpoint=endpoint)
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        if not _may_read_metrics():
+            abort(401)
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
@@ -1,9 +1,9 @@
 from app import db, login_manager
 from flask_login import UserMixin
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
-from app.utils import to_local_time, to_utc_time, get_current_local_time
-import pytz
+from app.utils import to_local_time, to_utc_time, get_current_local_time, get_timezone
+from app.passwords import hash_password, verify_password, needs_rehash
+from app.identity import identity_cache, register_identity_invalidation
 
 
 
@@ -29,7 +29,8 @@ class Hospital(db.Model):
     
     @property
     def available_beds(self):
-        return len([bed for bed in self.beds if not bed.is_occupied])
+        # Same rule as Bed.available_filter: a bed held for a referral is not available until the hold expires
+        return len([bed for bed in self.beds if not bed.is_occupied and not bed.is_reserved])
     
     # Relationships
     beds = db.relationship('Bed', backref='hospital', lazy=True)
@@ -38,7 +39,7 @@ class Hospital(db.Model):
     
     def get_timezone(self):
         """Get the timezone object for this hospital"""
-        return pytz.timezone(self.timezone)
+        return get_timezone(self.timezone)
 
 
 
@@ -58,15 +59,38 @@ class Admin(UserMixin, db.Model):
     created_at = db.Column(db.DateTime, default=datetime.now)
     reset_token = db.Column(db.String(128), nullable=True)
     
+    __table_args__ = (
+        db.Index('idx_admin_reset_token', 'reset_token'),
+    )
+    
     # Password handling
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        if not verify_password(self.password_hash, password):
+            return False
+        if needs_rehash(self.password_hash):
+            # Upgrade to the current hash parameters; the caller's commit persists it
+            self.password_hash = hash_password(password)
+        return True
     
     def get_id(self):
         return f"admin-{self.id}"
+    
+    def get_type(self):
+        return 'admin'
+    
+    def get_hospital(self):
+        return self.hospital
+    
+    @property
+    def hospital_name(self):
+        return self.hospital.name if self.hospital else None
+
+    @property
+    def hospital_timezone(self):
+        return self.hospital.timezone if self.hospital else None
 
 class User(UserMixin, db.Model):
     """Regular staff users table"""
@@ -86,16 +110,38 @@ class User(UserMixin, db.Model):
     is_verified = db.Column(db.Boolean, nullable=False, default=False)
     verification_token = db.Column(db.String(128), nullable=True)
     
+    __table_args__ = (
+        db.Index('idx_user_verification_token', 'verification_token'),
+    )
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        if not verify_password(self.password_hash, password):
+            return False
+        if needs_rehash(self.password_hash):
+            # Upgrade to the current hash parameters; the caller's commit persists it
+            self.password_hash = hash_password(password)
+        return True
     
     
     def get_id(self):
         return f"user-{self.id}"
+    
+    def get_type(self):
+        return 'user'
+    
+    def get_hospital(self):
+        return self.hospital
+    
+    @property
+    def hospital_name(self):
+        return self.hospital.name if self.hospital else None
+
+    @property
+    def hospital_timezone(self):
+        return self.hospital.timezone if self.hospital else None
 
 
 class UserSettings(db.Model):
@@ -134,9 +180,7 @@ class UserSettings(db.Model):
         return f"<UserSettings(user_id={self.user_id})>"
 
 
-# Flask-Login loader for admins
-@login_manager.user_loader
-def load_user(id_with_type):
+def _load_identity_row(id_with_type):
     try:
         user_type, id_str = id_with_type.split('-', 1)
         if user_type == 'admin':
@@ -146,6 +190,13 @@ def load_user(id_with_type):
     except Exception:
         return None
 
+# Flask-Login loader for admins and users, served from the identity cache
+@login_manager.user_loader
+def load_user(id_with_type):
+    return identity_cache.get(id_with_type, _load_identity_row)
+
+register_identity_invalidation(Admin, User, Hospital)
+
 class Bed(db.Model):
     __tablename__ = 'beds'
     
@@ -155,14 +206,39 @@ class Bed(db.Model):
     is_occupied = db.Column(db.Boolean, default=False)
     bed_type = db.Column(db.String(50), default='ICU')  # Could be ICU, General, etc.
     
+    # Held for an accepted referral until the patient is admitted or the hold expires (see app/bed_reservations.py)
+    reserved_until = db.Column(db.DateTime)
+    reserved_for_referral_id = db.Column(db.Integer, db.ForeignKey(
+        'referral_requests.id', use_alter=True, name='fk_beds_reserved_for_referral_id'))
+    
     # Relationship to admission
     current_admission = db.relationship('Admission', back_populates='bed', uselist=False)
     
     __table_args__ = (
         db.UniqueConstraint('hospital_id', 'bed_number', name='_hospital_bed_uc'),
+        db.Index('idx_bed_hospital_occupied', 'hospital_id', 'is_occupied'),
+        db.Index('idx_bed_reserved_until', 'reserved_until'),
     )
+    
+    @classmethod
+    def available_filter(cls, now=None):
+        """SQL condition for a bed that is neither occupied nor held by an unexpired reservation"""
+        now = now or datetime.utcnow()
+        return (cls.is_occupied == False) & ((cls.reserved_until == None) | (cls.reserved_until <= now))
+    
+    @classmethod
+    def reserved_filter(cls, now=None):
+        """SQL condition for a free bed held by an unexpired reservation"""
+        now = now or datetime.utcnow()
+        return (cls.is_occupied == False) & (cls.reserved_until > now)
+    
+    @property
+    def is_reserved(self):
+        return not self.is_occupied and self.reserved_until is not None and self.reserved_until > datetime.utcnow()
+    
     def __repr__(self):
-        return f"<Bed {self.bed_number} ({'Occupied' if self.is_occupied else 'Available'})>"
+        state = 'Occupied' if self.is_occupied else 'Reserved' if self.is_reserved else 'Available'
+        return f"<Bed {self.bed_number} ({state})>"
 
 class Admission(db.Model):
     __tablename__ = 'admissions'
@@ -180,6 +256,12 @@ class Admission(db.Model):
     discharge_time = db.Column(db.DateTime)
     status = db.Column(db.String(20), default='Active')
     
+    # Indexes for the per-hospital list and count queries
+    __table_args__ = (
+        db.Index('idx_admission_hospital_status', 'hospital_id', 'status'),
+        db.Index('idx_admission_hospital_time', 'hospital_id', 'admission_time'),
+    )
+    
     # Relationships
     bed = db.relationship('Bed', back_populates='current_admission')
     
@@ -213,6 +295,7 @@ class Discharge(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     hospital_id = db.Column(db.Integer, db.ForeignKey('hospitals.id'), nullable=False)
+    admission_id = db.Column(db.Integer, db.ForeignKey('admissions.id'), nullable=True)  # Null only for legacy rows that could not be matched
     patient_name = db.Column(db.String(100), nullable=False)
     bed_number = db.Column(db.Integer, nullable=False)
     admission_time = db.Column(db.DateTime, nullable=False)
@@ -221,6 +304,16 @@ class Discharge(db.Model):
     discharge_type = db.Column(db.String(50), nullable=False)  # Recovered/Transferred/Other
     notes = db.Column(db.Text)
     
+    # Indexes for the discharge history, legacy patient lookup and admission link
+    __table_args__ = (
+        db.Index('idx_discharge_hospital_time', 'hospital_id', 'discharge_time'),
+        db.Index('idx_discharge_patient_lookup', 'hospital_id', 'patient_name', 'admission_time'),
+        db.Index('idx_discharge_admission', 'admission_id', unique=True),
+    )
+    
+    # Relationships
+    admission = db.relationship('Admission', backref=db.backref('discharge', uselist=False))
+    
     @property
     def local_admission_time(self):
         """Get admission time in local timezone"""
@@ -265,8 +358,10 @@ class ReferralRequest(db.Model):
     contact_email = db.Column(db.String(120))
     
     # Status tracking
-    status = db.Column(db.String(20), default='Pending')  # Pending/Accepted/Rejected/Escalated
+    status = db.Column(db.String(20), default='Pending')  # Pending/Accepted/Rejected/Escalated/Withdrawn
     priority = db.Column(db.Integer, default=1)  # 1=highest priority
+    # Referrals offered to several hospitals at once share a group; the first acceptance withdraws the rest
+    offer_group = db.Column(db.String(32))
     
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -279,6 +374,7 @@ class ReferralRequest(db.Model):
         db.Index('idx_referral_urgency', 'urgency_level'),
         db.Index('idx_referral_created_at', 'created_at'),
         db.Index('idx_referral_hospitals', 'requesting_hospital_id', 'target_hospital_id'),
+        db.Index('idx_referral_offer_group', 'offer_group'),
     )
     
     # Relationships
@@ -440,4 +536,59 @@ class HospitalContact(db.Model):
     hospital = db.relationship('Hospital', backref='contacts')
     
     def __repr__(self):
-        return f"<HospitalContact {self.contact_name} ({self.contact_type})>"
\ No newline at end of file
+        return f"<HospitalContact {self.contact_name} ({self.contact_type})>"
+
+class EmailOutbox(db.Model):
+    """Outgoing email waiting for (or done with) background delivery"""
+    __tablename__ = 'email_outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(255), nullable=False)
+    recipients = db.Column(db.Text, nullable=False)  # Comma-separated addresses
+    body = db.Column(db.Text, nullable=False)
+    html = db.Column(db.Text)
+    dedupe_key = db.Column(db.String(64), nullable=False)
+
+    # Delivery state
+    status = db.Column(db.String(20), default='pending', nullable=False)  # pending/sent/failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('idx_email_outbox_status_next', 'status', 'next_attempt_at'),
+        db.Index('idx_email_outbox_dedupe', 'dedupe_key', 'created_at'),
+    )
+
+    @property
+    def recipient_list(self):
+        return [r for r in self.recipients.split(',') if r]
+
+    def __repr__(self):
+        return f"<EmailOutbox(id={self.id}, status={self.status}, subject={self.subject})>"
+
+
+class CacheVersion(db.Model):
+    """Version counters for in-process caches shared across workers"""
+    __tablename__ = 'cache_versions'
+
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return f"<CacheVersion {self.name}={self.version}>"
+
+
+class StaffPresence(db.Model):
+    """Socket.IO connections per hospital, published by each worker (see app/presence.py)"""
+    __tablename__ = 'staff_presence'
+
+    worker_id = db.Column(db.String(64), primary_key=True)
+    hospital_id = db.Column(db.Integer, primary_key=True)
+    connections = db.Column(db.Integer, default=0, nullable=False)
+    heartbeat_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<StaffPresence {self.worker_id} hospital={self.hospital_id} connections={self.connections}>"
@@ -0,0 +1,56 @@
+"""Password hashing off the eventlet hub.
+
+Key-stretching hashes are slow by design, and a burst of logins at shift
+change would otherwise hold the hub for the whole duration of every hash.
+Hashing and verification run on a dedicated worker pool, and hashes made with
+outdated parameters are upgraded transparently after a successful login.
+"""
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from app.worker_pool import WorkerPool
+
+hash_pool = WorkerPool('Password hashing', max_workers=4, max_queue=64, timeout=15)
+
+# None means werkzeug's default method
+_hash_method = None
+_hash_prefix = None
+
+
+def configure_password_hashing(app):
+    """Apply PASSWORD_HASH_METHOD and the hashing pool limits from config."""
+    global _hash_method, _hash_prefix
+    _hash_method = app.config.get('PASSWORD_HASH_METHOD')
+    _hash_prefix = None
+    hash_pool.configure(
+        max_workers=app.config.get('PASSWORD_HASH_WORKERS', 4),
+        max_queue=app.config.get('PASSWORD_HASH_QUEUE', 64),
+        timeout=app.config.get('PASSWORD_HASH_TIMEOUT', 15)
+    )
+
+
+def _method_args():
+    return {'method': _hash_method} if _hash_method else {}
+
+
+def _current_prefix():
+    # Method strings are normalised by werkzeug (e.g. 'scrypt' -> 'scrypt:32768:8:1'),
+    # so learn the canonical prefix from one real hash
+    global _hash_prefix
+    if _hash_prefix is None:
+        _hash_prefix = hash_password('').split('$', 1)[0]
+    return _hash_prefix
+
+
+def hash_password(password):
+    return hash_pool.run(generate_password_hash, password, **_method_args())
+
+
+def verify_password(password_hash, password):
+    if not password_hash or password is None:
+        return False
+    return hash_pool.run(check_password_hash, password_hash, password)
+
+
+def needs_rehash(password_hash):
+    """True when password_hash was made with different parameters than the current method."""
+    return bool(password_hash) and password_hash.split('$', 1)[0] != _current_prefix()
@@ -0,0 +1,36 @@
+"""Serve build-time precompressed (.br/.gz) variants of static files.
+
+Build scripts write ``<file>.br`` and ``<file>.gz`` next to each output;
+``send_precompressed`` picks the best variant the client accepts, so nothing
+is compressed per request. Content-hashed file names can be cached forever.
+"""
+import os
+
+from flask import request, send_from_directory
+
+# Preferred first
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def choose_variant(directory, filename):
+    """Return (filename, encoding) of the best variant on disk the client accepts."""
+    for encoding, suffix in ENCODINGS:
+        if request.accept_encodings[encoding] and os.path.exists(os.path.join(directory, filename + suffix)):
+            return filename + suffix, encoding
+    return filename, None
+
+
+def send_precompressed(directory, filename, mimetype, immutable=False):
+    """send_from_directory with Accept-Encoding negotiation over precompressed siblings.
+
+    immutable=True is for content-hashed names: clients keep them for a year
+    without revalidating. Otherwise clients revalidate against the ETag.
+    """
+    variant, encoding = choose_variant(directory, filename)
+    response = send_from_directory(directory, variant, mimetype=mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = IMMUTABLE if immutable else 'public, no-cache'
+    return response
@@ -0,0 +1,4 @@
+"""Worker pool for pandas/statsmodels prediction work (see app/worker_pool.py)."""
+from app.worker_pool import WorkerPool, PoolBusy, PoolTimeout
+
+prediction_pool = WorkerPool('Prediction service')
@@ -0,0 +1,147 @@
+"""Which hospitals have staff connected right now.
+
+Every accepted Socket.IO connection is counted against its user's hospital
+and dropped again on disconnect. Engine.IO's ping/pong is the per-connection
+heartbeat: a browser that stops answering within ``ping_timeout`` is
+disconnected, and so is a client stalled by backpressure
+(app/socket_backpressure.py), so a closed laptop does not keep its hospital
+"online" for long.
+
+``online_count`` and ``is_online`` are dictionary lookups; the referral page
+ranks attended hospitals first and ``initiate_referral`` escalates a High
+urgency referral straight away when nobody at the target is connected,
+instead of letting it wait out ``notification_duration``.
+
+With PRESENCE_SHARED on (several workers) each worker writes its counts to
+the ``staff_presence`` table every PRESENCE_HEARTBEAT_INTERVAL seconds and
+reads back the other workers' fresh rows, so counts from elsewhere are at
+most one interval old. For PRESENCE_WARMUP seconds after start the registry
+is not ``authoritative``: connections from before a restart have not come
+back yet, and nothing is escalated for looking unattended.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+
+import eventlet
+from sqlalchemy import func
+
+from app import db
+from app.metrics import registry
+from app.models import StaffPresence
+
+logger = logging.getLogger(__name__)
+
+staff_connections = registry.gauge(
+    'icuconnect_staff_connections', 'Socket.IO connections held by this worker, by hospital',
+    labels=('hospital_id',))
+
+
+class PresenceRegistry:
+    """Connected Socket.IO sessions per hospital"""
+
+    def __init__(self, heartbeat_interval=15, warmup=30):
+        self.heartbeat_interval = heartbeat_interval
+        self.warmup = warmup
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}'[:64]
+        self._sids = {}         # hospital_id -> sids connected to this worker
+        self._hospitals = {}    # sid -> hospital_id
+        self._remote = {}       # hospital_id -> connections on other workers
+        self._started_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._running = False
+
+    def configure(self, app):
+        self.heartbeat_interval = app.config.get('PRESENCE_HEARTBEAT_INTERVAL', self.heartbeat_interval)
+        self.warmup = app.config.get('PRESENCE_WARMUP', self.warmup)
+        self._started_at = time.monotonic()
+
+    def connect(self, sid, hospital_id):
+        with self._lock:
+            self._hospitals[sid] = hospital_id
+            sids = self._sids.setdefault(hospital_id, set())
+            sids.add(sid)
+            count = len(sids)
+        staff_connections.set(count, hospital_id=str(hospital_id))
+
+    def disconnect(self, sid):
+        with self._lock:
+            hospital_id = self._hospitals.pop(sid, None)
+            if hospital_id is None:
+                return
+            sids = self._sids.get(hospital_id, set())
+            sids.discard(sid)
+            count = len(sids)
+            if not sids:
+                self._sids.pop(hospital_id, None)
+        staff_connections.set(count, hospital_id=str(hospital_id))
+
+    def online_count(self, hospital_id):
+        return len(self._sids.get(hospital_id, ())) + self._remote.get(hospital_id, 0)
+
+    def is_online(self, hospital_id):
+        return self.online_count(hospital_id) > 0
+
+    def authoritative(self):
+        """False until clients connected before a restart have had time to come back."""
+        return time.monotonic() - self._started_at >= self.warmup
+
+    def local_counts(self):
+        with self._lock:
+            return {hospital_id: len(sids) for hospital_id, sids in self._sids.items()}
+
+    def heartbeat(self):
+        """Publish this worker's counts and load every other worker's fresh ones."""
+        now = datetime.utcnow()
+        stale = now - timedelta(seconds=self.heartbeat_interval * 3)
+        StaffPresence.query.filter(
+            (StaffPresence.worker_id == self.worker_id) | (StaffPresence.heartbeat_at < stale)
+        ).delete(synchronize_session=False)
+        db.session.add_all([
+            StaffPresence(worker_id=self.worker_id, hospital_id=hospital_id,
+                          connections=connections, heartbeat_at=now)
+            for hospital_id, connections in self.local_counts().items()
+        ])
+        db.session.commit()
+        rows = db.session.query(StaffPresence.hospital_id, func.sum(StaffPresence.connections)).filter(
+            StaffPresence.worker_id != self.worker_id,
+            StaffPresence.heartbeat_at >= stale
+        ).group_by(StaffPresence.hospital_id).all()
+        self._remote = {hospital_id: int(connections) for hospital_id, connections in rows}
+
+    def start(self, app):
+        if self._running:
+            return
+        self._running = True
+        eventlet.spawn(self._run, app)
+
+    def stop(self):
+        self._running = False
+
+    def _run(self, app):
+        while self._running:
+            with app.app_context():
+                try:
+                    self.heartbeat()
+                except Exception:
+                    db.session.rollback()
+                    logger.exception("Presence heartbeat failed")
+                finally:
+                    db.session.remove()
+            eventlet.sleep(self.heartbeat_interval)
+
+
+presence = PresenceRegistry()
+
+
+def init_presence(app):
+    presence.configure(app)
+
+
+def start_presence_heartbeat(app):
+    """Share presence with the other workers through the staff_presence table."""
+    if app.config.get('PRESENCE_SHARED'):
+        presence.start(app)
@@ -3,11 +3,16 @@ from flask import Blueprint, abort, redirect, render_template, url_for, flash, r
 from flask_login import login_required, current_user
 from datetime import datetime
 from app.models import User, Admin, Bed, Hospital  
+from app.hospital_registry import hospital_registry
 from app import db
 from app.utils import send_email
+from app.worker_pool import PoolBusy, PoolTimeout
+from app.routes.auth import password_hashing_unavailable
 import secrets
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
+admin_bp.register_error_handler(PoolBusy, password_hashing_unavailable)
+admin_bp.register_error_handler(PoolTimeout, password_hashing_unavailable)
 
 def admin_required(f):
     @wraps(f)
@@ -68,7 +73,7 @@ def beds():
     page = request.args.get('page', 1, type=int)
     if current_user.privilege_level == 'super':
         beds = Bed.query.join(Hospital).filter(Hospital.is_test == False).order_by(Bed.id.desc()).paginate(page=page, per_page=10)
-        hospitals = Hospital.query.filter_by(is_test=False).order_by(Hospital.name).all()
+        hospitals = sorted(hospital_registry.all(include_test=False), key=lambda h: h.name)
     else:
         beds = Bed.query.filter_by(hospital_id=current_user.hospital_id).order_by(Bed.id.desc()).paginate(page=page, per_page=10)
         hospitals = None
@@ -108,7 +113,7 @@ def add_bed():
         page = 1
         if current_user.privilege_level == 'super':
             beds = Bed.query.join(Hospital).order_by(Bed.created_at.desc()).paginate(page=page, per_page=10)
-            hospitals = Hospital.query.order_by(Hospital.name).all()
+            hospitals = sorted(hospital_registry.all(), key=lambda h: h.name)
         else:
             beds = Bed.query.filter_by(hospital_id=current_user.hospital_id).order_by(Bed.created_at.desc()).paginate(page=page, per_page=10)
             hospitals = None
@@ -139,6 +144,9 @@ def remove_bed(bed_id):
     if bed.is_occupied:
         flash(f'Cannot remove bed {bed.bed_number} - it is currently occupied.', 'warning')
         return redirect(url_for('admin.beds'))
+    if bed.is_reserved:
+        flash(f'Cannot remove bed {bed.bed_number} - it is reserved for an incoming transfer.', 'warning')
+        return redirect(url_for('admin.beds'))
     
     try:
         db.session.delete(bed)
@@ -156,7 +164,7 @@ def admins():
     page = request.args.get('page', 1, type=int)
     if current_user.privilege_level == 'super':
         admins = Admin.query.join(Hospital).filter(Hospital.is_test == False).order_by(Admin.created_at.desc()).paginate(page=page, per_page=10)
-        hospitals = Hospital.query.filter_by(is_test=False).order_by(Hospital.name).all()
+        hospitals = sorted(hospital_registry.all(include_test=False), key=lambda h: h.name)
     else:
         admins = Admin.query.filter_by(hospital_id=current_user.hospital_id).order_by(Admin.created_at.desc()).paginate(page=page, per_page=10)
         hospitals = None
@@ -187,8 +195,7 @@ def add_admin():
         flash(f'Admin {email} added successfully.', 'success')
         # Send notification email with reset link
         try:
-            from app.models import Hospital
-            hospital = Hospital.query.get(admin.hospital_id)
+            hospital = hospital_registry.get(admin.hospital_id)
             reset_url = url_for('admin.reset_password', token=reset_token, _external=True)
             send_email(
                 subject="You have been added as an ICUConnect Admin",
@@ -302,7 +309,7 @@ def assign_admin():
     admin_id = request.form.get('admin_id')
     hospital_id = request.form.get('hospital_id')
     admin = Admin.query.get(admin_id)
-    hospital = Hospital.query.get(hospital_id)
+    hospital = hospital_registry.get(hospital_id)
     if not admin or not hospital:
         flash('Invalid admin or hospital.', 'danger')
         return redirect(url_for('admin.hospitals'))
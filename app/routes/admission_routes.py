@@ -3,10 +3,12 @@ from flask_login import login_required, current_user
 from datetime import datetime, timedelta
 from sqlalchemy import func, cast, Date, Interval
 from app import db
-from app.models import Hospital, Admission, Bed
+from app.models import Admission, Bed
+from app.hospital_registry import hospital_registry
+from app.cache_versions import conditional
 from app.utils import get_current_local_time, to_utc_time, to_local_time, local_date_to_utc, get_local_timezone
-import pytz
-from app import socketio
+from app.bed_updates import bed_updates
+from app.bed_reservations import occupy_bed
 import logging
 
 admission_bp = Blueprint('admission', __name__)
@@ -14,7 +16,7 @@ admission_bp = Blueprint('admission', __name__)
 @admission_bp.route('/admissions')
 @login_required
 def admissions():
-    hospital = Hospital.query.get(current_user.hospital_id)
+    hospital = hospital_registry.get(current_user.hospital_id)
     now = get_current_local_time(hospital)
     today = now.date()
     yesterday = today - timedelta(days=1)
@@ -124,18 +126,19 @@ def calculate_percentage_change(current_value, previous_value):
     
 @admission_bp.route('/api/available-beds')
 @login_required
+@conditional(lambda: f'beds:{current_user.hospital_id}')
 def available_beds():
-    hospital = Hospital.query.get(current_user.hospital_id)
+    hospital = hospital_registry.get(current_user.hospital_id)
     reserved_bed_number = request.args.get('reserved_bed_number', type=int)
     if reserved_bed_number:
         beds = Bed.query.filter(
             Bed.hospital_id == hospital.id,
-            ((Bed.is_occupied == False) | (Bed.bed_number == reserved_bed_number))
+            (Bed.available_filter() | (Bed.bed_number == reserved_bed_number))
         ).order_by(Bed.bed_number.asc()).all()
     else:
-        beds = Bed.query.filter_by(
-            hospital_id=hospital.id, 
-            is_occupied=False
+        beds = Bed.query.filter(
+            Bed.hospital_id == hospital.id,
+            Bed.available_filter()
         ).order_by(Bed.bed_number.asc()).all()
     response = {
         'success': True,
@@ -150,12 +153,8 @@ def available_beds():
 @admission_bp.route('/api/admit', methods=['POST'])
 @login_required
 def admit_patient():
-    import time
-    from sqlalchemy import func, case
-    start_time = time.time()
     try:
-        step1 = time.time()
-        hospital = Hospital.query.get(current_user.hospital_id)
+        hospital = hospital_registry.get(current_user.hospital_id)
         bed_number = request.json['bed_number']
         reserved_bed_number = request.json.get('reserved_bed_number')
 
@@ -166,12 +165,11 @@ def admit_patient():
                 bed_number=bed_number
             ).first()
         else:
-            bed = Bed.query.filter_by(
-                hospital_id=hospital.id,
-                bed_number=bed_number,
-                is_occupied=False
+            bed = Bed.query.filter(
+                Bed.hospital_id == hospital.id,
+                Bed.bed_number == bed_number,
+                Bed.available_filter()
             ).first()
-        step2 = time.time()
 
         if not bed:
             return jsonify({
@@ -191,47 +189,12 @@ def admit_patient():
             gender=request.json['gender'],
             admission_time=to_utc_time(get_current_local_time(hospital), hospital)
         )
-        bed.is_occupied = True
+        occupy_bed(bed)
         db.session.add(admission)
-        step3 = time.time()
         db.session.commit()
         db.session.expire_all()
-        step4 = time.time()
-
-        # Optimized hospitals_data aggregation
-        all_hospitals = Hospital.query.all()
-        hospital_ids = [h.id for h in all_hospitals]
-        bed_counts = {row[0]: {'total': row[1], 'available': row[2]} for row in db.session.query(
-            Bed.hospital_id,
-            func.count(Bed.id),
-            func.sum(case((Bed.is_occupied == False, 1), else_=0))
-        ).filter(Bed.hospital_id.in_(hospital_ids)).group_by(Bed.hospital_id).all()}
-        hospitals_data = []
-        for h in all_hospitals:
-            counts = bed_counts.get(h.id, {'total': 0, 'available': 0})
-            hospitals_data.append({
-                'id': h.id,
-                'name': h.name,
-                'lat': h.latitude,
-                'lng': h.longitude,
-                'level': h.level,
-                'beds': counts['total'],
-                'available': counts['available']
-            })
-
-        # Emit bed_stats_update for real-time dashboard update
-        hospital_stats = {
-            'hospital_id': hospital.id,
-            'total_beds': bed_counts.get(hospital.id, {'total': 0})['total'],
-            'available_beds': bed_counts.get(hospital.id, {'available': 0})['available'],
-        }
-        socketio.emit('bed_stats_update', {
-            'hospital_stats': hospital_stats,
-            'hospitals': hospitals_data
-        })
-        step5 = time.time()
 
-        print(f"[PROFILE] /api/admit: total={step5-start_time:.2f}s | bed_lookup={step2-step1:.2f}s | admission_create={step3-step2:.2f}s | commit={step4-step3:.2f}s | socket_emit={step5-step4:.2f}s")
+        bed_updates.publish(hospital.id)
 
         return jsonify({
             'success': True,
@@ -248,7 +211,7 @@ def admit_patient():
 @admission_bp.route('/timezone-test')
 @login_required
 def timezone_test():
-    hospital = Hospital.query.get(current_user.hospital_id)
+    hospital = hospital_registry.get(current_user.hospital_id)
     now = datetime.utcnow()
     
     # Get various time representations
@@ -257,8 +220,8 @@ def timezone_test():
     current_local = get_current_local_time(hospital)
     
     # Get timezone info
-    timezone = get_local_timezone(hospital)
-    tz_info = pytz.timezone(timezone)
+    timezone = hospital.timezone
+    tz_info = get_local_timezone(hospital)
     
     # Create a sample admission time (1 hour ago)
     one_hour_ago_utc = now - timedelta(hours=1)
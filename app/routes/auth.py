@@ -1,10 +1,12 @@
 import re
 from flask import Blueprint, render_template, redirect, request, url_for, flash
 from flask_login import login_user, logout_user, current_user
-from app.models import Hospital, User, Admin
+from app.models import User, Admin
+from app.hospital_registry import hospital_registry
 from app import db
 import logging
 from app.utils import send_email
+from app.worker_pool import PoolBusy, PoolTimeout
 import secrets
 
 auth_bp = Blueprint('auth', __name__)
@@ -13,6 +15,17 @@ auth_bp = Blueprint('auth', __name__)
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+@auth_bp.errorhandler(PoolBusy)
+@auth_bp.errorhandler(PoolTimeout)
+def password_hashing_unavailable(e):
+    """Answer a saturated hash pool on the page that was submitted (also used by the admin blueprint)."""
+    logger.warning(f"{request.endpoint} rejected: {e}")
+    if request.endpoint in ('auth.reset_password', 'admin.reset_password'):
+        return render_template('admin/reset_password.html', token=request.view_args.get('token'),
+                               error_message="Password reset is busy right now, please try again in a moment."), 503
+    errors = {'password': "Login is busy right now, please try again in a moment."}
+    return render_template('auth/login.html', errors=errors, email=request.form.get('email', '')), 503
+
 @auth_bp.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
@@ -42,7 +55,8 @@ def login():
             # Render the login template with errors and keep email filled in
             return render_template('auth/login.html', errors=errors, email=email)
 
-        # Login successful, redirect accordingly
+        # Login successful; persist any password rehash done by check_password
+        db.session.commit()
         if admin:
             login_user(admin)
             flash('Admin login successful!', 'success')
@@ -76,7 +90,7 @@ def signup():
                 error_msg = f"Missing required fields: {', '.join(missing)}"
                 logger.warning(error_msg)
                 return render_template('auth/signup.html',
-                                    hospitals=Hospital.query.filter_by(is_active=True, is_test=False).all(),
+                                    hospitals=hospital_registry.all(include_test=False, active_only=True),
                                     show_error_modal=True,
                                     error_message=error_msg)
 
@@ -88,17 +102,17 @@ def signup():
                 error_msg = "Please use a valid email address."
                 logger.warning(error_msg)
                 return render_template('auth/signup.html',
-                                    hospitals=Hospital.query.filter_by(is_active=True, is_test=False).all(),
+                                    hospitals=hospital_registry.all(include_test=False, active_only=True),
                                     show_error_modal=True,
                                     error_message=error_msg)
 
             # Validate hospital
-            hospital = Hospital.query.get(required['hospital'])
+            hospital = hospital_registry.get(required['hospital'])
             if not hospital:
                 error_msg = "Invalid hospital selected"
                 logger.error(error_msg)
                 return render_template('auth/signup.html',
-                                    hospitals=Hospital.query.filter_by(is_active=True, is_test=False).all(),
+                                    hospitals=hospital_registry.all(include_test=False, active_only=True),
                                     show_error_modal=True,
                                     error_message=error_msg)
 
@@ -108,7 +122,7 @@ def signup():
                 error_msg = "Email already registered"
                 logger.warning(error_msg)
                 return render_template('auth/signup.html',
-                                    hospitals=Hospital.query.filter_by(is_active=True, is_test=False).all(),
+                                    hospitals=hospital_registry.all(include_test=False, active_only=True),
                                     show_error_modal=True,
                                     error_message=error_msg)
 
@@ -156,20 +170,20 @@ def signup():
                 logger.warning(f"Failed to notify admin(s): {e}")
 
             return render_template('auth/signup.html',
-                                hospitals=Hospital.query.filter_by(is_active=True, is_test=False).all(),
+                                hospitals=hospital_registry.all(include_test=False, active_only=True),
                                 show_success_modal=True)
 
         except Exception as e:
             db.session.rollback()
             logger.exception(f"Signup failed: {str(e)}")
             return render_template('auth/signup.html',
-                                hospitals=Hospital.query.filter_by(is_active=True, is_test=False).all(),
+                                hospitals=hospital_registry.all(include_test=False, active_only=True),
                                 show_error_modal=True,
                                 error_message=f"Server error: {str(e)}")
 
     # GET request
     return render_template('auth/signup.html',
-                         hospitals=Hospital.query.filter_by(is_active=True, is_test=False).all(),
+                         hospitals=hospital_registry.all(include_test=False, active_only=True),
                          show_success_modal=False,
                          show_error_modal=False)
 
@@ -2,20 +2,20 @@ from flask import Blueprint, render_template, request, jsonify
 from flask_login import login_required, current_user
 from datetime import datetime, timedelta
 from app import db
-from app.models import Discharge, Admission, Hospital
+from app.models import Discharge, Admission
+from app.hospital_registry import hospital_registry
+from app.cache_versions import conditional
 from sqlalchemy.orm import joinedload
-from app.utils import get_current_local_time, to_utc_time, to_local_time
-from app import socketio
-from sqlalchemy import func, case
-from app.models import Bed
+from app.utils import get_current_local_time, to_utc_time, to_local_time, to_local_times
+from app.bed_updates import bed_updates
 
 discharge_bp = Blueprint('discharge', __name__)
 
 @discharge_bp.route('/discharges')
 @login_required
 def discharges():
-    hospital = current_user.hospital
-    now = get_current_local_time()
+    hospital = hospital_registry.get(current_user.hospital_id)
+    now = get_current_local_time(hospital)
     today = now.date()
     yesterday = today - timedelta(days=1)
     
@@ -30,8 +30,9 @@ def discharges():
     discharges = base_query.all()
     
     discharges_by_date = {}
-    for discharge in discharges:
-        date = discharge.local_discharge_time.date()
+    local_times = to_local_times([discharge.discharge_time for discharge in discharges], hospital)
+    for discharge, local_time in zip(discharges, local_times):
+        date = local_time.date()
         if date not in discharges_by_date:
             discharges_by_date[date] = []
         discharges_by_date[date].append(discharge)
@@ -51,6 +52,7 @@ def discharges():
 
 @discharge_bp.route('/api/current-patients')
 @login_required
+@conditional(lambda: f'admissions:{current_user.hospital_id}')
 def current_patients():
     try:
         patients = Admission.query.options(joinedload(Admission.bed)).filter_by(
@@ -107,11 +109,7 @@ def api_discharge():
             }), 400
         
         # Check if there's already a discharge record for this admission
-        existing_discharge = Discharge.query.filter_by(
-            hospital_id=current_user.hospital_id,
-            patient_name=admission.patient_name,
-            admission_time=admission.admission_time
-        ).first()
+        existing_discharge = Discharge.query.filter_by(admission_id=admission.id).first()
         
         if existing_discharge:
             return jsonify({
@@ -120,7 +118,7 @@ def api_discharge():
             }), 400
         
         # Get the hospital for timezone conversion
-        hospital = Hospital.query.get(current_user.hospital_id)
+        hospital = hospital_registry.get(current_user.hospital_id)
         
         # Update admission record
         admission.status = 'Discharged'
@@ -134,6 +132,7 @@ def api_discharge():
         # Create discharge record
         discharge = Discharge(
             hospital_id=current_user.hospital_id,
+            admission_id=admission.id,
             patient_name=admission.patient_name,
             admission_time=admission.admission_time,
             discharge_time=admission.discharge_time,
@@ -146,36 +145,7 @@ def api_discharge():
         db.session.add(discharge)
         db.session.commit()
         
-        # Optimized hospitals_data aggregation
-        all_hospitals = Hospital.query.all()
-        hospital_ids = [h.id for h in all_hospitals]
-        bed_counts = {row[0]: {'total': row[1], 'available': row[2]} for row in db.session.query(
-            Bed.hospital_id,
-            func.count(Bed.id),
-            func.sum(case((Bed.is_occupied == False, 1), else_=0))
-        ).filter(Bed.hospital_id.in_(hospital_ids)).group_by(Bed.hospital_id).all()}
-        hospitals_data = []
-        for h in all_hospitals:
-            counts = bed_counts.get(h.id, {'total': 0, 'available': 0})
-            hospitals_data.append({
-                'id': h.id,
-                'name': h.name,
-                'lat': h.latitude,
-                'lng': h.longitude,
-                'level': h.level,
-                'beds': counts['total'],
-                'available': counts['available']
-            })
-        # Emit bed_stats_update for real-time dashboard update
-        hospital_stats = {
-            'hospital_id': hospital.id,
-            'total_beds': bed_counts.get(hospital.id, {'total': 0})['total'],
-            'available_beds': bed_counts.get(hospital.id, {'available': 0})['available'],
-        }
-        socketio.emit('bed_stats_update', {
-            'hospital_stats': hospital_stats,
-            'hospitals': hospitals_data
-        })
+        bed_updates.publish(hospital.id)
         
         return jsonify({
             'success': True,
@@ -194,7 +164,7 @@ def api_discharge():
 @login_required
 def discharge_patient(admission_id):
     try:
-        hospital = Hospital.query.get(current_user.hospital_id)
+        hospital = hospital_registry.get(current_user.hospital_id)
         admission = Admission.query.get_or_404(admission_id)
         
         if admission.hospital_id != hospital.id:
@@ -25,7 +25,7 @@ def dashboard():
         pending_users = pending_query.all()
         
         # Get hospital name for the dashboard title
-        hospital_name = current_user.hospital.name if current_user.privilege_level == 'hospital' else "All Hospitals"
+        hospital_name = current_user.hospital_name if current_user.privilege_level == 'hospital' else "All Hospitals"
         
         return render_template('admin/dashboard.html',
                             pending_users=pending_users,
@@ -1,45 +1,67 @@
 # Exclude test hospitals for rediction calculations
 from flask import Blueprint, request, jsonify
-import pickle
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-import os
 from statsmodels.tsa.arima.model import ARIMAResults
-from app.models import Hospital, Bed, Admission, Discharge
+from app.models import Bed, Admission, Discharge
+from app.hospital_registry import hospital_registry
+from app.prediction_pool import prediction_pool, PoolBusy, PoolTimeout
+from app.forecast_artifacts import forecast_artifacts
+from app.single_flight import SingleFlight, coalesce
+from app.cache_versions import conditional
 from sqlalchemy import func
 import json
 from app import db
 
 prediction_bp = Blueprint('prediction', __name__)
 
-# --- Caching for Excel and ARIMA model ---
-excel_cache = None
-model_cache = None
+# Identical concurrent dashboard/trend requests share one computation (see app/single_flight.py)
+prediction_flight = SingleFlight('prediction')
 
-def get_excel_data():
-    global excel_cache
-    if excel_cache is None:
-        dataset_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'app', 'Dataset', 'Dataset1.xlsx')
-        excel_cache = pd.read_excel(dataset_path)
-    return excel_cache
+# Hospital level weights (more aggressive for realistic surge distribution)
+LEVEL_WEIGHTS = {
+    2: 2.5,  # Level 2: Much higher demand (dispensaries/health centers)
+    3: 2.0,  # Level 3: Higher demand (sub-county hospitals)
+    4: 1.8,  # Level 4: High demand (county hospitals)
+    5: 0.6,  # Level 5: Lower demand (county referral hospitals)
+    6: 0.2   # Level 6: Much lower demand (national referral hospitals)
+}
+
+@prediction_bp.record_once
+def configure_prediction_pool(state):
+    config = state.app.config
+    prediction_pool.configure(
+        max_workers=config.get('PREDICTION_POOL_WORKERS', 2),
+        max_queue=config.get('PREDICTION_POOL_QUEUE', 8),
+        timeout=config.get('PREDICTION_TIMEOUT', 30)
+    )
+    prediction_flight.ttl = config.get('PREDICTION_CACHE_TTL', 10)
+
+@prediction_bp.errorhandler(PoolBusy)
+@prediction_bp.errorhandler(PoolTimeout)
+def prediction_unavailable(e):
+    return jsonify({'error': str(e)}), 503
+
+# Model and dataset are loaded once per worker (see app/forecast_artifacts.py)
+def get_occupancy_data():
+    if forecast_artifacts.loaded:
+        return forecast_artifacts.get_occupancy()
+    return prediction_pool.run(forecast_artifacts.get_occupancy)
 
 def get_arima_model():
-    global model_cache
-    if model_cache is None:
-        model_cache = load_arima_model()
-    return model_cache
-
-def load_arima_model():
-    """Load the trained ARIMA model"""
-    model_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'models', 'arima_model1.pkl')
-    try:
-        with open(model_path, 'rb') as f:
-            model = pickle.load(f)
-        return model
-    except Exception as e:
-        print(f"Error loading model: {e}")
-        return None
+    if forecast_artifacts.loaded:
+        return forecast_artifacts.get_model()
+    return prediction_pool.run(forecast_artifacts.get_model)
+
+def weekly_occupancy(occupancy, weeks):
+    """Resample the daily occupancy series to mean weekly occupancy (runs on the prediction pool)"""
+    return occupancy.resample('W-SUN').mean()[-weeks:]
+
+def total_weighted_capacity(hospitals):
+    """Sum of bed counts weighted by hospital level, from a single grouped query"""
+    bed_counts = dict(db.session.query(Bed.hospital_id, func.count(Bed.id)).group_by(Bed.hospital_id).all())
+    return sum(bed_counts.get(h.id, 0) * LEVEL_WEIGHTS.get(h.level, 1.0) for h in hospitals)
 
 @prediction_bp.route('/predict/occupancy', methods=['POST'])
 def predict_occupancy():
@@ -57,7 +79,7 @@ def predict_occupancy():
         hospital_id = data.get('hospital_id')
 
         # Make prediction
-        forecast = model.forecast(steps=weeks_ahead)
+        forecast = prediction_pool.run(model.forecast, steps=weeks_ahead)
         predictions = [round(float(pred), 2) for pred in forecast]
 
         # Proportional allocation logic
@@ -72,7 +94,7 @@ def predict_occupancy():
         predicted_week_end = None
         if hospital_id is not None:
             # Get hospital from DB
-            hospital = Hospital.query.get(hospital_id)
+            hospital = hospital_registry.get(hospital_id)
             if not hospital:
                 return jsonify({'error': f'Hospital with id {hospital_id} not found'}), 404
             # Count beds for this hospital
@@ -80,31 +102,18 @@ def predict_occupancy():
             # Calculate total system capacity (sum of all beds)
             total_system_capacity = Bed.query.count() or 1
             
-            # Define hospital level weights (more aggressive for realistic surge distribution)
-            level_weights = {
-                2: 2.5,  # Level 2: Much higher demand (dispensaries/health centers)
-                3: 2.0,  # Level 3: Higher demand (sub-county hospitals)
-                4: 1.8,  # Level 4: High demand (county hospitals)
-                5: 0.6,  # Level 5: Lower demand (county referral hospitals)
-                6: 0.2   # Level 6: Much lower demand (national referral hospitals)
-            }
-            
             # Calculate weighted bed capacity for this hospital
-            hospital_weight = level_weights.get(hospital.level, 1.0)
+            hospital_weight = LEVEL_WEIGHTS.get(hospital.level, 1.0)
             weighted_hospital_capacity = hospital_capacity * hospital_weight
             
             # Calculate total weighted system capacity
-            all_hospitals = Hospital.query.filter_by(is_test=False).all()
-            total_weighted_capacity = 0
-            for hosp in all_hospitals:
-                hosp_beds = Bed.query.filter_by(hospital_id=hosp.id).count()
-                hosp_weight = level_weights.get(hosp.level, 1.0)
-                total_weighted_capacity += hosp_beds * hosp_weight
+            all_hospitals = hospital_registry.all(include_test=False)
+            system_weighted_capacity = total_weighted_capacity(all_hospitals)
             
             # Use weighted allocation if hospital has a level, else fall back to proportional by bed count
-            if hospital.level and hospital.level in level_weights:
+            if hospital.level and hospital.level in LEVEL_WEIGHTS:
                 # Weighted allocation based on hospital level
-                proportional_forecast = predictions[0] * (weighted_hospital_capacity / total_weighted_capacity)
+                proportional_forecast = predictions[0] * (weighted_hospital_capacity / system_weighted_capacity)
                 print(f"Hospital {hospital.name} (Level {hospital.level}): Using weighted allocation")
             else:
                 # Fallback to proportional by bed count
@@ -117,8 +126,7 @@ def predict_occupancy():
             proportional_threshold = 0.8 * hospital_capacity
             proportional_percent = round((proportional_occupied / hospital_capacity) * 100, 1) if hospital_capacity else 0
             proportional_surge_alert = proportional_forecast >= proportional_threshold
-            # Get the prediction week from the ARIMA model's forecast index
-            forecast = model.forecast(steps=1)
+            # Get the prediction week from the ARIMA model's forecast index (first forecast step)
             if hasattr(forecast, 'index') and len(forecast.index) > 0:
                 pred_week_end = forecast.index[0].date()
                 pred_week_start = pred_week_end - timedelta(days=6)
@@ -188,6 +196,8 @@ def predict_occupancy():
 
         return jsonify(response)
 
+    except (PoolBusy, PoolTimeout):
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -240,11 +250,12 @@ def health_check():
         }), 500
 
 @prediction_bp.route('/current_occupancy', methods=['GET'])
+@coalesce(prediction_flight)
 def current_occupancy():
     hospital_id = request.args.get('hospital_id', type=int)
     if not hospital_id:
         return jsonify({'error': 'hospital_id is required'}), 400
-    hospital = Hospital.query.get(hospital_id)
+    hospital = hospital_registry.get(hospital_id)
     if not hospital:
         return jsonify({'error': 'Hospital not found'}), 404
 
@@ -282,43 +293,36 @@ def current_occupancy():
     })
 
 @prediction_bp.route('/icu_trend', methods=['GET'])
+@conditional('bed_capacity', 'hospitals')
+@coalesce(prediction_flight)
 def icu_trend():
     """Return historical and predicted weekly occupancy for a hospital, with actual week dates."""
     from sqlalchemy import func
     hospital_id = request.args.get('hospital_id', type=int)
     if not hospital_id:
         return jsonify({'error': 'hospital_id is required'}), 400
-    hospital = Hospital.query.get(hospital_id)
+    hospital = hospital_registry.get(hospital_id)
     if not hospital:
         return jsonify({'error': 'Hospital not found'}), 404
 
     # Load weekly dates from ARIMA training data (Dataset1.xlsx)
-    df = get_excel_data()
-    df['date'] = pd.to_datetime(df['date'])
-    df = df.set_index('date')
-    occ_col = 'total_ped_icu_patients' if 'total_ped_icu_patients' in df.columns else 'occupied_ped_icu_beds'
-    weekly_df = df[occ_col].resample('W-SUN').mean()
-    weekly_df = weekly_df[-4:]  
+    weekly_df = prediction_pool.run(weekly_occupancy, get_occupancy_data(), 4)
     weekly_dates = weekly_df.index
 
-    level_weights = {2: 2.5, 3: 2.0, 4: 1.8, 5: 0.6, 6: 0.2}
-    weekly_occupancy = []
+    weekly_occupancy_data = []
     hospital_capacity = Bed.query.filter_by(hospital_id=hospital_id).count()
-    hospital_weight = level_weights.get(hospital.level, 1.0)
-    all_hospitals = Hospital.query.filter_by(is_test=False).all()
+    hospital_weight = LEVEL_WEIGHTS.get(hospital.level, 1.0)
+    all_hospitals = hospital_registry.all(include_test=False)
+    system_weighted_capacity = total_weighted_capacity(all_hospitals)
+    weighted_hospital_capacity = hospital_capacity * hospital_weight
 
     for week_end in weekly_dates:
         week_start = week_end - timedelta(days=6)
         system_occupied = weekly_df.loc[week_end]
-        total_weighted_capacity = sum(
-            Bed.query.filter_by(hospital_id=h.id).count() * level_weights.get(h.level, 1.0)
-            for h in all_hospitals
-        )
-        weighted_hospital_capacity = hospital_capacity * hospital_weight
-        weighted_share = weighted_hospital_capacity / total_weighted_capacity if total_weighted_capacity > 0 else 0
+        weighted_share = weighted_hospital_capacity / system_weighted_capacity if system_weighted_capacity > 0 else 0
         hospital_occupied = min(int(round(system_occupied * weighted_share)), hospital_capacity)
         percent = round((hospital_occupied / hospital_capacity) * 100, 1) if hospital_capacity else 0
-        weekly_occupancy.append({
+        weekly_occupancy_data.append({
             'week_start': week_start.strftime('%b %d, %Y'),
             'week_end': week_end.strftime('%b %d, %Y'),
             'percent': percent,
@@ -328,14 +332,9 @@ def icu_trend():
 
     # Prediction logic (as before)
     model = get_arima_model()
-    forecast = model.forecast(steps=1)
-    system_prediction = float(forecast[0])
-    total_weighted_capacity = sum(
-        Bed.query.filter_by(hospital_id=h.id).count() * level_weights.get(h.level, 1.0)
-        for h in all_hospitals
-    )
-    weighted_hospital_capacity = hospital_capacity * hospital_weight
-    proportional_forecast = system_prediction * (weighted_hospital_capacity / total_weighted_capacity) if total_weighted_capacity > 0 else 0
+    forecast = prediction_pool.run(model.forecast, steps=1)
+    system_prediction = float(forecast.iloc[0]) if hasattr(forecast, 'iloc') else float(forecast[0])
+    proportional_forecast = system_prediction * (weighted_hospital_capacity / system_weighted_capacity) if system_weighted_capacity > 0 else 0
     proportional_forecast = min(proportional_forecast, hospital_capacity)
     proportional_occupied = int(round(proportional_forecast))
     proportional_percent = round((proportional_occupied / hospital_capacity) * 100, 1) if hospital_capacity else 0
@@ -349,7 +348,7 @@ def icu_trend():
     else:
         predicted_week_start = ''
         predicted_week_end = ''
-    weekly_occupancy.append({
+    weekly_occupancy_data.append({
         'week_start': predicted_week_start,
         'week_end': predicted_week_end,
         'percent': proportional_percent,
@@ -360,43 +359,33 @@ def icu_trend():
     })
 
     return jsonify({
-        'weekly_occupancy': weekly_occupancy,
+        'weekly_occupancy': weekly_occupancy_data,
         'surge_threshold': 80
     })
 
 @prediction_bp.route('/occupancy_distribution', methods=['GET'])
+@coalesce(prediction_flight)
 def occupancy_distribution():
     """Return the weekly occupancy distribution for a hospital (last 10 weeks, weighted, binned)."""
-    import os
-    import pandas as pd
     hospital_id = request.args.get('hospital_id', type=int)
     if not hospital_id:
         return jsonify({'error': 'hospital_id is required'}), 400
-    hospital = Hospital.query.get(hospital_id)
+    hospital = hospital_registry.get(hospital_id)
     if not hospital:
         return jsonify({'error': 'Hospital not found'}), 404
     # Load weekly data from Dataset1.xlsx
-    df = get_excel_data().copy()
-    df['date'] = pd.to_datetime(df['date'])
-    df = df.set_index('date')
-    occ_col = 'total_ped_icu_patients' if 'total_ped_icu_patients' in df.columns else 'occupied_ped_icu_beds'
-    weekly_df = df[occ_col].resample('W-SUN').mean()
-    weekly_df = weekly_df[-50:]  # Last 10 weeks
+    weekly_df = prediction_pool.run(weekly_occupancy, get_occupancy_data(), 50)  # Last 50 weeks
     weekly_dates = weekly_df.index
-    level_weights = {2: 2.5, 3: 2.0, 4: 1.8, 5: 0.6, 6: 0.2}
     hospital_capacity = Bed.query.filter_by(hospital_id=hospital_id).count()
-    hospital_weight = level_weights.get(hospital.level, 1.0)
-    all_hospitals = Hospital.query.filter_by(is_test=False).all()
+    hospital_weight = LEVEL_WEIGHTS.get(hospital.level, 1.0)
+    all_hospitals = hospital_registry.all(include_test=False)
+    system_weighted_capacity = total_weighted_capacity(all_hospitals)
+    weighted_hospital_capacity = hospital_capacity * hospital_weight
     # Calculate weighted occupancy for each week
     percents = []
     for week_end in weekly_dates:
         system_occupied = weekly_df.loc[week_end]
-        total_weighted_capacity = sum(
-            Bed.query.filter_by(hospital_id=h.id).count() * level_weights.get(h.level, 1.0)
-            for h in all_hospitals
-        )
-        weighted_hospital_capacity = hospital_capacity * hospital_weight
-        weighted_share = weighted_hospital_capacity / total_weighted_capacity if total_weighted_capacity > 0 else 0
+        weighted_share = weighted_hospital_capacity / system_weighted_capacity if system_weighted_capacity > 0 else 0
         hospital_occupied = min(int(round(system_occupied * weighted_share)), hospital_capacity)
         percent = round((hospital_occupied / hospital_capacity) * 100, 1) if hospital_capacity else 0
         percents.append(percent)
@@ -4,9 +4,16 @@ from datetime import datetime, timedelta
 from app import db
 from app.models import Hospital, Admission, ReferralRequest, ReferralResponse, HospitalContact, PatientTransfer, Bed, UserSettings, User
 from app.utils import get_current_local_time, to_utc_time
+from app.hospital_registry import hospital_registry
+from sqlalchemy.orm import joinedload, selectinload
 import json
+import uuid
 from flask_socketio import emit
-from app import socketio
+from app.bed_updates import bed_updates
+from app.socket_codec import send_to_hospital, send_to_hospitals
+from app.event_replay import notify_hospital, replay_buffer
+from app.presence import presence
+from app.bed_reservations import reserve_bed
 import logging
 
 referral_bp = Blueprint('referral', __name__)
@@ -35,12 +42,17 @@ def debug_hospital_settings():
     
     hospitals_data = []
     
-    for hospital in Hospital.query.all():
-        users = User.query.filter_by(hospital_id=hospital.id).all()
+    # One query per level instead of one per hospital and per user
+    hospitals = Hospital.query.options(
+        selectinload(Hospital.users).selectinload(User.settings)
+    ).all()
+    
+    for hospital in hospitals:
+        users = hospital.users
         users_data = []
         
         for user in users:
-            settings = UserSettings.query.filter_by(user_id=user.id).first()
+            settings = user.settings[0] if user.settings else None
             users_data.append({
                 'user_id': user.id,
                 'email': user.email,
@@ -64,26 +76,8 @@ def debug_hospital_settings():
 @login_required
 def referrals():
     """Main referrals page"""
-    hospital = Hospital.query.get(current_user.hospital_id)
-    
-    # Get all hospitals with available beds
-    all_hospitals = Hospital.query.all()
-    hospitals_with_beds = []
-    
-    for h in all_hospitals:
-        if h.id != hospital.id and h.available_beds > 0:  # Exclude current hospital
-            hospitals_with_beds.append({
-                'id': h.id,
-                'name': h.name,
-                'available_beds': h.available_beds,
-                'level': h.level,
-                'lat': h.latitude,
-                'lng': h.longitude,
-                'distance': calculate_distance(hospital.latitude, hospital.longitude, h.latitude, h.longitude)
-            })
-    
-    # Sort by distance (closest first)
-    hospitals_with_beds.sort(key=lambda x: x['distance'])
+    hospital = hospital_registry.get(current_user.hospital_id)
+    hospitals_with_beds = _referral_candidates(hospital)
     
     return render_template('users/referrals.html',
                          hospital=hospital,
@@ -100,7 +94,12 @@ def initiate_referral():
             current_app.logger.error(f"Invalid JSON: {e}")
             return jsonify({'success': False, 'message': 'Invalid JSON'}), 400
         current_app.logger.debug(f"Received data: {data}")
-        requesting_hospital = Hospital.query.get(current_user.hospital_id)
+        requesting_hospital = hospital_registry.get(current_user.hospital_id)
+        
+        # Offer the patient to several hospitals at once; the first to accept gets the transfer
+        if data.get('target_hospital_ids') or data.get('multicast') is not None:
+            return _initiate_multicast(data, requesting_hospital)
+        
         target_hospital_id = data.get('target_hospital_id')
         current_app.logger.debug(f"Target hospital ID: {target_hospital_id}, Type: {type(target_hospital_id)}")
         
@@ -123,8 +122,9 @@ def initiate_referral():
             }), 400
         
         # Check if target hospital has available beds
-        target_hospital = Hospital.query.get(target_hospital_id)
-        if not target_hospital or target_hospital.available_beds <= 0:
+        target_hospital = hospital_registry.get(target_hospital_id)
+        if not target_hospital or Bed.query.filter(
+                Bed.hospital_id == target_hospital_id, Bed.available_filter()).count() <= 0:
             current_app.logger.error(f"Target hospital {target_hospital_id} has no available beds")
             return jsonify({
                 'success': False,
@@ -156,27 +156,37 @@ def initiate_referral():
         
         current_app.logger.info(f"Referral created successfully with ID: {referral.id}")
         
+        # Nobody at the target can see an urgent referral: send it on now rather than after the timeout
+        if urgency_level == 'High' and presence.authoritative() and not presence.is_online(target_hospital_id):
+            escalation_hospital = hospital_registry.get(_escalation_hospital_id())
+            if escalation_hospital and escalation_hospital.id != target_hospital_id:
+                current_app.logger.info(f"No staff online at {target_hospital.name}; escalating referral {referral.id}")
+                new_referral = _escalate(referral, escalation_hospital, escalation_hospital.notification_duration,
+                                         f'nobody at {target_hospital.name} is online')
+                if new_referral is None:
+                    return jsonify({
+                        'success': True,
+                        'referral_id': referral.id,
+                        'message': f'Referral was answered by {target_hospital.name}'
+                    }), 200
+                return jsonify({
+                    'success': True,
+                    'referral_id': new_referral.id,
+                    'escalated_from': referral.id,
+                    'escalated_to': escalation_hospital.name,
+                    'message': f'No staff online at {target_hospital.name}; referral sent to {escalation_hospital.name}',
+                    'timeout_seconds': escalation_hospital.notification_duration
+                }), 200
+        
         # Get target hospital's notification duration setting
         notification_duration = target_hospital.notification_duration
         current_app.logger.debug(f"DEBUG: Target hospital ID: {target_hospital_id}")
         current_app.logger.debug(f"DEBUG: Target hospital name: {target_hospital.name}")
         current_app.logger.debug(f"DEBUG: Target hospital notification duration: {notification_duration}")
         
-        referral_data = {
-            'id': referral.id,
-            'target_hospital_id': referral.target_hospital_id,
-            'patient_age': referral.patient_age,
-            'patient_gender': referral.patient_gender,
-            'primary_diagnosis': referral.primary_diagnosis,
-            'current_treatment': referral.current_treatment,
-            'reason': referral.reason_for_referral,
-            'urgency': referral.urgency_level,
-            'special_requirements': referral.special_requirements,
-            'requesting_hospital': referral.requesting_hospital.name,
-            'time_remaining': notification_duration
-        }
+        referral_data = _new_referral_data(referral, notification_duration)
         current_app.logger.debug(f"DEBUG: Sending referral_data with time_remaining: {referral_data['time_remaining']}")
-        socketio.emit('new_referral', referral_data)
+        notify_hospital(referral.target_hospital_id, 'new_referral', referral_data)
         
         return jsonify({
             'success': True,
@@ -197,14 +207,13 @@ def initiate_referral():
 @login_required
 def respond_to_referral():
     try:
-        from sqlalchemy import func, case
         try:
             data = request.get_json(force=True)
         except Exception as e:
             current_app.logger.error(f"Invalid JSON: {e}")
             return jsonify({'success': False, 'message': 'Invalid JSON'}), 400
         current_app.logger.debug(f"Received data: {data}")
-        responding_hospital = Hospital.query.get(current_user.hospital_id)
+        responding_hospital = hospital_registry.get(current_user.hospital_id)
         referral_id = data.get('referral_id')
         if not referral_id:
             current_app.logger.error("Missing referral_id")
@@ -227,19 +236,29 @@ def respond_to_referral():
                 'message': 'Referral request not found or already processed'
             }), 404
         # Update referral status
+        withdrawn = []
         if response_type == 'accept':
-            referral.status = 'Accepted'
-            referral.responded_at = datetime.utcnow()
-            # Book a bed: find an available bed and mark it as occupied
-            available_bed = Bed.query.filter_by(
-                hospital_id=referral.target_hospital_id,
-                is_occupied=False
-            ).first()
-            if available_bed:
-                available_bed.is_occupied = True  # Reserve the bed
-            else:
+            now = datetime.utcnow()
+            if referral.offer_group:
+                # Lock the whole offer in id order so simultaneous acceptances queue up instead of deadlocking
+                ReferralRequest.query.filter_by(offer_group=referral.offer_group).order_by(
+                    ReferralRequest.id).with_for_update().all()
+            # Compare-and-set on the status: only the first acceptance moves the referral out of Pending
+            if not _claim(referral, 'Accepted', responded_at=now):
+                db.session.rollback()
+                current_app.logger.info(f"Referral {referral_id} was claimed or withdrawn before this acceptance")
+                return jsonify({
+                    'success': False,
+                    'message': 'Referral was already accepted by another hospital or withdrawn'
+                }), 409
+            # Hold a bed until the patient arrives; the hold lapses after BED_RESERVATION_TTL seconds
+            if not reserve_bed(referral.target_hospital_id, referral.id,
+                               current_app.config.get('BED_RESERVATION_TTL', 7200), now):
+                db.session.rollback()
                 current_app.logger.error(f"No available beds to book for referral ID: {referral_id}")
                 return jsonify({'success': False, 'message': 'No available beds to book!'}), 400
+            if referral.offer_group:
+                withdrawn = _withdraw_siblings(referral, now)
             # Create patient transfer
             transfer = PatientTransfer(
                 referral_request_id=referral_id,
@@ -273,41 +292,18 @@ def respond_to_referral():
                 'admitted_at': transfer.admitted_at.isoformat() if transfer.admitted_at else None
             }
             current_app.logger.debug("Emitting transfer_status_update:", transfer_data)
-            socketio.emit('transfer_status_update', transfer_data)
+            send_to_hospitals([transfer.from_hospital_id, transfer.to_hospital_id], 'transfer_status_update', transfer_data)
             current_app.logger.debug("Emitted transfer_status_update")
-            # Optimized hospitals_data aggregation
-            all_hospitals = Hospital.query.all()
-            hospital_ids = [h.id for h in all_hospitals]
-            bed_counts = {row[0]: {'total': row[1], 'available': row[2]} for row in db.session.query(
-                Bed.hospital_id,
-                func.count(Bed.id),
-                func.sum(case((Bed.is_occupied == False, 1), else_=0))
-            ).filter(Bed.hospital_id.in_(hospital_ids)).group_by(Bed.hospital_id).all()}
-            hospitals_data = []
-            for h in all_hospitals:
-                counts = bed_counts.get(h.id, {'total': 0, 'available': 0})
-                hospitals_data.append({
-                    'id': h.id,
-                    'name': h.name,
-                    'lat': h.latitude,
-                    'lng': h.longitude,
-                    'level': h.level,
-                    'beds': counts['total'],
-                    'available': counts['available']
-                })
-            target_hospital = Hospital.query.get(referral.target_hospital_id)
-            hospital_stats = {
-                'hospital_id': target_hospital.id,
-                'total_beds': bed_counts.get(target_hospital.id, {'total': 0})['total'],
-                'available_beds': bed_counts.get(target_hospital.id, {'available': 0})['available'],
-            }
-            socketio.emit('bed_stats_update', {
-                'hospital_stats': hospital_stats,
-                'hospitals': hospitals_data
-            })
+            bed_updates.publish(referral.target_hospital_id)
         elif response_type == 'reject':
-            referral.status = 'Rejected'
-            referral.responded_at = datetime.utcnow()
+            # Same compare-and-set as acceptance, so a late rejection cannot undo an acceptance or escalation
+            if not _claim(referral, 'Rejected', responded_at=datetime.utcnow()):
+                db.session.rollback()
+                current_app.logger.info(f"Referral {referral_id} was claimed or withdrawn before this rejection")
+                return jsonify({
+                    'success': False,
+                    'message': 'Referral was already accepted, escalated or withdrawn'
+                }), 409
         # Always create a ReferralResponse object
         response = ReferralResponse(
             referral_request_id=referral_id,
@@ -315,10 +311,14 @@ def respond_to_referral():
             response_type=response_type,
             response_message=response_message,
             responder_name=current_user.name,
-            available_beds=responding_hospital.available_beds
+            available_beds=Bed.query.filter(
+                Bed.hospital_id == responding_hospital.id, Bed.available_filter()).count()
         )
         db.session.add(response)
         db.session.commit()
+        replay_buffer.withdraw(referral.target_hospital_id, 'new_referral', id=referral.id)
+        for sibling in withdrawn:
+            _notify_withdrawn(sibling, f'Referral #{sibling.id} was accepted by {responding_hospital.name}')
         # Emit socket event to notify the requesting hospital about the response
         response_data = {
             'referral_id': referral_id,
@@ -328,7 +328,7 @@ def respond_to_referral():
             'responding_hospital_id': responding_hospital.id,
             'requesting_hospital_id': referral.requesting_hospital_id
         }
-        socketio.emit('referral_response', response_data)
+        notify_hospital(referral.requesting_hospital_id, 'referral_response', response_data)
         # Also emit notification for the accepting hospital (when accepting)
         if response_type == 'accept':
             accepting_hospital_notification = {
@@ -336,7 +336,7 @@ def respond_to_referral():
                 'hospital_name': responding_hospital.name,
                 'hospital_id': responding_hospital.id
             }
-            socketio.emit('referral_accepted_by_us', accepting_hospital_notification)
+            send_to_hospital(responding_hospital.id, 'referral_accepted_by_us', accepting_hospital_notification)
         return jsonify({
             'success': True,
             'message': f'Referral {response_type}ed successfully'
@@ -358,7 +358,7 @@ def pending_referrals():
         current_app.logger.debug(f"DEBUG: Current user: {current_user}")
         current_app.logger.debug(f"DEBUG: Current user hospital_id: {current_user.hospital_id}")
         
-        hospital = Hospital.query.get(current_user.hospital_id)
+        hospital = hospital_registry.get(current_user.hospital_id)
         current_app.logger.debug(f"DEBUG: Hospital found: {hospital}")
         
         if not hospital:
@@ -368,7 +368,9 @@ def pending_referrals():
                 'message': 'Hospital not found'
             }), 404
         
-        pending = ReferralRequest.query.filter_by(
+        pending = ReferralRequest.query.options(
+            joinedload(ReferralRequest.requesting_hospital)
+        ).filter_by(
             target_hospital_id=hospital.id,
             status='Pending'
         ).all()
@@ -376,7 +378,6 @@ def pending_referrals():
         current_app.logger.debug(f"DEBUG: Found {len(pending)} pending referrals")
 
         # Get hospital's notification duration setting
-        hospital = Hospital.query.get(current_user.hospital_id)
         notification_duration = hospital.notification_duration
 
         referrals_data = []
@@ -428,67 +429,44 @@ def escalate_referral(referral_id):
             current_app.logger.error("Referral is no longer pending")
             return jsonify({'success': False, 'message': 'Referral is no longer pending'}), 400
         
-        # Use test escalation hospital in test mode, otherwise use production id=11
-        if current_app.config.get('TESTING') and current_app.config.get('HOSPITAL3_ID'):
-            escalation_hospital_id = current_app.config['HOSPITAL3_ID']
-        else:
-            escalation_hospital_id = 11
-        escalation_hospital = Hospital.query.get(escalation_hospital_id)
+        if referral.offer_group:
+            # Lock the whole offer, this referral included, in id order as an acceptance does
+            offer = ReferralRequest.query.filter_by(offer_group=referral.offer_group).order_by(
+                ReferralRequest.id).with_for_update().populate_existing().all()
+            siblings = [r for r in offer if r.id != referral.id]
+            accepted = any(r.status == 'Accepted' for r in siblings)
+            still_offered = [r for r in siblings if r.status == 'Pending']
+            # Another hospital took the patient or still holds the offer: only this hospital's copy lapses
+            if accepted or still_offered:
+                if not _claim(referral, 'Withdrawn', responded_at=datetime.utcnow()):
+                    return _escalation_conflict(referral_id)
+                db.session.commit()
+                if accepted:
+                    message = 'Accepted by another hospital'
+                else:
+                    message = f'Still offered to {len(still_offered)} other hospital(s)'
+                _notify_withdrawn(referral, f'Referral #{referral.id} timed out here: {message.lower()}')
+                return jsonify({
+                    'success': True,
+                    'new_referral_id': None,
+                    'target_hospital': None,
+                    'message': message
+                }), 200
+        
+        escalation_hospital_id = _escalation_hospital_id()
+        escalation_hospital = hospital_registry.get(escalation_hospital_id)
         if not escalation_hospital:
             current_app.logger.error(f"Escalation hospital (id={escalation_hospital_id}) not found for escalation")
             return jsonify({
                 'success': False,
                 'message': f'Escalation hospital (id={escalation_hospital_id}) not found'
             }), 404
-        # Create new referral to escalation hospital
-        new_referral = ReferralRequest(
-            requesting_hospital_id=referral.requesting_hospital_id,
-            target_hospital_id=escalation_hospital_id,
-            patient_id=None,
-            patient_age=referral.patient_age,
-            patient_gender=referral.patient_gender,
-            primary_diagnosis=referral.primary_diagnosis,
-            current_treatment=referral.current_treatment,
-            reason_for_referral=referral.reason_for_referral,
-            urgency_level=referral.urgency_level,
-            special_requirements=referral.special_requirements,
-            status='Pending'
-        )
-        
-        # Mark old referral as escalated
-        referral.status = 'Escalated'
-        referral.escalated_at = datetime.utcnow()
-        
-        db.session.add(new_referral)
-        db.session.commit()
         
         # Get hospital's notification duration setting for the escalated referral
-        hospital = Hospital.query.get(current_user.hospital_id)
-        notification_duration = hospital.notification_duration
-        
-        # Send WebSocket notification to escalation hospital about the new referral
-        new_referral_data = {
-            'id': new_referral.id,
-            'target_hospital_id': new_referral.target_hospital_id,
-            'patient_age': new_referral.patient_age,
-            'patient_gender': new_referral.patient_gender,
-            'primary_diagnosis': new_referral.primary_diagnosis,
-            'current_treatment': new_referral.current_treatment,
-            'reason': new_referral.reason_for_referral,
-            'urgency': new_referral.urgency_level,
-            'special_requirements': new_referral.special_requirements,
-            'requesting_hospital': new_referral.requesting_hospital.name,
-            'time_remaining': notification_duration
-        }
-        socketio.emit('new_referral', new_referral_data)
-        
-        # Send WebSocket notification to the original hospital about the escalation
-        escalation_notification = {
-            'referral_id': referral.id,
-            'escalated_to': escalation_hospital.name,
-            'message': f'Referral #{referral.id} has been escalated to {escalation_hospital.name} due to timeout'
-        }
-        socketio.emit('referral_escalated', escalation_notification)
+        hospital = hospital_registry.get(current_user.hospital_id)
+        new_referral = _escalate(referral, escalation_hospital, hospital.notification_duration, 'timeout')
+        if new_referral is None:
+            return _escalation_conflict(referral_id)
         
         return jsonify({
             'success': True,
@@ -505,18 +483,198 @@ def escalate_referral(referral_id):
             'message': str(e)
         }), 500
 
+def _referral_candidates(hospital):
+    """Other hospitals with free beds: attended ones first, then closest first"""
+    from sqlalchemy import func
+    available_counts = dict(db.session.query(Bed.hospital_id, func.count(Bed.id)).filter(
+        Bed.available_filter()
+    ).group_by(Bed.hospital_id).all())
+    candidates = []
+    for h in hospital_registry.all():
+        if h.id != hospital.id and available_counts.get(h.id, 0) > 0:  # Exclude current hospital
+            candidates.append({
+                'id': h.id,
+                'name': h.name,
+                'available_beds': available_counts[h.id],
+                'level': h.level,
+                'lat': h.latitude,
+                'lng': h.longitude,
+                'distance': _distance_between(hospital, h),
+                'staff_online': presence.online_count(h.id)
+            })
+    candidates.sort(key=lambda x: (x['staff_online'] == 0, x['distance']))
+    return candidates
+
+def _distance_between(hospital, other):
+    """Kilometres between two hospitals; unplaced hospitals sort last"""
+    if None in (hospital.latitude, hospital.longitude, other.latitude, other.longitude):
+        return float('inf')
+    return calculate_distance(hospital.latitude, hospital.longitude, other.latitude, other.longitude)
+
+def _new_referral_data(referral, time_remaining):
+    """The new_referral event payload for a referral's target hospital"""
+    return {
+        'id': referral.id,
+        'target_hospital_id': referral.target_hospital_id,
+        'patient_age': referral.patient_age,
+        'patient_gender': referral.patient_gender,
+        'primary_diagnosis': referral.primary_diagnosis,
+        'current_treatment': referral.current_treatment,
+        'reason': referral.reason_for_referral,
+        'urgency': referral.urgency_level,
+        'special_requirements': referral.special_requirements,
+        'requesting_hospital': hospital_registry.get(referral.requesting_hospital_id).name,
+        'time_remaining': time_remaining
+    }
+
+def _initiate_multicast(data, requesting_hospital):
+    """Offer one patient to the top-ranked hospitals at once, as sibling referrals in one offer group"""
+    limit = current_app.config.get('REFERRAL_MULTICAST_MAX', 3)
+    candidates = _referral_candidates(requesting_hospital)
+    try:
+        if data.get('target_hospital_ids'):
+            wanted = {int(hospital_id) for hospital_id in data['target_hospital_ids']}
+            candidates = [c for c in candidates if c['id'] in wanted]
+            count = len(wanted)
+        else:
+            count = int(data['multicast'])
+    except (ValueError, TypeError):
+        return jsonify({'success': False, 'message': 'Invalid target hospital ID format'}), 400
+    if count < 1:
+        return jsonify({'success': False, 'message': 'multicast must be at least 1'}), 400
+    targets = [hospital_registry.get(c['id']) for c in candidates[:min(count, limit)]]
+    if not targets:
+        return jsonify({'success': False, 'message': 'No candidate hospitals have available beds'}), 400
+    
+    offer_group = uuid.uuid4().hex
+    referrals = [ReferralRequest(
+        requesting_hospital_id=requesting_hospital.id,
+        target_hospital_id=target.id,
+        patient_id=None,
+        patient_age=data.get('patient_age'),
+        patient_gender=data.get('patient_gender'),
+        primary_diagnosis=data.get('primary_diagnosis'),
+        current_treatment=data.get('current_treatment'),
+        reason_for_referral=(data.get('reason_for_referral') or data.get('primary_diagnosis')),
+        urgency_level=data.get('urgency_level') or data.get('priority') or 'Medium',
+        special_requirements=data.get('special_requirements', ''),
+        status='Pending',
+        offer_group=offer_group
+    ) for target in targets]
+    db.session.add_all(referrals)
+    db.session.commit()
+    current_app.logger.info(f"Referral offer {offer_group} from {requesting_hospital.name} sent to "
+                            f"{', '.join(target.name for target in targets)}")
+    
+    for referral, target in zip(referrals, targets):
+        notify_hospital(target.id, 'new_referral', _new_referral_data(referral, target.notification_duration))
+    
+    return jsonify({
+        'success': True,
+        'offer_group': offer_group,
+        'referral_ids': [referral.id for referral in referrals],
+        'message': f'Referral offered to {", ".join(target.name for target in targets)}',
+        'timeout_seconds': max(target.notification_duration for target in targets)
+    }), 200
+
+def _withdraw_siblings(referral, now):
+    """Withdraw the rest of an accepted referral's offer group; returns the withdrawn referrals."""
+    siblings = ReferralRequest.query.filter(
+        ReferralRequest.offer_group == referral.offer_group,
+        ReferralRequest.id != referral.id,
+        ReferralRequest.status == 'Pending'
+    ).all()
+    for sibling in siblings:
+        sibling.status = 'Withdrawn'
+        sibling.responded_at = now
+    return siblings
+
+def _notify_withdrawn(referral, message):
+    """Retract a referral from its target hospital's screens and from reconnect replay"""
+    replay_buffer.withdraw(referral.target_hospital_id, 'new_referral', id=referral.id)
+    notify_hospital(referral.target_hospital_id, 'referral_withdrawn', {
+        'referral_id': referral.id,
+        'target_hospital_id': referral.target_hospital_id,
+        'message': message
+    })
+
+def _claim(referral, status, **values):
+    """Move a referral out of Pending with a conditional UPDATE; False if another request got there first."""
+    return bool(ReferralRequest.query.filter_by(id=referral.id, status='Pending').update(
+        {'status': status, **values}, synchronize_session=False))
+
+def _escalation_conflict(referral_id):
+    db.session.rollback()
+    current_app.logger.info(f"Referral {referral_id} was accepted, escalated or withdrawn before it lapsed")
+    return jsonify({
+        'success': False,
+        'message': 'Referral was already accepted, escalated or withdrawn'
+    }), 409
+
+def _escalation_hospital_id():
+    """Hospital(id=11), or the test escalation hospital in test mode"""
+    if current_app.config.get('TESTING') and current_app.config.get('HOSPITAL3_ID'):
+        return current_app.config['HOSPITAL3_ID']
+    return 11
+
+def _escalate(referral, escalation_hospital, notification_duration, reason):
+    """Mark a pending referral escalated and offer the patient to escalation_hospital.
+
+    Returns the new referral, or None (with the session rolled back) if the
+    referral left Pending before it could be claimed.
+    """
+    # Compare-and-set: an acceptance or another escalation may already have claimed it
+    if not _claim(referral, 'Escalated', escalated_at=datetime.utcnow()):
+        db.session.rollback()
+        return None
+    
+    # Create new referral to escalation hospital
+    new_referral = ReferralRequest(
+        requesting_hospital_id=referral.requesting_hospital_id,
+        target_hospital_id=escalation_hospital.id,
+        patient_id=None,
+        patient_age=referral.patient_age,
+        patient_gender=referral.patient_gender,
+        primary_diagnosis=referral.primary_diagnosis,
+        current_treatment=referral.current_treatment,
+        reason_for_referral=referral.reason_for_referral,
+        urgency_level=referral.urgency_level,
+        special_requirements=referral.special_requirements,
+        status='Pending'
+    )
+    
+    db.session.add(new_referral)
+    db.session.commit()
+    
+    # Send WebSocket notification to escalation hospital about the new referral
+    replay_buffer.withdraw(referral.target_hospital_id, 'new_referral', id=referral.id)
+    notify_hospital(new_referral.target_hospital_id, 'new_referral',
+                    _new_referral_data(new_referral, notification_duration))
+    
+    # Send WebSocket notification to the original hospital about the escalation
+    escalation_notification = {
+        'referral_id': referral.id,
+        'escalated_to': escalation_hospital.name,
+        'message': f'Referral #{referral.id} has been escalated to {escalation_hospital.name} due to {reason}'
+    }
+    send_to_hospital(referral.requesting_hospital_id, 'referral_escalated', escalation_notification)
+    return new_referral
+
 @referral_bp.route('/api/all-referrals')
 @login_required
 def all_referrals():
     """Get all referrals for the current hospital (sent and received)"""
     try:
-        hospital = Hospital.query.get(current_user.hospital_id)
+        hospital = hospital_registry.get(current_user.hospital_id)
         
         # Get hospital's notification duration setting
         notification_duration = hospital.notification_duration
         
         # Get referrals where this hospital is the target OR the requesting hospital
-        all_referrals = ReferralRequest.query.filter(
+        all_referrals = ReferralRequest.query.options(
+            joinedload(ReferralRequest.requesting_hospital),
+            joinedload(ReferralRequest.target_hospital)
+        ).filter(
             (ReferralRequest.target_hospital_id == hospital.id) |
             (ReferralRequest.requesting_hospital_id == hospital.id)
         ).order_by(ReferralRequest.created_at.desc()).all()
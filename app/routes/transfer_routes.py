@@ -1,9 +1,13 @@
 from flask import Blueprint, render_template, request, jsonify, current_app
 from flask_login import login_required, current_user
 from datetime import datetime, timedelta
-from app import db, socketio
+from app import db
 from app.models import Hospital, PatientTransfer, ReferralRequest, UserSettings, Admission, Bed
-from app.utils import get_current_local_time, to_utc_time
+from app.utils import get_current_local_time, to_utc_time, format_local_times
+from app.cache_versions import conditional
+from app.socket_codec import send_to_hospitals
+from app.bed_reservations import reserved_bed_for
+from sqlalchemy.orm import joinedload
 import json
 
 transfer_bp = Blueprint('transfer', __name__)
@@ -122,13 +126,18 @@ def update_transfer_status():
 
 @transfer_bp.route('/api/active-transfers')
 @login_required
+# time_since_en_route is derived from the clock
+@conditional(lambda: f'transfers:{current_user.hospital_id}', 'hospitals', refresh_every=60)
 def active_transfers():
     """Get active transfers for the current hospital"""
     try:
         hospital_id = current_user.hospital_id
         print(f"[DEBUG] Current user hospital_id: {hospital_id}")
         # Get transfers where this hospital is either sending or receiving
-        transfers = PatientTransfer.query.filter(
+        transfers = PatientTransfer.query.options(
+            joinedload(PatientTransfer.from_hospital),
+            joinedload(PatientTransfer.to_hospital)
+        ).filter(
             db.or_(
                 PatientTransfer.from_hospital_id == hospital_id,
                 PatientTransfer.to_hospital_id == hospital_id
@@ -139,7 +148,10 @@ def active_transfers():
         for t in transfers:
             print(f"[DEBUG] Transfer ID: {t.id}, from_hospital_id: {t.from_hospital_id}, to_hospital_id: {t.to_hospital_id}, status: {t.status}")
         transfers_data = []
-        for transfer in transfers:
+        initiated_at = format_local_times([t.transfer_initiated_at for t in transfers], '%Y-%m-%d %H:%M')
+        en_route_at = format_local_times([t.en_route_at for t in transfers], '%Y-%m-%d %H:%M')
+        admitted_at = format_local_times([t.admitted_at for t in transfers], '%Y-%m-%d %H:%M')
+        for i, transfer in enumerate(transfers):
             transfers_data.append({
                 'id': transfer.id,
                 'patient_name': transfer.patient_name,
@@ -152,9 +164,9 @@ def active_transfers():
                 'to_hospital': transfer.to_hospital.name,
                 'is_sending': transfer.from_hospital_id == hospital_id,
                 'is_receiving': transfer.to_hospital_id == hospital_id,
-                'transfer_initiated_at': transfer.local_transfer_initiated_at.strftime('%Y-%m-%d %H:%M'),
-                'en_route_at': transfer.local_en_route_at.strftime('%Y-%m-%d %H:%M'),
-                'admitted_at': transfer.local_admitted_at.strftime('%Y-%m-%d %H:%M') if transfer.admitted_at else None,
+                'transfer_initiated_at': initiated_at[i],
+                'en_route_at': en_route_at[i],
+                'admitted_at': admitted_at[i],
                 'time_since_en_route': str(transfer.time_since_en_route).split('.')[0] if transfer.time_since_en_route else None,
                 'transfer_duration': str(transfer.transfer_duration).split('.')[0] if transfer.transfer_duration else None,
                 'contact_name': transfer.contact_name,
@@ -191,11 +203,14 @@ def get_transfer(transfer_id):
                 'message': 'Unauthorized to view this transfer'
             }), 403
         
-        # Find the reserved bed (occupied, in this hospital, not already assigned to an active admission)
-        reserved_bed = Bed.query.filter_by(
-            hospital_id=transfer.to_hospital_id,
-            is_occupied=True
-        ).outerjoin(Admission, (Admission.bed_id == Bed.id) & (Admission.status == 'Active')).filter(Admission.id == None).first()
+        # The bed held for this transfer's referral, while the hold lasts
+        reserved_bed = reserved_bed_for(transfer.referral_request_id)
+        if reserved_bed is None:
+            # Referrals accepted before reservations marked a bed occupied with no admission in it
+            reserved_bed = Bed.query.filter_by(
+                hospital_id=transfer.to_hospital_id,
+                is_occupied=True
+            ).outerjoin(Admission, (Admission.bed_id == Bed.id) & (Admission.status == 'Active')).filter(Admission.id == None).first()
 
         transfer_data = {
             'id': transfer.id,
@@ -254,7 +269,7 @@ def send_admission_notification(transfer):
             'patient_gender': transfer.patient_gender,
             'admitted_at': transfer.admitted_at.isoformat() if transfer.admitted_at else None
         }
-        socketio.emit('transfer_status_update', transfer_data)
+        send_to_hospitals([transfer.from_hospital_id, transfer.to_hospital_id], 'transfer_status_update', transfer_data)
         
         
         
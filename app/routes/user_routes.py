@@ -1,7 +1,13 @@
-from flask import Blueprint, abort, flash, redirect, render_template, send_from_directory, url_for, request, jsonify
+from flask import Blueprint, abort, flash, redirect, render_template, url_for, request, jsonify
 from flask_login import login_required, current_user
 from datetime import datetime
+import json
+import os
 from app.models import Hospital, Admin, UserSettings
+from app.hospital_registry import hospital_registry
+from app.presence import presence
+from app.cache_versions import conditional
+from app.precompressed import send_precompressed
 from app import db
 
 user_bp = Blueprint('user', __name__)
@@ -9,32 +15,23 @@ user_bp = Blueprint('user', __name__)
 @user_bp.route('/dashboard')
 @login_required
 def dashboard():
-    import time
-    from sqlalchemy import func, case
-    from app.models import Bed
-    start_time = time.time()
+    from app.bed_reservations import bed_counts
     # Prevent admin from accessing user dashboard
     if isinstance(current_user, Admin):
         abort(403)
-    step1 = time.time()
-    hospital = Hospital.query.get(current_user.hospital_id)
-    step2 = time.time()
+    hospital = hospital_registry.get(current_user.hospital_id)
     if not hospital:
         flash('Hospital not found', 'danger')
         return redirect(url_for('auth.login'))
     # Get all hospitals except the current user's hospital
-    all_hospitals = Hospital.query.filter(Hospital.id != hospital.id).all()
-    step3 = time.time()
-    hospital_ids = [h.id for h in all_hospitals]
-    # Aggregate bed counts in a single query, PostgreSQL compatible
-    bed_counts = {row[0]: {'total': row[1], 'available': row[2]} for row in db.session.query(
-        Bed.hospital_id,
-        func.count(Bed.id),
-        func.sum(case((Bed.is_occupied == False, 1), else_=0))
-    ).filter(Bed.hospital_id.in_(hospital_ids)).group_by(Bed.hospital_id).all()}
+    all_hospitals = [h for h in hospital_registry.all() if h.id != hospital.id]
+    # Aggregate bed counts for every hospital (including this one) in a single query
+    counts_by_hospital = bed_counts()
+    empty = {'total': 0, 'available': 0, 'reserved': 0}
+    own_counts = counts_by_hospital.get(hospital.id, empty)
     hospitals_data = []
     for h in all_hospitals:
-        counts = bed_counts.get(h.id, {'total': 0, 'available': 0})
+        counts = counts_by_hospital.get(h.id, empty)
         hospitals_data.append({
             'id': h.id,
             'name': h.name,
@@ -42,21 +39,55 @@ def dashboard():
             'lng': h.longitude,
             'level': h.level,
             'beds': counts['total'],
-            'available': counts['available']
+            'available': counts['available'],
+            'reserved': counts['reserved'],
+            'staff_online': presence.online_count(h.id)
         })
-    step4 = time.time()
-    result = render_template(
+    return render_template(
         'users/dashboard.html',
         hospital=hospital,
+        total_beds=own_counts['total'],
+        available_beds=own_counts['available'],
+        reserved_beds=own_counts['reserved'],
         hospitals_data=hospitals_data
     )
-    step5 = time.time()
-    print(f"[PROFILE] /dashboard: total={step5-start_time:.2f}s | admin_check={step1-start_time:.2f}s | get_hospital={step2-step1:.2f}s | get_all_hospitals={step3-step2:.2f}s | build_hospitals_data={step4-step3:.2f}s | render_template={step5-step4:.2f}s")
-    return result
+
+# Simplified, precompressed map boundaries built by scripts/build_geojson.py
+GEOJSON_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static', 'data', 'geo')
+GEOJSON_MIMETYPE = 'application/geo+json'
+_geojson_manifest = None
+
+def geojson_manifest():
+    global _geojson_manifest
+    if _geojson_manifest is None:
+        with open(os.path.join(GEOJSON_DIR, 'manifest.json')) as f:
+            _geojson_manifest = json.load(f)
+    return _geojson_manifest
+
+def geojson_tier(zoom):
+    """Resolution tier for a Leaflet zoom level (county view is around zoom 10)"""
+    if zoom is None:
+        return 'medium'
+    if zoom <= 9:
+        return 'low'
+    if zoom <= 12:
+        return 'medium'
+    return 'full'
+
+@user_bp.app_template_global()
+def geojson_url(name, zoom=None):
+    """Content-hashed, immutable URL of a map boundary at the tier for zoom"""
+    return url_for('user.geojson_asset', filename=geojson_manifest()[name][geojson_tier(zoom)])
 
 @user_bp.route('/kisumu-geojson')
 def kisumu_geojson():
-    return send_from_directory('static/data', 'kisumu.geojson')
+    """Stable URL (revalidated); pages should prefer geojson_url('kisumu')"""
+    filename = geojson_manifest()['kisumu'][geojson_tier(request.args.get('zoom', type=int))]
+    return send_precompressed(GEOJSON_DIR, filename, GEOJSON_MIMETYPE)
+
+@user_bp.route('/geojson/<path:filename>')
+def geojson_asset(filename):
+    return send_precompressed(GEOJSON_DIR, filename, GEOJSON_MIMETYPE, immutable=True)
 
 @user_bp.route('/guide')
 @login_required
@@ -64,7 +95,7 @@ def guide():
     # Prevent admin from accessing user guide
     if isinstance(current_user, Admin):
         abort(403)
-    hospital = Hospital.query.get(current_user.hospital_id)
+    hospital = hospital_registry.get(current_user.hospital_id)
     return render_template('users/guide.html', hospital=hospital)
 
 @user_bp.route('/settings')
@@ -81,11 +112,12 @@ def settings():
         db.session.add(user_settings)
         db.session.commit()
     
-    hospital = Hospital.query.get(current_user.hospital_id)
+    hospital = hospital_registry.get(current_user.hospital_id)
     return render_template('users/settings.html', settings=user_settings, hospital=hospital)
 
 @user_bp.route('/api/settings', methods=['GET', 'POST'])
 @login_required
+@conditional(lambda: f'settings:user:{current_user.id}')
 def api_settings():
     if isinstance(current_user, Admin):
         abort(403)
@@ -179,5 +211,5 @@ def test_notification():
 def weekly_prediction():
     if isinstance(current_user, Admin):
         abort(403)
-    hospital = Hospital.query.get(current_user.hospital_id)
+    hospital = hospital_registry.get(current_user.hospital_id)
     return render_template('users/weekly_prediction.html', hospital=hospital)
\ No newline at end of file
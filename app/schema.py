@@ -0,0 +1,117 @@
+"""Database schema setup and the boot-time schema version check.
+
+Creating tables, running migrations and seeding the System Hospital used to
+happen inside create_app, i.e. on every process start (CLI scripts, gunicorn
+worker restarts). That is now the one-time ``flask init-db`` command; boot
+only compares the database's alembic revision with the migration head.
+
+Databases built by ``db.create_all()`` before migrations were tracked have
+the baseline schema but no ``alembic_version``; init-db stamps them at the
+baseline and upgrades them. Only an empty database is built from the models.
+"""
+import os
+
+import click
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import db
+
+# The schema create_all() produced before the first tracked migration
+BASELINE_REVISION = '528cf676a470'
+
+
+def migration_heads(app):
+    """Return the head revision(s) of the migrations directory, or [] if there is none."""
+    directory = app.extensions['migrate'].directory
+    if not os.path.isdir(directory):
+        return []
+    config = Config()
+    config.set_main_option('script_location', directory)
+    return ScriptDirectory.from_config(config).get_heads()
+
+
+def database_revisions():
+    """Return the revision(s) recorded in alembic_version, or [] if the table is missing."""
+    try:
+        return db.session.execute(text('SELECT version_num FROM alembic_version')).scalars().all()
+    except SQLAlchemyError:
+        db.session.rollback()
+        return []
+
+
+def check_schema_version(app):
+    """Warn (without touching the schema) when the database is not at the migration head."""
+    heads = migration_heads(app)
+    if not heads:
+        return True
+    current = database_revisions()
+    if set(current) != set(heads):
+        app.logger.warning(
+            f"Database schema is at {', '.join(current) or 'no revision'} but migrations are at "
+            f"{', '.join(heads)}; run 'flask init-db' to bring it up to date"
+        )
+        return False
+    return True
+
+
+def init_database(app, reset=False):
+    """Create or upgrade the schema and seed the System Hospital and first admin."""
+    from flask_migrate import init, stamp, upgrade
+    from app.models import Hospital, Admin
+    import shutil
+
+    try:
+        migrations_path = app.extensions['migrate'].directory
+        if reset and os.path.exists(migrations_path):
+            shutil.rmtree(migrations_path)
+
+        if not os.path.exists(migrations_path):
+            init(directory=migrations_path)
+
+        tables = set(inspect(db.engine).get_table_names())
+        if 'alembic_version' in tables:
+            upgrade(directory=migrations_path)
+        elif tables and migration_heads(app):
+            # Unstamped database built by create_all(): it is at the baseline, migrate it from there
+            app.logger.info(f"Database has tables but no revision; stamping {BASELINE_REVISION} and upgrading")
+            stamp(directory=migrations_path, revision=BASELINE_REVISION)
+            upgrade(directory=migrations_path)
+        else:
+            # Empty database: build it from the models and mark it current
+            db.create_all()
+            stamp(directory=migrations_path)
+
+        # Check if system hospital exists before creating
+        if not Hospital.query.filter_by(name="System Hospital").first():
+            hospital = Hospital(name="System Hospital", verification_code="SYSADMIN")
+            db.session.add(hospital)
+            db.session.commit()
+
+            # Only create admin if it doesn't exist
+            if not Admin.query.first():
+                admin = Admin(
+                    hospital_id=hospital.id,
+                    email="admin@icuconnect.com",
+                    privilege_level="super"
+                )
+                admin.set_password("temp1234")
+                db.session.add(admin)
+                db.session.commit()
+
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Database initialization error: {str(e)}")
+        raise
+
+
+def register_schema_commands(app):
+    """Add ``flask init-db`` to the app's CLI."""
+    @app.cli.command('init-db')
+    @click.option('--reset', is_flag=True, help='Recreate the migrations directory first.')
+    def init_db_command(reset):
+        """Create or upgrade the database schema and seed initial data."""
+        init_database(app, reset=reset)
+        click.echo('Database initialized.')
@@ -0,0 +1,110 @@
+"""Single-flight request coalescing with a short TTL result cache.
+
+At shift change many clients ask for the same trend or occupancy figures at
+once. ``SingleFlight.do(key, fn)`` runs ``fn`` once per key: concurrent
+callers with the same key wait for the in-flight call and share its result
+(or its exception), and successful results are kept for ``ttl`` seconds.
+``coalesce`` applies this to a Flask view, keyed by endpoint and sorted
+query parameters.
+"""
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, request
+
+from app.metrics import registry
+
+flight_requests = registry.counter(
+    'icuconnect_single_flight_requests_total',
+    'Coalesced computations by outcome (hit = TTL cache, coalesced = waited on an in-flight call)',
+    labels=('name', 'outcome'))
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls per key and caches results briefly"""
+
+    def __init__(self, name, ttl=10, max_entries=1000):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._calls = {}
+        self._results = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, cache_if=None):
+        """Return fn()'s result for key, sharing it with concurrent and recent callers.
+
+        cache_if(result) decides whether a result may be kept for the TTL;
+        by default every successful result is.
+        """
+        now = time.monotonic()
+        entry = self._results.get(key)
+        if entry is not None and entry[0] > now:
+            flight_requests.inc(name=self.name, outcome='hit')
+            return entry[1]
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            flight_requests.inc(name=self.name, outcome='coalesced')
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        flight_requests.inc(name=self.name, outcome='miss')
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                if call.error is None and self.ttl > 0 and (cache_if is None or cache_if(call.result)):
+                    self._store(key, call.result)
+            call.done.set()
+        return call.result
+
+    def _store(self, key, result):
+        now = time.monotonic()
+        if len(self._results) >= self.max_entries:
+            self._results = {k: v for k, v in self._results.items() if v[0] > now}
+        self._results[key] = (now + self.ttl, result)
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
+
+def coalesce(flight):
+    """Coalesce identical concurrent requests to a view and cache 200 responses for flight.ttl."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = (request.endpoint, tuple(sorted(request.args.items(multi=True))), tuple(sorted(kwargs.items())))
+
+            def render():
+                response = current_app.make_response(view(*args, **kwargs))
+                headers = [(name, value) for name, value in response.headers if name.lower() != 'set-cookie']
+                return response.get_data(), response.status_code, headers
+
+            body, status, headers = flight.do(key, render, cache_if=lambda result: result[1] == 200)
+            # Each caller gets its own response object; after_request hooks may modify it
+            return current_app.response_class(body, status=status, headers=headers)
+        return wrapper
+    return decorator
@@ -0,0 +1,45 @@
+"""Authenticated Socket.IO connections.
+
+The connect handler used to accept anyone, and relay handlers let any client
+broadcast arbitrary payloads to every other client. Now a connection is only
+accepted for a logged-in user (the Flask-Login session cookie travels with
+the Socket.IO handshake). The user and hospital are resolved once, at
+connect time, and kept on the Socket.IO session, so later events read
+``socket_identity()`` instead of loading the user again. The hospital id
+also picks the per-hospital rooms ``negotiate`` joins (app/socket_codec.py).
+
+All broadcasts now originate on the server, from the routes that change
+state.
+"""
+from flask import request
+from flask_login import current_user
+
+from app import socketio
+from app.metrics import registry
+
+socket_connects = registry.counter(
+    'icuconnect_socket_connects_total', 'Socket.IO connection attempts by result',
+    labels=('result',))
+
+
+def authenticate_connection():
+    """Resolve the connecting user once and keep it on the socket session.
+
+    Returns the identity, or None when the connection must be refused.
+    """
+    if not current_user.is_authenticated:
+        socket_connects.inc(result='rejected')
+        return None
+    identity = {
+        'user_id': current_user.get_id(),
+        'name': current_user.name,
+        'hospital_id': current_user.hospital_id,
+    }
+    socketio.server.save_session(request.sid, identity, namespace=request.namespace)
+    socket_connects.inc(result='accepted')
+    return identity
+
+
+def socket_identity():
+    """The identity resolved when the current connection was accepted"""
+    return socketio.server.get_session(request.sid, namespace=request.namespace)
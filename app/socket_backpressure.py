@@ -0,0 +1,119 @@
+"""Bounded per-connection send queues for Socket.IO fan-out.
+
+Engine.IO gives every connection an unbounded outbound queue: a polling
+client only drains it when it next polls, and a websocket writer blocks on a
+slow network while broadcasts keep piling up behind it. A handful of stalled
+mobile clients during a burst can hold most of the process's memory.
+
+``BackpressureManager`` replaces the default client manager and checks each
+recipient's queue before enqueueing a broadcast:
+
+* Events in SOCKETIO_SUPERSEDED_EVENTS (``bed_stats_update``) carry a full
+  snapshot. If the client still has an unsent one queued, it is replaced in
+  place with the new one, so a slow client gets the latest state once.
+* A client whose queue holds SOCKETIO_MAX_QUEUE packets is disconnected. The
+  browser's Socket.IO client reconnects on its own and starts with an empty
+  queue.
+
+Both actions are counted in ``icuconnect_socket_backpressure_total``.
+"""
+import logging
+from contextlib import nullcontext
+
+import socketio
+from engineio import packet as eio_packet
+from socketio import packet
+
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+backpressure_events = registry.counter(
+    'icuconnect_socket_backpressure_total',
+    'Broadcasts folded into an unsent snapshot (superseded) and stalled clients dropped (disconnected)',
+    labels=('action',))
+
+
+class BackpressureManager(socketio.Manager):
+    """Client manager that bounds every connection's outbound queue"""
+
+    def __init__(self, max_queue=200, superseded_events=('bed_stats_update',)):
+        super().__init__()
+        self.max_queue = max_queue
+        self.superseded_events = frozenset(superseded_events)
+        # eio_sid -> {event: engine.io packets of the last queued snapshot}
+        self._snapshots = {}
+
+    def emit(self, event, data, namespace, room=None, skip_sid=None,
+             callback=None, to=None, **kwargs):
+        if callback is not None:
+            # Acknowledged emits need a packet per client; they are rare and small
+            return super().emit(event, data, namespace, room=room, skip_sid=skip_sid,
+                                callback=callback, to=to, **kwargs)
+        room = to or room
+        if namespace not in self.rooms:
+            return
+        if isinstance(data, tuple):
+            data = list(data)
+        elif data is not None:
+            data = [data]
+        else:
+            data = []
+        if not isinstance(skip_sid, list):
+            skip_sid = [skip_sid]
+        # Encoded once; every recipient gets the same packet objects
+        encoded = self.server.packet_class(packet.EVENT, namespace=namespace, data=[event] + data).encode()
+        if not isinstance(encoded, list):
+            encoded = [encoded]
+        eio_pkts = [eio_packet.Packet(eio_packet.MESSAGE, p) for p in encoded]
+        for sid, eio_sid in self.get_participants(namespace, room):
+            if sid not in skip_sid:
+                self.deliver(eio_sid, event, eio_pkts)
+
+    def deliver(self, eio_sid, event, eio_pkts):
+        """Queue packets for one connection, applying the snapshot and stall policies."""
+        socket = self.server.eio.sockets.get(eio_sid)
+        if socket is None or socket.closed:
+            return
+        superseded = event in self.superseded_events
+        if superseded and self._replace_snapshot(socket, eio_sid, event, eio_pkts):
+            backpressure_events.inc(action='superseded')
+            return
+        if socket.queue.qsize() + len(eio_pkts) > self.max_queue:
+            self._drop_stalled(socket, eio_sid)
+            return
+        for pkt in eio_pkts:
+            self.server._send_eio_packet(eio_sid, pkt)
+        if superseded:
+            self._snapshots.setdefault(eio_sid, {})[event] = eio_pkts
+
+    def _replace_snapshot(self, socket, eio_sid, event, eio_pkts):
+        previous = self._snapshots.get(eio_sid, {}).get(event)
+        if not previous or len(previous) != len(eio_pkts):
+            return False
+        queue = socket.queue
+        with getattr(queue, 'mutex', None) or nullcontext():
+            items = queue.queue
+            start = next((i for i, item in enumerate(items) if item is previous[0]), None)
+            if start is None or start + len(previous) > len(items):
+                return False  # already handed to the transport
+            if any(items[start + i] is not pkt for i, pkt in enumerate(previous)):
+                return False
+            for i, pkt in enumerate(eio_pkts):
+                items[start + i] = pkt
+        self._snapshots[eio_sid][event] = eio_pkts
+        return True
+
+    def _drop_stalled(self, socket, eio_sid):
+        logger.warning(f"Disconnecting stalled Socket.IO client {eio_sid} "
+                       f"({socket.queue.qsize()} packets queued)")
+        backpressure_events.inc(action='disconnected')
+        self._snapshots.pop(eio_sid, None)
+        # abort: do not queue a CLOSE packet behind the backlog, or wait for it to drain
+        socket.close(wait=False, abort=True, reason=self.server.eio.reason.SERVER_DISCONNECT)
+        self.server.eio.sockets.pop(eio_sid, None)
+
+    def disconnect(self, sid, namespace, **kwargs):
+        eio_sid = self.eio_sid_from_sid(sid, namespace)
+        self._snapshots.pop(eio_sid, None)
+        return super().disconnect(sid, namespace, **kwargs)
@@ -0,0 +1,82 @@
+"""Per-client MessagePack encoding for server-sent Socket.IO events.
+
+python-socketio picks one serializer for the whole server, so instead of
+switching the wire protocol this negotiates at the application level: a
+client that connects with ``auth: {serializer: 'msgpack'}`` joins the
+msgpack room, every other client joins the JSON room. ``broadcast`` emits
+each event once per room; msgpack clients receive the payload as a single
+binary attachment, which notifications.js decodes. Each encoding happens
+once per broadcast, not once per client.
+
+Logged-in connections also join their hospital's room for the same
+serializer, ``hospital:<id>:json`` or ``hospital:<id>:msgpack``;
+``send_to_hospital`` reaches only those, the way ``broadcast`` reaches all.
+Anything carrying patient details goes to the hospitals involved, never to
+everyone.
+
+Without the ``msgpack`` package, or with SOCKETIO_MSGPACK off, everyone gets
+JSON. scripts/socket_payload_benchmark.py compares the two encodings.
+"""
+from flask import current_app
+from flask_socketio import join_room
+
+from app import socketio
+from app.metrics import registry
+
+try:
+    import msgpack
+except ImportError:  # every client is served JSON
+    msgpack = None
+
+JSON_ROOM = 'codec:json'
+MSGPACK_ROOM = 'codec:msgpack'
+
+socket_connections = registry.counter(
+    'icuconnect_socket_connections_total', 'Socket.IO connections by negotiated serializer',
+    labels=('serializer',))
+
+
+def msgpack_enabled():
+    return msgpack is not None and current_app.config.get('SOCKETIO_MSGPACK', True)
+
+
+def hospital_room(hospital_id, serializer):
+    return f'hospital:{hospital_id}:{serializer}'
+
+
+def negotiate(auth, hospital_id=None):
+    """Join the connecting client to the rooms for the serializer it asked for; returns its name."""
+    requested = auth.get('serializer') if isinstance(auth, dict) else None
+    serializer = 'msgpack' if requested == 'msgpack' and msgpack_enabled() else 'json'
+    join_room(MSGPACK_ROOM if serializer == 'msgpack' else JSON_ROOM)
+    if hospital_id is not None:
+        join_room(hospital_room(hospital_id, serializer))
+    socket_connections.inc(serializer=serializer)
+    return serializer
+
+
+def encode_msgpack(data):
+    return msgpack.packb(data, use_bin_type=True)
+
+
+def _emit(event, data, json_room, msgpack_room):
+    socketio.emit(event, data, to=json_room)
+    if msgpack_enabled():
+        socketio.emit(event, encode_msgpack(data), to=msgpack_room)
+
+
+def broadcast(event, data):
+    """Send an event to every connected client in the encoding it negotiated."""
+    _emit(event, data, JSON_ROOM, MSGPACK_ROOM)
+
+
+def send_to_hospital(hospital_id, event, data):
+    """Send an event only to hospital_id's connections, each in the encoding it negotiated."""
+    _emit(event, data, hospital_room(hospital_id, 'json'), hospital_room(hospital_id, 'msgpack'))
+
+
+def send_to_hospitals(hospital_ids, event, data):
+    """Send an event to the connections of several hospitals, encoding it once per serializer."""
+    hospital_ids = sorted(set(hospital_ids))
+    _emit(event, data, [hospital_room(hospital_id, 'json') for hospital_id in hospital_ids],
+          [hospital_room(hospital_id, 'msgpack') for hospital_id in hospital_ids])
@@ -0,0 +1,2 @@
+$(document).ready(function(){$('#sidebarCollapse').on('click',function(){$('#sidebar').toggleClass('active');$(this).find('i').toggleClass('fa-chevron-left fa-chevron-right');});function updateTime(){const now=new Date();const options={weekday:'long',year:'numeric',month:'long',day:'numeric',};const dateStr=now.toLocaleDateString('en-US',options);const timeStr=now.toLocaleTimeString('en-US');$('#datetime').text(`${dateStr}, ${timeStr}`);}
+updateTime();setInterval(updateTime,1000);$('#notificationsBtn').on('click',function(){alert('Notifications will appear here');});});
\ No newline at end of file
@@ -164,8 +164,11 @@ function startReferralCountdown(referral) {
 								.then((escalateData) => {
 									console.log('Escalation response:', escalateData);
 									if (escalateData.success) {
+										// A multicast offer other hospitals still hold is not escalated
 										showAlert(
-											`Referral escalated to ${escalateData.target_hospital}`,
+											escalateData.new_referral_id
+												? `Referral escalated to ${escalateData.target_hospital}`
+												: escalateData.message,
 											'info'
 										);
 									} else {
@@ -526,12 +529,82 @@ function showAlert(message, type) {
 }
 
 // --- SOCKET.IO REAL-TIME REFERRALS ---
-window.socket = io();
+// Ask for MessagePack when the decoder loaded; the server falls back to JSON otherwise
+const msgpackDecoder = window.MessagePack;
+window.socket = io({ auth: msgpackDecoder ? { serializer: 'msgpack' } : {} });
 const socket = window.socket;
+
+// Events meant for one hospital carry replay = {hospital_id, epoch, seq}. The last one
+// this hospital saw is kept for the browser session, so a reconnect (or the next page)
+// asks the server for just the events it missed.
+const REPLAY_KEY = 'icuconnect.replay';
+const broadcastHandlers = {};
+
+function lastSeenReplay() {
+	return JSON.parse(sessionStorage.getItem(REPLAY_KEY) || 'null');
+}
+
+function rememberReplay(epoch, seq) {
+	const last = lastSeenReplay();
+	if (!last || last.epoch !== epoch || seq > last.seq) {
+		sessionStorage.setItem(REPLAY_KEY, JSON.stringify({ epoch: epoch, seq: seq }));
+	}
+}
+
+function deliverBroadcast(event, data) {
+	const replay = data && data.replay;
+	const ours = replay && window.currentHospitalId && replay.hospital_id == window.currentHospitalId;
+	if (ours) {
+		const last = lastSeenReplay();
+		if (last && last.epoch === replay.epoch && replay.seq <= last.seq) {
+			return; // already delivered live or by an earlier replay
+		}
+		rememberReplay(replay.epoch, replay.seq);
+	}
+	broadcastHandlers[event](data);
+}
+
+// Server broadcasts arrive as one binary MessagePack attachment or as plain JSON
+function onBroadcast(event, handler) {
+	broadcastHandlers[event] = handler;
+	socket.on(event, function (data) {
+		if (msgpackDecoder && (data instanceof ArrayBuffer || ArrayBuffer.isView(data))) {
+			data = msgpackDecoder.decode(data);
+		}
+		deliverBroadcast(event, data);
+	});
+}
+
+function requestReplay() {
+	if (!window.currentHospitalId) {
+		return;
+	}
+	socket.emit('replay', lastSeenReplay() || {}, function (reply) {
+		if (!reply) {
+			return;
+		}
+		if (reply.snapshot) {
+			// The gap is older than the server's buffer: load what is still pending once
+			fetch('/referrals/api/pending-referrals')
+				.then((response) => response.json())
+				.then((data) => {
+					if (data.success) {
+						data.referrals.forEach((referral) => broadcastHandlers['new_referral'](referral));
+					}
+				})
+				.catch((error) => console.error('Error loading pending referrals:', error));
+		} else {
+			reply.events.forEach((missed) => deliverBroadcast(missed.event, missed.data));
+		}
+		rememberReplay(reply.epoch, reply.seq);
+	});
+}
+
 socket.on('connect', function () {
 	console.log('Connected to WebSocket server');
+	requestReplay();
 });
-socket.on('new_referral', function (referral) {
+onBroadcast('new_referral', function (referral) {
 	if (
 		window.currentHospitalId &&
 		referral.target_hospital_id == window.currentHospitalId
@@ -561,7 +634,7 @@ socket.on('new_referral', function (referral) {
 });
 
 // Listen for transfer status updates
-socket.on('transfer_status_update', function (transfer) {
+onBroadcast('transfer_status_update', function (transfer) {
 	console.log(
 		'Transfer status update received:',
 		transfer,
@@ -680,7 +753,7 @@ function updateTransferBadge(transferId, newStatus) {
 }
 
 // Listen for referral responses (for the sending hospital)
-socket.on('referral_response', function (response) {
+onBroadcast('referral_response', function (response) {
 	console.log('Referral response received:', response);
 	console.log(
 		'Current hospital ID:',
@@ -733,7 +806,7 @@ socket.on('referral_response', function (response) {
 });
 
 // Listen for referral accepted by us (for the accepting hospital)
-socket.on('referral_accepted_by_us', function (data) {
+onBroadcast('referral_accepted_by_us', function (data) {
 	console.log('Referral accepted by us received:', data);
 	if (window.addNotification) {
 		// This is for the accepting hospital
@@ -757,7 +830,7 @@ socket.on('referral_accepted_by_us', function (data) {
 });
 
 // Listen for referral escalations
-socket.on('referral_escalated', function (escalation) {
+onBroadcast('referral_escalated', function (escalation) {
 	console.log('Referral escalation received:', escalation);
 	if (window.addNotification) {
 		// Show to the requesting hospital (the one that sent the original referral)
@@ -779,16 +852,38 @@ socket.on('referral_escalated', function (escalation) {
 	}
 });
 
-socket.on('bed_stats_update', function (data) {
-	console.log('bed_stats_update received:', data);
-	// Only update cards if this is the current hospital
+// A multicast referral was accepted elsewhere (or lapsed here): take it off this screen
+onBroadcast('referral_withdrawn', function (withdrawal) {
 	if (
-		typeof window.updateBedStatsCards === 'function' &&
-		window.currentHospitalId &&
-		data.hospital_stats &&
-		data.hospital_stats.hospital_id == window.currentHospitalId
+		!window.currentHospitalId ||
+		withdrawal.target_hospital_id != window.currentHospitalId
 	) {
-		window.updateBedStatsCards(data.hospital_stats);
+		return;
+	}
+	if (referralCountdownReferralId == withdrawal.referral_id) {
+		clearInterval(referralCountdownInterval);
+		referralCountdownInterval = null;
+		referralCountdownReferralId = null;
+		stopNotificationSound();
+		closeReferralModal();
+		showAlert(withdrawal.message, 'info');
+	}
+	if (window.addNotification) {
+		window.addNotification('referral', 'Referral Withdrawn', withdrawal.message, {
+			referral_id: withdrawal.referral_id,
+		});
+	}
+});
+
+onBroadcast('bed_stats_update', function (data) {
+	console.log('bed_stats_update received:', data);
+	// One event carries every hospital that changed during the server's coalescing window;
+	// only update cards for the current hospital
+	const stats = [].concat(data.hospital_stats || []).find(
+		(s) => s.hospital_id == window.currentHospitalId
+	);
+	if (typeof window.updateBedStatsCards === 'function' && window.currentHospitalId && stats) {
+		window.updateBedStatsCards(stats);
 	}
 	if (typeof window.updateMapPins === 'function') {
 		window.updateMapPins(data.hospitals);
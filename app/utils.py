@@ -1,16 +1,45 @@
 from datetime import datetime, date
+from functools import lru_cache
+import pandas as pd
 import pytz
-from flask import g
+from flask import g, has_request_context
 from flask_login import current_user
 from flask_mail import Message
 from flask import current_app
 
-def get_local_timezone():
+DEFAULT_TIMEZONE = 'Africa/Kigali'
+
+@lru_cache(maxsize=None)
+def get_timezone(name):
+    """Return the (cached) pytz timezone object for a zone name"""
+    return pytz.timezone(name)
+
+def get_request_hospital():
+    """Get the current user's hospital record, resolved once per request"""
+    if not has_request_context() or not current_user.is_authenticated:
+        return None
+    hospital_id = getattr(current_user, 'hospital_id', None)
+    if not hospital_id:
+        return None
+    # Keyed by hospital id because g outlives the request when an app context is already pushed
+    hospital = g.get('hospital')
+    if hospital is None or hospital.id != hospital_id:
+        from app.hospital_registry import hospital_registry  # Import here to avoid circular import
+        hospital = g.hospital = hospital_registry.get(hospital_id)
+    return hospital
+
+def get_local_timezone(hospital=None):
     """Get the local timezone based on the hospital's location"""
-    if hasattr(g, 'hospital') and g.hospital:
-        return g.hospital.get_timezone()
+    if hospital is None and has_request_context():
+        # The logged-in identity already carries its hospital's timezone
+        zone = getattr(current_user, 'hospital_timezone', None)
+        if zone:
+            return get_timezone(zone)
+        hospital = get_request_hospital()
+    if hospital:
+        return hospital.get_timezone()
     # Fallback to Rwanda timezone if no hospital context
-    return pytz.timezone('Africa/Kigali')
+    return get_timezone(DEFAULT_TIMEZONE)
 
 def to_local_time(utc_time, hospital=None):
     """Convert UTC time to local time"""
@@ -21,7 +50,7 @@ def to_local_time(utc_time, hospital=None):
         utc_time = datetime.combine(utc_time, datetime.min.time())
     if utc_time.tzinfo is None:
         utc_time = pytz.UTC.localize(utc_time)
-    timezone = hospital.get_timezone() if hospital else get_local_timezone()
+    timezone = get_local_timezone(hospital)
     return utc_time.astimezone(timezone)
 
 def to_utc_time(local_time, hospital=None):
@@ -32,13 +61,13 @@ def to_utc_time(local_time, hospital=None):
         # If it's a date object, convert to datetime at midnight local time
         local_time = datetime.combine(local_time, datetime.min.time())
     if local_time.tzinfo is None:
-        timezone = hospital.get_timezone() if hospital else get_local_timezone()
+        timezone = get_local_timezone(hospital)
         local_time = timezone.localize(local_time)
     return local_time.astimezone(pytz.UTC)
 
 def get_current_local_time(hospital=None):
     """Get current time in local timezone"""
-    timezone = hospital.get_timezone() if hospital else get_local_timezone()
+    timezone = get_local_timezone(hospital)
     return datetime.now(timezone)
 
 def get_current_utc_time():
@@ -49,13 +78,43 @@ def local_date_to_utc(local_date, hospital=None):
     """Convert a local date to UTC datetime at midnight"""
     if local_date is None:
         return None
-    timezone = hospital.get_timezone() if hospital else get_local_timezone()
     local_dt = datetime.combine(local_date, datetime.min.time())
     return to_utc_time(local_dt, hospital)
 
+def to_local_times(utc_times, hospital=None):
+    """Convert a sequence of naive UTC datetimes to local time in one vectorized pass.
+
+    None entries stay None. Returns a list of timezone-aware datetimes.
+    """
+    index = pd.DatetimeIndex(pd.to_datetime(list(utc_times)))
+    if index.tz is None:
+        index = index.tz_localize(pytz.UTC)
+    local = index.tz_convert(get_local_timezone(hospital))
+    missing = local.isna()
+    return [None if is_missing else value for value, is_missing in zip(local.to_pydatetime(), missing)]
+
+def to_utc_times(local_times, hospital=None):
+    """Convert a sequence of naive local datetimes to UTC in one vectorized pass.
+
+    None entries stay None. Ambiguous or non-existent local times (DST changes)
+    become None rather than raising.
+    """
+    index = pd.DatetimeIndex(pd.to_datetime(list(local_times)))
+    if index.tz is None:
+        index = index.tz_localize(get_local_timezone(hospital), ambiguous='NaT', nonexistent='NaT')
+    utc = index.tz_convert(pytz.UTC)
+    missing = utc.isna()
+    return [None if is_missing else value for value, is_missing in zip(utc.to_pydatetime(), missing)]
+
+def format_local_times(utc_times, fmt, hospital=None):
+    """Convert naive UTC datetimes to local time and format them with strftime, vectorized"""
+    index = pd.DatetimeIndex(pd.to_datetime(list(utc_times)))
+    if index.tz is None:
+        index = index.tz_localize(pytz.UTC)
+    formatted = index.tz_convert(get_local_timezone(hospital)).strftime(fmt)
+    return [None if value is None or value != value else value for value in formatted]
+
 def send_email(subject, recipients, body, html=None):
-    """Send an email using Flask-Mail."""
-    from app import mail  # Import here to avoid circular import
-    from flask_mail import Message
-    msg = Message(subject, recipients=recipients, body=body, html=html)
-    mail.send(msg) 
\ No newline at end of file
+    """Queue an email for background delivery through the outbox."""
+    from app.email_outbox import enqueue_email  # Import here to avoid circular import
+    return enqueue_email(subject, recipients, body, html=html) 
\ No newline at end of file
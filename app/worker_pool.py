@@ -0,0 +1,70 @@
+"""Bounded worker pools for CPU-bound work.
+
+Forecasting, dataframe resampling and password hashing hold the CPU for long
+stretches; run inline they freeze the eventlet hub and with it every Socket.IO
+delivery. Work submitted here runs on eventlet's native thread pool (tpool)
+while the calling greenlet yields. Concurrency is capped so analytics traffic cannot
+crowd out the rest of the process, callers beyond the queue limit are turned
+away immediately, and every call has a deadline.
+"""
+import eventlet
+from eventlet import tpool
+from eventlet.semaphore import Semaphore
+
+
+class PoolBusy(Exception):
+    """Raised when the pool's queue is full"""
+
+
+class PoolTimeout(Exception):
+    """Raised when a job does not finish within the pool's timeout"""
+
+
+class WorkerPool:
+    """Runs callables on native threads with bounded concurrency and queue depth"""
+
+    def __init__(self, name, max_workers=2, max_queue=8, timeout=30):
+        self.name = name
+        self.max_workers = 0
+        self._slots = Semaphore(0)
+        self._pending = 0
+        self.configure(max_workers=max_workers, max_queue=max_queue, timeout=timeout)
+
+    def configure(self, max_workers=None, max_queue=None, timeout=None):
+        """Change the limits; jobs already running or queued keep their slot and count."""
+        if max_workers is not None:
+            change = max_workers - self.max_workers
+            self.max_workers = max_workers
+            for _ in range(change):
+                self._slots.release()
+            for _ in range(-change):
+                # A slot in use is retired when its job hands it back
+                if not self._slots.acquire(blocking=False):
+                    eventlet.spawn_n(self._slots.acquire)
+        if max_queue is not None:
+            self.max_queue = max_queue
+        if timeout is not None:
+            self.timeout = timeout
+
+    @property
+    def pending(self):
+        """Jobs running or waiting for a worker"""
+        return self._pending
+
+    def run(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) on a worker thread and return its result."""
+        if self._pending >= self.max_workers + self.max_queue:
+            raise PoolBusy(f'{self.name} is busy, please retry shortly')
+        self._pending += 1
+        job = eventlet.spawn(self._execute, fn, args, kwargs)
+        # Timing out only stops the wait; the job keeps its slot until the thread finishes
+        with eventlet.Timeout(self.timeout, PoolTimeout(f'{self.name} timed out')):
+            return job.wait()
+
+    def _execute(self, fn, args, kwargs):
+        try:
+            with self._slots:
+                return tpool.execute(fn, *args, **kwargs)
+        finally:
+            self._pending -= 1
+
@@ -33,4 +33,22 @@ tmp_upload_dir = None
 
 # SSL (not needed for Render)
 keyfile = None
-certfile = None 
\ No newline at end of file
+certfile = None 
+# Forecast artifacts (see app/forecast_artifacts.py): the master writes the
+# memory-mapped dataset once, and every worker loads the model and maps the
+# dataset before serving, so predictions are warm from the first request.
+preload_forecast = os.environ.get("FORECAST_PRELOAD", "true").lower() == "true"
+
+
+def on_starting(server):
+    if preload_forecast:
+        # In a subprocess: importing the app package monkey-patches eventlet, which the master must not do
+        import subprocess
+        import sys
+        subprocess.run([sys.executable, "-m", "app.forecast_artifacts"], check=False)
+
+
+def post_worker_init(worker):
+    if preload_forecast:
+        from app.forecast_artifacts import forecast_artifacts
+        forecast_artifacts.load()
@@ -0,0 +1,51 @@
+"""Add indexes for hot query predicates
+
+Revision ID: 0d37b81a255e
+Revises: 528cf676a470
+Create Date: 2026-10-19 09:12:41.337104
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0d37b81a255e'
+down_revision = '528cf676a470'
+branch_labels = None
+depends_on = None
+
+
+# (index name, table, columns) - kept in sync with __table_args__ in app/models.py
+HOT_INDEXES = [
+    ('idx_admission_hospital_status', 'admissions', ['hospital_id', 'status']),
+    ('idx_admission_hospital_time', 'admissions', ['hospital_id', 'admission_time']),
+    ('idx_bed_hospital_occupied', 'beds', ['hospital_id', 'is_occupied']),
+    ('idx_discharge_hospital_time', 'discharges', ['hospital_id', 'discharge_time']),
+    ('idx_discharge_patient_lookup', 'discharges', ['hospital_id', 'patient_name', 'admission_time']),
+    ('idx_user_verification_token', 'users', ['verification_token']),
+    ('idx_admin_reset_token', 'admins', ['reset_token']),
+]
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+        with op.get_context().autocommit_block():
+            for name, table, columns in HOT_INDEXES:
+                op.create_index(name, table, columns, unique=False,
+                                postgresql_concurrently=True, if_not_exists=True)
+    else:
+        for name, table, columns in HOT_INDEXES:
+            op.create_index(name, table, columns, unique=False)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            for name, table, _ in reversed(HOT_INDEXES):
+                op.drop_index(name, table_name=table,
+                              postgresql_concurrently=True, if_exists=True)
+    else:
+        for name, table, _ in reversed(HOT_INDEXES):
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,35 @@
+"""Add staff presence
+
+Revision ID: 3f8d2e6a1c57
+Revises: 9a4f0c2b6e18
+Create Date: 2026-10-19 16:40:12.208314
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f8d2e6a1c57'
+down_revision = '9a4f0c2b6e18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('staff_presence',
+    sa.Column('worker_id', sa.String(length=64), nullable=False),
+    sa.Column('hospital_id', sa.Integer(), nullable=False),
+    sa.Column('connections', sa.Integer(), nullable=False),
+    sa.Column('heartbeat_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('worker_id', 'hospital_id')
+    )
+    with op.batch_alter_table('staff_presence', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_staff_presence_heartbeat_at'), ['heartbeat_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('staff_presence', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_staff_presence_heartbeat_at'))
+
+    op.drop_table('staff_presence')
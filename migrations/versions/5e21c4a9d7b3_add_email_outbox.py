@@ -0,0 +1,45 @@
+"""Add email outbox
+
+Revision ID: 5e21c4a9d7b3
+Revises: bd8eba7a7fa9
+Create Date: 2026-10-19 12:41:05.118203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e21c4a9d7b3'
+down_revision = 'bd8eba7a7fa9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('email_outbox',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('subject', sa.String(length=255), nullable=False),
+    sa.Column('recipients', sa.Text(), nullable=False),
+    sa.Column('body', sa.Text(), nullable=False),
+    sa.Column('html', sa.Text(), nullable=True),
+    sa.Column('dedupe_key', sa.String(length=64), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('email_outbox', schema=None) as batch_op:
+        batch_op.create_index('idx_email_outbox_status_next', ['status', 'next_attempt_at'], unique=False)
+        batch_op.create_index('idx_email_outbox_dedupe', ['dedupe_key', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('email_outbox', schema=None) as batch_op:
+        batch_op.drop_index('idx_email_outbox_dedupe')
+        batch_op.drop_index('idx_email_outbox_status_next')
+
+    op.drop_table('email_outbox')
@@ -0,0 +1,29 @@
+"""Add cache versions
+
+Revision ID: 9a4f0c2b6e18
+Revises: 5e21c4a9d7b3
+Create Date: 2026-10-19 14:12:47.530961
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4f0c2b6e18'
+down_revision = '5e21c4a9d7b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('cache_versions',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.execute("INSERT INTO cache_versions (name, version) VALUES ('hospitals', 0)")
+
+
+def downgrade():
+    op.drop_table('cache_versions')
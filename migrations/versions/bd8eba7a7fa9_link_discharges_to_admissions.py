@@ -0,0 +1,58 @@
+"""Link discharges to admissions
+
+Revision ID: bd8eba7a7fa9
+Revises: 0d37b81a255e
+Create Date: 2026-10-19 10:03:17.482915
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'bd8eba7a7fa9'
+down_revision = '0d37b81a255e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('discharges', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('admission_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_discharges_admission_id', 'admissions', ['admission_id'], ['id'])
+
+    # Backfill from the admission that matches the denormalized patient fields
+    op.execute("""
+        UPDATE discharges
+        SET admission_id = (
+            SELECT MIN(admissions.id) FROM admissions
+            WHERE admissions.hospital_id = discharges.hospital_id
+              AND admissions.patient_name = discharges.patient_name
+              AND admissions.admission_time = discharges.admission_time
+        )
+        WHERE admission_id IS NULL
+    """)
+
+    # Only the earliest discharge keeps the link if an admission was discharged twice
+    op.execute("""
+        UPDATE discharges
+        SET admission_id = NULL
+        WHERE admission_id IS NOT NULL
+          AND id NOT IN (
+              SELECT keep_id FROM (
+                  SELECT MIN(id) AS keep_id FROM discharges
+                  WHERE admission_id IS NOT NULL
+                  GROUP BY admission_id
+              ) AS first_discharges
+          )
+    """)
+
+    with op.batch_alter_table('discharges', schema=None) as batch_op:
+        batch_op.create_index('idx_discharge_admission', ['admission_id'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('discharges', schema=None) as batch_op:
+        batch_op.drop_index('idx_discharge_admission')
+        batch_op.drop_constraint('fk_discharges_admission_id', type_='foreignkey')
+        batch_op.drop_column('admission_id')
@@ -0,0 +1,28 @@
+"""Add referral offer groups
+
+Revision ID: c42a7d1e9b05
+Revises: 3f8d2e6a1c57
+Create Date: 2026-10-19 18:05:31.774120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c42a7d1e9b05'
+down_revision = '3f8d2e6a1c57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('referral_requests', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('offer_group', sa.String(length=32), nullable=True))
+        batch_op.create_index('idx_referral_offer_group', ['offer_group'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('referral_requests', schema=None) as batch_op:
+        batch_op.drop_index('idx_referral_offer_group')
+        batch_op.drop_column('offer_group')
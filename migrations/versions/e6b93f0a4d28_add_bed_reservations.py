@@ -0,0 +1,33 @@
+"""Add bed reservations
+
+Revision ID: e6b93f0a4d28
+Revises: c42a7d1e9b05
+Create Date: 2026-10-19 19:22:09.416583
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6b93f0a4d28'
+down_revision = 'c42a7d1e9b05'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('beds', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('reserved_until', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('reserved_for_referral_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_beds_reserved_for_referral_id', 'referral_requests',
+                                    ['reserved_for_referral_id'], ['id'])
+        batch_op.create_index('idx_bed_reserved_until', ['reserved_until'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('beds', schema=None) as batch_op:
+        batch_op.drop_index('idx_bed_reserved_until')
+        batch_op.drop_constraint('fk_beds_reserved_for_referral_id', type_='foreignkey')
+        batch_op.drop_column('reserved_for_referral_id')
+        batch_op.drop_column('reserved_until')
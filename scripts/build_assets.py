@@ -0,0 +1,88 @@
+"""Build fingerprinted, bundled and precompressed static assets.
+
+Minifies (with rjsmin/rcssmin when installed) and concatenates the files in
+BUNDLES, minifies every other app/static/js/*.js and css/*.css on its own,
+and writes each result (UTF-8) to app/static/dist/ as ``<name>.<hash>.<ext>`` with
+.gz/.br siblings. dist/manifest.json maps logical names (what templates pass
+to asset_url/asset_urls) to the built files and lists each bundle's sources.
+
+    python scripts/build_assets.py
+
+Rebuild after editing anything under app/static/js or app/static/css.
+"""
+import glob
+import json
+import os
+
+from precompress import content_hash, write_with_variants
+
+try:
+    import rjsmin
+except ImportError:  # assets are still bundled and hashed, just not minified
+    rjsmin = None
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATIC_DIR = os.path.join(ROOT, 'app', 'static')
+OUTPUT_DIR = os.path.join(STATIC_DIR, 'dist')
+
+# Logical bundle name -> sources, in load order
+BUNDLES = {
+    'js/base.bundle.js': ['js/main.js', 'js/notifications.js'],
+}
+PATTERNS = ('js/*.js', 'css/*.css')
+
+
+def read_source(path):
+    """Read a source file as text; some sources were saved as UTF-16 with a BOM."""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    encoding = 'utf-16' if raw[:2] in (b'\xff\xfe', b'\xfe\xff') else 'utf-8-sig'
+    return raw.decode(encoding)
+
+
+def minify(name, source):
+    if name.endswith('.js') and rjsmin is not None:
+        return rjsmin.jsmin(source)
+    if name.endswith('.css') and rcssmin is not None:
+        return rcssmin.cssmin(source)
+    return source
+
+
+def build_one(name, sources):
+    parts = []
+    for source in sources:
+        parts.append(minify(source, read_source(os.path.join(STATIC_DIR, source))))
+    # ';' guards against a file that ends without one
+    data = (';\n' if name.endswith('.js') else '\n').join(parts).encode('utf-8')
+    stem, ext = os.path.splitext(name)
+    built = f'{stem}.{content_hash(data)}{ext}'
+    os.makedirs(os.path.dirname(os.path.join(OUTPUT_DIR, built)), exist_ok=True)
+    write_with_variants(os.path.join(OUTPUT_DIR, built), data)
+    return built, len(data)
+
+
+def build():
+    for stale in glob.glob(os.path.join(OUTPUT_DIR, '**', '*.*'), recursive=True):
+        os.remove(stale)
+    entries = dict(BUNDLES)
+    for pattern in PATTERNS:
+        for path in sorted(glob.glob(os.path.join(STATIC_DIR, pattern))):
+            name = os.path.relpath(path, STATIC_DIR).replace(os.sep, '/')
+            entries.setdefault(name, [name])
+
+    manifest = {'files': {}, 'bundles': BUNDLES}
+    for name, sources in sorted(entries.items()):
+        built, size = build_one(name, sources)
+        manifest['files'][name] = built
+        print(f"{name:<22} {size:>7} bytes -> {built}")
+    with open(os.path.join(OUTPUT_DIR, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+if __name__ == '__main__':
+    build()
@@ -0,0 +1,120 @@
+"""Build simplified, precompressed and content-hashed variants of the map GeoJSON.
+
+For every source file in app/static/data/*.geojson this writes one file per
+resolution tier (Douglas-Peucker simplification at the tier's tolerance,
+coordinates rounded to the tier's precision) to app/static/data/geo/, named
+``<name>.<tier>.<hash>.geojson``, plus ``.gz`` and (if the ``brotli`` package
+is installed) ``.br`` siblings, and a manifest.json the app serves them from.
+
+    python scripts/build_geojson.py
+"""
+import glob
+import json
+import os
+
+import numpy as np
+
+from precompress import content_hash, write_with_variants
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE_DIR = os.path.join(ROOT, 'app', 'static', 'data')
+OUTPUT_DIR = os.path.join(SOURCE_DIR, 'geo')
+
+# tier -> (tolerance in degrees, decimal places); 0.001 degrees is roughly 110 m
+TIERS = {
+    'low': (0.002, 4),
+    'medium': (0.0005, 5),
+    'full': (0.0, 6),
+}
+
+
+def simplify_line(points, tolerance):
+    """Douglas-Peucker: keep the points that deviate more than tolerance from the simplified line."""
+    if tolerance <= 0 or len(points) < 3:
+        return points
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        segment = points[end] - points[start]
+        offsets = points[start + 1:end] - points[start]
+        length = np.hypot(*segment)
+        if length == 0:
+            distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        else:
+            distances = np.abs(segment[0] * offsets[:, 1] - segment[1] * offsets[:, 0]) / length
+        index = int(np.argmax(distances))
+        if distances[index] > tolerance:
+            split = start + 1 + index
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return points[keep]
+
+
+def simplify_ring(ring, tolerance, precision):
+    """Simplify a closed ring; returns None if it collapses below a valid polygon ring."""
+    points = np.asarray(ring, dtype=float)
+    # Split the closed ring at its farthest point so both halves have distinct endpoints
+    far = int(np.argmax(np.hypot(*(points - points[0]).T)))
+    first = simplify_line(points[:far + 1], tolerance)
+    second = simplify_line(points[far:], tolerance)
+    simplified = np.round(np.concatenate([first, second[1:]]), precision)
+    if len(simplified) < 4:
+        return None
+    return simplified.tolist()
+
+
+def simplify_geometry(geometry, tolerance, precision):
+    kind = geometry['type']
+    if kind == 'GeometryCollection':
+        return {'type': kind, 'geometries': [simplify_geometry(g, tolerance, precision) for g in geometry['geometries']]}
+    if kind == 'Feature':
+        return dict(geometry, geometry=simplify_geometry(geometry['geometry'], tolerance, precision))
+    if kind == 'FeatureCollection':
+        return dict(geometry, features=[simplify_geometry(f, tolerance, precision) for f in geometry['features']])
+    if kind == 'Polygon':
+        rings = [simplify_ring(r, tolerance, precision) for r in geometry['coordinates']]
+        return {'type': kind, 'coordinates': [r for r in rings if r is not None] or geometry['coordinates']}
+    if kind == 'MultiPolygon':
+        polygons = []
+        for polygon in geometry['coordinates']:
+            rings = [simplify_ring(r, tolerance, precision) for r in polygon]
+            if rings[0] is not None:
+                polygons.append([r for r in rings if r is not None])
+        return {'type': kind, 'coordinates': polygons or geometry['coordinates']}
+    return geometry
+
+
+def write_variants(name, tier, data):
+    """Write <name>.<tier>.<hash>.geojson with .gz/.br siblings; returns the file name."""
+    filename = f'{name}.{tier}.{content_hash(data)}.geojson'
+    write_with_variants(os.path.join(OUTPUT_DIR, filename), data)
+    return filename
+
+
+def build():
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    for stale in glob.glob(os.path.join(OUTPUT_DIR, '*')):
+        os.remove(stale)
+    manifest = {}
+    for source in sorted(glob.glob(os.path.join(SOURCE_DIR, '*.geojson'))):
+        name = os.path.splitext(os.path.basename(source))[0]
+        with open(source) as f:
+            geometry = json.load(f)
+        manifest[name] = {}
+        for tier, (tolerance, precision) in TIERS.items():
+            simplified = simplify_geometry(geometry, tolerance, precision)
+            data = json.dumps(simplified, separators=(',', ':')).encode('utf-8')
+            manifest[name][tier] = write_variants(name, tier, data)
+            print(f"{name} {tier:<6} {len(data):>7} bytes -> {manifest[name][tier]}")
+    with open(os.path.join(OUTPUT_DIR, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+if __name__ == '__main__':
+    build()
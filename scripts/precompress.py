@@ -0,0 +1,24 @@
+"""Shared helpers for the build scripts: content hashes and .gz/.br siblings."""
+import gzip
+import hashlib
+
+try:
+    import brotli
+except ImportError:  # .br variants are skipped; gzip is always built
+    brotli = None
+
+
+def content_hash(data, length=12):
+    return hashlib.sha256(data).hexdigest()[:length]
+
+
+def write_with_variants(path, data):
+    """Write data to path plus precompressed path.gz and (if brotli is installed) path.br."""
+    with open(path, 'wb') as f:
+        f.write(data)
+    # mtime=0 keeps the gzip output byte-identical between builds
+    with open(path + '.gz', 'wb') as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(data, quality=11))
@@ -0,0 +1,109 @@
+"""Compare JSON and MessagePack Socket.IO frames for the events the server broadcasts.
+
+Builds realistic regional payloads (a bed_stats_update listing every
+hospital in the region, a new_referral and a transfer_status_update) and
+encodes each exactly as a broadcast does: a JSON Socket.IO packet, or a
+packet carrying one MessagePack binary attachment (see app/socket_codec.py).
+Reports bytes on the wire per client and server encode CPU per broadcast.
+
+    python scripts/socket_payload_benchmark.py --hospitals 60 --iterations 2000
+"""
+import argparse
+import random
+import time
+
+import msgpack
+from socketio import packet
+
+REASONS = ('Respiratory failure', 'Septic shock', 'Post-operative monitoring', 'Head injury', 'Severe malaria')
+
+
+def regional_payloads(hospitals, changed):
+    rng = random.Random(42)
+    pins = []
+    for i in range(1, hospitals + 1):
+        beds = rng.randint(4, 40)
+        pins.append({
+            'id': i,
+            'name': f'Kisumu County Referral Hospital {i}',
+            'lat': round(-0.1 + rng.uniform(-0.4, 0.4), 6),
+            'lng': round(34.75 + rng.uniform(-0.4, 0.4), 6),
+            'level': rng.choice(['Level 4', 'Level 5', 'Level 6']),
+            'beds': beds,
+            'available': rng.randint(0, beds),
+        })
+    return {
+        'bed_stats_update': {
+            'hospital_stats': [
+                {'hospital_id': h['id'], 'total_beds': h['beds'], 'available_beds': h['available']}
+                for h in pins[:changed]
+            ],
+            'hospitals': pins,
+        },
+        'new_referral': {
+            'id': 1842,
+            'target_hospital_id': 7,
+            'patient_age': 54,
+            'patient_gender': 'Female',
+            'primary_diagnosis': rng.choice(REASONS),
+            'current_treatment': 'High-flow oxygen, IV fluids, broad-spectrum antibiotics',
+            'reason': 'No ventilator available; patient deteriorating despite treatment',
+            'urgency': 'High',
+            'special_requirements': 'Mechanical ventilation, dialysis',
+            'requesting_hospital': 'Kisumu County Referral Hospital 12',
+            'time_remaining': 300,
+        },
+        'transfer_status_update': {
+            'id': 977,
+            'status': 'In Transit',
+            'from_hospital': 'Kisumu County Referral Hospital 12',
+            'to_hospital': 'Kisumu County Referral Hospital 7',
+            'from_hospital_id': 12,
+            'to_hospital_id': 7,
+            'patient_name': 'Jane Achieng',
+            'patient_age': 54,
+            'patient_gender': 'Female',
+            'admitted_at': '2025-06-14T08:31:02.114512',
+        },
+    }
+
+
+def encode_json(event, data):
+    return [packet.Packet(packet.EVENT, data=[event, data]).encode()]
+
+
+def encode_msgpack(event, data):
+    return packet.Packet(packet.EVENT, data=[event, msgpack.packb(data, use_bin_type=True)]).encode()
+
+
+def wire_size(frames):
+    return sum(len(frame.encode('utf-8') if isinstance(frame, str) else frame) for frame in frames)
+
+
+def encode_time_us(encode, event, data, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        encode(event, data)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hospitals', type=int, default=60, help='hospitals in the region')
+    parser.add_argument('--changed', type=int, default=3, help='hospitals changed per coalesced bed update')
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{args.hospitals} hospitals, {args.iterations} encodes per measurement")
+    print(f"{'event':<24} {'json B':>8} {'msgpack B':>10} {'saved':>7} {'json us':>9} {'msgpack us':>11}")
+    for event, data in regional_payloads(args.hospitals, args.changed).items():
+        json_size = wire_size(encode_json(event, data))
+        msgpack_size = wire_size(encode_msgpack(event, data))
+        json_us = encode_time_us(encode_json, event, data, args.iterations)
+        msgpack_us = encode_time_us(encode_msgpack, event, data, args.iterations)
+        saved = 1 - msgpack_size / json_size
+        print(f"{event:<24} {json_size:>8} {msgpack_size:>10} {saved:>6.0%} {json_us:>9.1f} {msgpack_us:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
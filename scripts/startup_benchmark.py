@@ -0,0 +1,65 @@
+"""Measure application startup: time from `import app` to the first served request.
+
+Each run starts a fresh interpreter (so imports are not cached) that imports
+the app, calls create_app() exactly as run.py does and serves one request
+through the test client. Reports the median of each phase in milliseconds.
+
+    DATABASE_URL=postgresql://... python scripts/startup_benchmark.py --runs 5 --path /auth/login
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+import eventlet
+eventlet.monkey_patch()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+response = app.test_client().get(sys.argv[1])
+served = time.perf_counter()
+print(json.dumps({
+    'status': response.status_code,
+    'import_ms': (imported - start) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (served - created) * 1000,
+    'total_ms': (served - start) * 1000,
+}))
+"""
+
+PHASES = ('import_ms', 'create_app_ms', 'first_request_ms', 'total_ms')
+
+
+def measure_once(path):
+    result = subprocess.run(
+        [sys.executable, '-c', CHILD, path],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    # The app logs to stdout; the timings are the last line
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--path', default='/auth/login')
+    args = parser.parse_args()
+
+    samples = [measure_once(args.path) for _ in range(args.runs)]
+    statuses = {sample['status'] for sample in samples}
+    print(f"{args.runs} runs, GET {args.path} -> {', '.join(map(str, sorted(statuses)))}")
+    for phase in PHASES:
+        values = [sample[phase] for sample in samples]
+        print(f"  {phase:<18} median {statistics.median(values):8.1f}  min {min(values):8.1f}  max {max(values):8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -6,7 +6,8 @@ from app.models import User, Hospital, Bed, ReferralRequest, PatientTransfer, Ad
 from datetime import datetime
 from flask_login import login_user
 import threading
-from sqlalchemy import create_engine
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
 @pytest.fixture
@@ -45,7 +46,8 @@ def client():
         db.create_all()
         
         # Create test hospitals with unique names using timestamp
-        timestamp = int(datetime.utcnow().timestamp())
+        # (millisecond resolution: fast tests can create several clients per second)
+        timestamp = int(datetime.utcnow().timestamp() * 1000) % 10**9
         hospital1 = Hospital(
             name=f'Test Hospital 1_{timestamp}',
             verification_code=f'TESTHOSP1_{timestamp}',
@@ -305,4 +307,26 @@ def thread_safe_session():
         
         return session, engine
     
-    return create_session 
\ No newline at end of file
+    return create_session 
+
+@pytest.fixture
+def query_budget(client):
+    """Assert that the requests made inside the block stay within a SQL query budget."""
+    @contextmanager
+    def budget(max_queries):
+        statements = []
+
+        def count_query(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with client.application.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', count_query)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, 'before_cursor_execute', count_query)
+        assert len(statements) <= max_queries, (
+            f"Expected at most {max_queries} queries, got {len(statements)}:\n" + "\n".join(statements)
+        )
+    return budget
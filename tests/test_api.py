@@ -2,7 +2,7 @@ import pytest
 import json
 import time
 from flask_login import login_user
-from app.models import User, Hospital, ReferralRequest, PatientTransfer
+from app.models import User, Hospital, ReferralRequest, ReferralResponse, PatientTransfer
 from app import db
 
 def login_as_user(client, email, password='testpass123'):
@@ -133,6 +133,466 @@ class TestReferralAPI:
         result = json.loads(response.data)
         assert result['success'] == True
 
+@pytest.mark.integration
+class TestReferralReplay:
+    """Test replay of referral events missed while a client was disconnected."""
+    
+    def test_reconnect_receives_only_missed_events(self):
+        """Test sequence-based replay, withdrawal and the snapshot fallback."""
+        from app.event_replay import ReplayBuffer
+        buffer = ReplayBuffer(size=3)
+        for referral_id in range(1, 6):
+            stamped = buffer.record(7, 'new_referral', {'id': referral_id, 'time_remaining': 300})
+        assert stamped['replay'] == {'hospital_id': 7, 'epoch': buffer.epoch, 'seq': 5}
+        
+        reply = buffer.reply(7, {'epoch': buffer.epoch, 'seq': 3})
+        assert not reply['snapshot'] and reply['seq'] == 5
+        assert [e['data']['id'] for e in reply['events']] == [4, 5]
+        assert 0 < reply['events'][0]['data']['time_remaining'] <= 300
+        
+        buffer.withdraw(7, 'new_referral', id=4)
+        assert [e['data']['id'] for e in buffer.reply(7, {'epoch': buffer.epoch, 'seq': 3})['events']] == [5]
+        assert buffer.reply(7, {'epoch': buffer.epoch, 'seq': 5})['events'] == []
+        assert buffer.reply(8, {})['seq'] == 0
+        # Older than the buffer, or from before a restart: fall back to a snapshot
+        assert buffer.reply(7, {'epoch': buffer.epoch, 'seq': 1})['snapshot']
+        assert buffer.reply(7, {'epoch': 'restarted', 'seq': 4})['snapshot']
+    
+    def test_new_referral_is_buffered_for_target(self, authenticated_client):
+        """Test that initiating a referral makes it replayable for the target hospital."""
+        from app.event_replay import replay_buffer
+        target_hospital_id = authenticated_client.application.config['HOSPITAL2_ID']
+        position = replay_buffer.reply(target_hospital_id, {})
+        
+        response = authenticated_client.post('/referrals/api/initiate-referral', data=json.dumps({
+            'target_hospital_id': target_hospital_id,
+            'patient_age': 60,
+            'patient_gender': 'Female',
+            'reason_for_referral': 'Septic shock',
+            'urgency_level': 'High',
+        }), content_type='application/json')
+        assert response.status_code == 200
+        
+        reply = replay_buffer.reply(target_hospital_id, position)
+        [missed] = reply['events']
+        assert missed['event'] == 'new_referral'
+        assert missed['data']['target_hospital_id'] == target_hospital_id
+        assert missed['data']['replay']['seq'] == position['seq'] + 1 == reply['seq']
+
+
+@pytest.mark.integration
+class TestSocketAuth:
+    """Test Socket.IO connection authentication."""
+    
+    def _socket_request(self, app, eio_sid):
+        from flask import request
+        from engineio.socket import Socket
+        from app import socketio
+        socketio.server.eio.sockets[eio_sid] = Socket(socketio.server.eio, eio_sid)
+        sid = socketio.server.manager.connect(eio_sid, '/')
+        context = app.test_request_context()
+        context.push()
+        request.sid, request.namespace = sid, '/'
+        return context, sid
+    
+    def test_anonymous_connection_is_refused(self, client):
+        """Test that a connection without a login session is rejected."""
+        from app.socket_auth import authenticate_connection
+        context, _ = self._socket_request(client.application, 'eio-anonymous')
+        try:
+            assert authenticate_connection() is None
+        finally:
+            context.pop()
+    
+    def test_identity_is_resolved_once_per_connection(self, client):
+        """Test that the user and hospital are kept on the socket session and hospital room."""
+        from app import socketio
+        from app.models import User
+        from app.socket_auth import authenticate_connection, socket_identity
+        from app.socket_codec import hospital_room, negotiate
+        app = client.application
+        hospital_id = app.config['HOSPITAL1_ID']
+        with app.app_context():
+            user = User.query.filter_by(email=app.config['TEST_EMAIL_PATTERN'].format('1')).first()
+        
+        context, sid = self._socket_request(app, 'eio-user')
+        try:
+            login_user(user)
+            identity = authenticate_connection()
+            negotiate(None, identity['hospital_id'])
+        finally:
+            context.pop()
+        assert identity == {'user_id': user.get_id(), 'name': user.name, 'hospital_id': hospital_id}
+        assert sid in socketio.server.manager.rooms['/'][hospital_room(hospital_id, 'json')]
+        
+        # Later events read the session, not the login state
+        with app.test_request_context():
+            from flask import request
+            request.sid, request.namespace = sid, '/'
+            assert socket_identity() == identity
+    
+    def test_clients_cannot_relay_broadcasts(self, client):
+        """Test that the client-to-everyone relay handlers are gone."""
+        from app import socketio
+        handlers = set(socketio.server.handlers['/'])
+        assert {'connect', 'replay'} <= handlers
+        assert not handlers & {'bed_stats_update', 'new_referral', 'referral_response',
+                               'referral_escalated', 'transfer_status_update'}
+
+
+class TestStaffPresence:
+    """Test the per-hospital presence registry and presence-aware routing."""
+    
+    def test_connections_are_counted_per_hospital(self):
+        """Test connect/disconnect bookkeeping behind is_online."""
+        from app.presence import PresenceRegistry
+        presence = PresenceRegistry(warmup=0)
+        presence.connect('sid-a', 7)
+        presence.connect('sid-b', 7)
+        presence.connect('sid-c', 8)
+        assert presence.online_count(7) == 2 and presence.is_online(8)
+        presence.disconnect('sid-a')
+        presence.disconnect('sid-c')
+        presence.disconnect('sid-unknown')
+        assert presence.online_count(7) == 1 and not presence.is_online(8)
+        assert presence.authoritative()
+        assert not PresenceRegistry(warmup=30).authoritative()
+    
+    def test_heartbeat_shares_counts_between_workers(self, client):
+        """Test that each worker sees the others' connections through staff_presence."""
+        from app.presence import PresenceRegistry
+        first, second = PresenceRegistry(), PresenceRegistry()
+        first.worker_id, second.worker_id = 'worker-1', 'worker-2'
+        first.connect('sid-a', 7)
+        with client.application.app_context():
+            first.heartbeat()
+            second.heartbeat()
+            assert second.online_count(7) == 1 and not first.is_online(8)
+            
+            first.disconnect('sid-a')
+            second.connect('sid-b', 8)
+            first.heartbeat()
+            second.heartbeat()
+            first.heartbeat()
+        assert second.online_count(7) == 0
+        assert first.online_count(8) == 1
+    
+    def test_urgent_referral_skips_unattended_hospital(self, authenticated_client, monkeypatch):
+        """Test that a High urgency referral to a hospital with nobody online escalates at once."""
+        from app.presence import presence
+        app = authenticated_client.application
+        target_hospital_id = app.config['HOSPITAL2_ID']
+        monkeypatch.setattr(presence, 'warmup', 0)
+        # Escalate to the test hospital rather than production's id=11
+        monkeypatch.setitem(app.config, 'TESTING', True)
+        
+        referral_data = {
+            'target_hospital_id': target_hospital_id,
+            'patient_age': 71,
+            'patient_gender': 'Male',
+            'reason_for_referral': 'Cardiogenic shock',
+            'urgency_level': 'High',
+        }
+        response = authenticated_client.post('/referrals/api/initiate-referral',
+                                             data=json.dumps(referral_data),
+                                             content_type='application/json')
+        assert response.status_code == 200
+        result = json.loads(response.data)
+        with app.app_context():
+            original = db.session.get(ReferralRequest, result['escalated_from'])
+            escalated = db.session.get(ReferralRequest, result['referral_id'])
+            assert original.status == 'Escalated'
+            assert escalated.status == 'Pending'
+            assert escalated.target_hospital_id == app.config['HOSPITAL3_ID']
+        
+        # Somebody is connected at the target: the referral goes where it was sent
+        presence.connect('sid-on-duty', target_hospital_id)
+        try:
+            response = authenticated_client.post('/referrals/api/initiate-referral',
+                                                 data=json.dumps(referral_data),
+                                                 content_type='application/json')
+        finally:
+            presence.disconnect('sid-on-duty')
+        result = json.loads(response.data)
+        assert 'escalated_to' not in result
+        with app.app_context():
+            assert db.session.get(ReferralRequest, result['referral_id']).target_hospital_id == target_hospital_id
+
+
+class TestMulticastReferral:
+    """Test referrals offered to several hospitals with first-accept-wins."""
+    
+    def _offer(self, client, **fields):
+        data = {'patient_age': 58, 'patient_gender': 'Female',
+                'reason_for_referral': 'ARDS', 'urgency_level': 'High'}
+        data.update(fields)
+        response = client.post('/referrals/api/initiate-referral', data=json.dumps(data),
+                               content_type='application/json')
+        assert response.status_code == 200
+        return json.loads(response.data)
+    
+    def _respond(self, client, referral_id, response_type='accept'):
+        return client.post('/referrals/api/respond-to-referral', data=json.dumps({
+            'referral_id': referral_id,
+            'response_type': response_type,
+        }), content_type='application/json')
+    
+    def test_first_acceptance_withdraws_siblings(self, authenticated_client):
+        """Test that one acceptance books one bed and retracts the other offers."""
+        from app.event_replay import replay_buffer
+        from app.models import Bed
+        app = authenticated_client.application
+        hospital2_id, hospital3_id = app.config['HOSPITAL2_ID'], app.config['HOSPITAL3_ID']
+        result = self._offer(authenticated_client, target_hospital_ids=[hospital2_id, hospital3_id])
+        with app.app_context():
+            offered = {r.target_hospital_id: r for r in ReferralRequest.query.filter(
+                ReferralRequest.id.in_(result['referral_ids']))}
+            assert set(offered) == {hospital2_id, hospital3_id}
+            assert {r.offer_group for r in offered.values()} == {result['offer_group']}
+            first, second = offered[hospital2_id].id, offered[hospital3_id].id
+        position = replay_buffer.reply(hospital3_id, {})
+        
+        login_as_user(authenticated_client, app.config['TEST_EMAIL_PATTERN'].format('3'))
+        assert self._respond(authenticated_client, first).status_code == 200
+        login_as_user(authenticated_client, app.config['TEST_EMAIL_PATTERN'].format('4'))
+        assert self._respond(authenticated_client, second).status_code == 404
+        
+        with app.app_context():
+            assert db.session.get(ReferralRequest, first).status == 'Accepted'
+            assert db.session.get(ReferralRequest, second).status == 'Withdrawn'
+            assert db.session.get(Bed, app.config['BED2_ID']).reserved_for_referral_id == first
+            assert db.session.get(Bed, app.config['BED3_ID']).reserved_until is None
+        [withdrawal] = replay_buffer.reply(hospital3_id, position)['events']
+        assert withdrawal['event'] == 'referral_withdrawn'
+        assert withdrawal['data']['referral_id'] == second
+    
+    def test_claim_is_compare_and_set(self, authenticated_client):
+        """Test that an acceptance losing the race to the status change gets a conflict."""
+        app = authenticated_client.application
+        hospital2_id, hospital3_id = app.config['HOSPITAL2_ID'], app.config['HOSPITAL3_ID']
+        result = self._offer(authenticated_client, target_hospital_ids=[hospital2_id, hospital3_id])
+        first = result['referral_ids'][0]
+        with app.app_context():
+            target = db.session.get(ReferralRequest, first).target_hospital_id
+        login_as_user(authenticated_client, app.config['TEST_EMAIL_PATTERN'].format(
+            '3' if target == hospital2_id else '4'))
+        
+        # Another acceptance commits between this request's lookup and its claim
+        from sqlalchemy import event
+        from app.models import Bed
+        def sibling_wins(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith('UPDATE referral_requests') and not won:
+                won.append(True)
+                with db.engine.begin() as other:
+                    other.execute(ReferralRequest.__table__.update().where(
+                        ReferralRequest.id == first).values(status='Withdrawn'))
+        won = []
+        event.listen(db.engine, 'before_cursor_execute', sibling_wins)
+        try:
+            response = self._respond(authenticated_client, first)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', sibling_wins)
+        assert response.status_code == 409
+        with app.app_context():
+            assert db.session.get(ReferralRequest, first).status == 'Withdrawn'
+            assert db.session.get(Bed, app.config['BED2_ID']).reserved_until is None
+            assert db.session.get(Bed, app.config['BED3_ID']).reserved_until is None
+    
+    def test_rejection_after_escalation_conflicts(self, authenticated_client, client):
+        """Test that a rejection losing the race to an escalation does not overwrite it."""
+        app = authenticated_client.application
+        referral_id = app.config['REFERRAL_ID']
+        login_as_user(client, app.config['TEST_EMAIL_PATTERN'].format('3'))
+        
+        from sqlalchemy import event
+        def escalation_wins(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith('UPDATE referral_requests') and not won:
+                won.append(True)
+                with db.engine.begin() as other:
+                    other.execute(ReferralRequest.__table__.update().where(
+                        ReferralRequest.id == referral_id).values(status='Escalated'))
+        won = []
+        event.listen(db.engine, 'before_cursor_execute', escalation_wins)
+        try:
+            response = self._respond(client, referral_id, 'reject')
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', escalation_wins)
+        assert response.status_code == 409
+        with app.app_context():
+            assert db.session.get(ReferralRequest, referral_id).status == 'Escalated'
+            assert ReferralResponse.query.filter_by(referral_request_id=referral_id).count() == 0
+    
+    def test_multicast_count_must_be_positive(self, authenticated_client):
+        """Test that a multicast count below one is refused instead of offering to every candidate."""
+        with authenticated_client.application.app_context():
+            referrals_before = ReferralRequest.query.count()
+        for count in (0, -1):
+            response = authenticated_client.post('/referrals/api/initiate-referral', data=json.dumps({
+                'patient_age': 58, 'reason_for_referral': 'ARDS', 'multicast': count
+            }), content_type='application/json')
+            assert response.status_code == 400
+        with authenticated_client.application.app_context():
+            assert ReferralRequest.query.count() == referrals_before
+    
+    def test_escalation_loses_race_to_acceptance(self, authenticated_client, monkeypatch):
+        """Test that a timeout escalation conflicts when an acceptance claims the referral first."""
+        app = authenticated_client.application
+        monkeypatch.setitem(app.config, 'TESTING', True)
+        referral_id = app.config['REFERRAL_ID']
+        with app.app_context():
+            escalated_before = ReferralRequest.query.filter_by(target_hospital_id=app.config['HOSPITAL3_ID']).count()
+        
+        # The target hospital's acceptance commits between the escalation's checks and its claim
+        from sqlalchemy import event
+        def acceptance_wins(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith('UPDATE referral_requests') and not won:
+                won.append(True)
+                with db.engine.begin() as other:
+                    other.execute(ReferralRequest.__table__.update().where(
+                        ReferralRequest.id == referral_id).values(status='Accepted'))
+        won = []
+        event.listen(db.engine, 'before_cursor_execute', acceptance_wins)
+        try:
+            response = authenticated_client.post(f'/referrals/api/escalate-referral/{referral_id}')
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', acceptance_wins)
+        assert response.status_code == 409
+        with app.app_context():
+            referral = db.session.get(ReferralRequest, referral_id)
+            assert referral.status == 'Accepted' and referral.escalated_at is None
+            assert ReferralRequest.query.filter_by(
+                target_hospital_id=app.config['HOSPITAL3_ID']).count() == escalated_before
+    
+    def test_lapse_after_sibling_accepted_does_not_escalate(self, authenticated_client, monkeypatch):
+        """Test that a copy lapsing once another hospital accepted is withdrawn, not escalated."""
+        app = authenticated_client.application
+        monkeypatch.setitem(app.config, 'TESTING', True)
+        result = self._offer(authenticated_client, target_hospital_ids=[
+            app.config['HOSPITAL2_ID'], app.config['HOSPITAL3_ID']])
+        lapsed, accepted = result['referral_ids']
+        with app.app_context():
+            db.session.get(ReferralRequest, accepted).status = 'Accepted'
+            db.session.commit()
+        response = authenticated_client.post(f'/referrals/api/escalate-referral/{lapsed}')
+        assert response.status_code == 200
+        assert json.loads(response.data)['new_referral_id'] is None
+        with app.app_context():
+            assert db.session.get(ReferralRequest, lapsed).status == 'Withdrawn'
+            assert ReferralRequest.query.filter_by(offer_group=result['offer_group']).count() == 2
+    
+    def test_patient_events_reach_only_involved_hospitals(self, authenticated_client, client, monkeypatch):
+        """Test that acceptance and escalation events go to the hospitals involved, not to everyone."""
+        from app import socket_codec
+        sent = []
+        monkeypatch.setattr(socket_codec.socketio, 'emit', lambda event, data, to: sent.append((event, to)))
+        app = authenticated_client.application
+        monkeypatch.setitem(app.config, 'TESTING', True)
+        hospital1_id, hospital2_id = app.config['HOSPITAL1_ID'], app.config['HOSPITAL2_ID']
+        result = self._offer(authenticated_client, target_hospital_id=hospital2_id, urgency_level='Medium')
+        response = authenticated_client.post(f"/referrals/api/escalate-referral/{result['referral_id']}")
+        assert response.status_code == 200
+        login_as_user(client, app.config['TEST_EMAIL_PATTERN'].format('3'))
+        assert self._respond(client, app.config['REFERRAL_ID']).status_code == 200
+        
+        rooms = {}
+        for event, to in sent:
+            rooms.setdefault(event, set()).update([to] if isinstance(to, str) else to)
+        assert rooms['transfer_status_update'] == {f'hospital:{hospital1_id}:json', f'hospital:{hospital1_id}:msgpack',
+                                                   f'hospital:{hospital2_id}:json', f'hospital:{hospital2_id}:msgpack'}
+        assert rooms['referral_accepted_by_us'] == {f'hospital:{hospital2_id}:json', f'hospital:{hospital2_id}:msgpack'}
+        assert rooms['referral_escalated'] == {f'hospital:{hospital1_id}:json', f'hospital:{hospital1_id}:msgpack'}
+    
+    def test_ranked_multicast_and_lapsed_sibling(self, authenticated_client):
+        """Test server-side ranking and that one timeout does not escalate a live offer."""
+        from app.presence import presence
+        app = authenticated_client.application
+        hospital2_id, hospital3_id = app.config['HOSPITAL2_ID'], app.config['HOSPITAL3_ID']
+        presence.connect('sid-hospital3', hospital3_id)
+        try:
+            [referral_id] = self._offer(authenticated_client, multicast=1)['referral_ids']
+        finally:
+            presence.disconnect('sid-hospital3')
+        with app.app_context():
+            assert db.session.get(ReferralRequest, referral_id).target_hospital_id == hospital3_id
+        
+        result = self._offer(authenticated_client, target_hospital_ids=[hospital2_id, hospital3_id])
+        lapsed, live = result['referral_ids']
+        response = authenticated_client.post(f'/referrals/api/escalate-referral/{lapsed}')
+        assert response.status_code == 200
+        assert json.loads(response.data)['new_referral_id'] is None
+        with app.app_context():
+            assert db.session.get(ReferralRequest, lapsed).status == 'Withdrawn'
+            assert db.session.get(ReferralRequest, live).status == 'Pending'
+
+
+class TestBedReservations:
+    """Test timed bed holds for accepted referrals."""
+    
+    def test_acceptance_holds_bed_until_admission(self, authenticated_client, client):
+        """Test that an accepted referral reserves a bed and admission occupies it."""
+        from app.bed_reservations import bed_counts
+        from app.models import Bed
+        app = authenticated_client.application
+        hospital2_id = app.config['HOSPITAL2_ID']
+        referral_id = app.config['REFERRAL_ID']
+        login_as_user(client, app.config['TEST_EMAIL_PATTERN'].format('3'))
+        response = client.post('/referrals/api/respond-to-referral', data=json.dumps({
+            'referral_id': referral_id, 'response_type': 'accept', 'patient_name': 'Mary Atieno'
+        }), content_type='application/json')
+        assert response.status_code == 200
+        
+        with app.app_context():
+            bed = db.session.get(Bed, app.config['BED2_ID'])
+            assert not bed.is_occupied and bed.is_reserved
+            assert bed.reserved_for_referral_id == referral_id
+            assert bed_counts([hospital2_id])[hospital2_id] == {'total': 1, 'available': 0, 'reserved': 1}
+            assert db.session.get(Hospital, hospital2_id).available_beds == 0
+            transfer = PatientTransfer.query.filter_by(referral_request_id=referral_id).one()
+        
+        transfer_response = client.get(f'/transfers/api/transfer/{transfer.id}')
+        reserved_bed_number = json.loads(transfer_response.data)['transfer']['reserved_bed_number']
+        assert reserved_bed_number == bed.bed_number
+        assert json.loads(client.get('/admissions/api/available-beds').data)['count'] == 0
+        
+        response = client.post('/admissions/api/admit', json={
+            'patient_name': 'Mary Atieno', 'bed_number': reserved_bed_number,
+            'reserved_bed_number': reserved_bed_number, 'doctor': 'Dr. Alice Brown',
+            'reason': 'Transfer', 'priority': 'High', 'age': 45, 'gender': 'Female'
+        })
+        assert response.status_code == 200
+        with app.app_context():
+            bed = db.session.get(Bed, app.config['BED2_ID'])
+            assert bed.is_occupied and bed.reserved_until is None
+            assert bed_counts([hospital2_id])[hospital2_id] == {'total': 1, 'available': 0, 'reserved': 0}
+    
+    def test_expired_holds_are_released_in_bulk(self, client):
+        """Test that an expired hold frees capacity at once and the sweep clears it."""
+        from datetime import datetime, timedelta
+        from app.bed_reservations import bed_counts, release_expired, reserve_bed
+        from app.cache_versions import version_tracker
+        from app.models import Bed
+        app = client.application
+        hospital2_id, hospital3_id = app.config['HOSPITAL2_ID'], app.config['HOSPITAL3_ID']
+        referral_id = app.config['REFERRAL_ID']
+        with app.app_context():
+            long_ago = datetime.utcnow() - timedelta(hours=3)
+            assert reserve_bed(hospital2_id, referral_id, ttl=3600, now=long_ago)
+            assert reserve_bed(hospital3_id, referral_id, ttl=3600)
+            db.session.commit()
+            assert reserve_bed(hospital2_id, referral_id, ttl=3600) is not None  # expired hold is free again
+            db.session.rollback()
+            assert bed_counts([hospital2_id])[hospital2_id]['available'] == 1
+            assert db.session.get(Hospital, hospital2_id).available_beds == 1
+            assert db.session.get(Hospital, hospital3_id).available_beds == 0
+            
+            before = version_tracker.get(f'beds:{hospital2_id}')
+            assert hospital2_id in release_expired()
+            assert version_tracker.get(f'beds:{hospital2_id}')[0] == before[0] + 1
+            assert db.session.get(Bed, app.config['BED2_ID']).reserved_until is None
+            assert db.session.get(Bed, app.config['BED3_ID']).is_reserved
+            assert hospital3_id not in release_expired()
+
+
 @pytest.mark.integration
 class TestTransferAPI:
     """Test transfer API endpoints."""
@@ -248,6 +708,45 @@ class TestAdmissionAPI:
         # Accept either 'beds' or 'availableBeds' for compatibility
         assert 'availableBeds' in result or 'beds' in result
 
+@pytest.mark.integration
+class TestDischargeAPI:
+    """Test discharge API endpoints."""
+    
+    def test_discharge_links_admission(self, authenticated_client):
+        """Test that a discharge record points back at its admission."""
+        from app.models import Admission, Discharge
+        data = {
+            'patient_name': 'Discharge Patient',
+            'bed_number': 4,
+            'doctor': 'Dr. Test',
+            'reason': 'Test admission',
+            'age': 50,
+            'gender': 'Female',
+            'priority': 'Low'
+        }
+        response = authenticated_client.post('/admissions/api/admit',
+                             data=json.dumps(data),
+                             content_type='application/json')
+        assert response.status_code == 200
+        with authenticated_client.application.app_context():
+            hospital1_id = authenticated_client.application.config['HOSPITAL1_ID']
+            admission = Admission.query.filter_by(hospital_id=hospital1_id, status='Active').first()
+            admission_id = admission.id
+        response = authenticated_client.post('/discharges/api/discharge',
+                             data=json.dumps({'patient_id': admission_id, 'discharge_type': 'Recovered'}),
+                             content_type='application/json')
+        assert response.status_code == 200
+        with authenticated_client.application.app_context():
+            discharge = Discharge.query.filter_by(admission_id=admission_id).one()
+            assert discharge.admission.id == admission_id
+            assert discharge.admission.discharge.id == discharge.id
+        # A second discharge of the same admission is rejected
+        response = authenticated_client.post('/discharges/api/discharge',
+                             data=json.dumps({'patient_id': admission_id, 'discharge_type': 'Recovered'}),
+                             content_type='application/json')
+        assert response.status_code in (400, 404)
+        assert json.loads(response.data)['success'] == False
+
 @pytest.mark.integration
 class TestUserSettingsAPI:
     """Test user settings API endpoints."""
@@ -275,6 +774,445 @@ class TestUserSettingsAPI:
         result = json.loads(response.data)
         assert result['success'] == True
 
+@pytest.mark.integration
+class TestQueryBudgets:
+    """Referral and transfer list endpoints must not issue one query per row."""
+    
+    def _add_referrals(self, app, count):
+        hospital1_id = app.config['HOSPITAL1_ID']
+        with app.app_context():
+            # A distinct sending hospital per row so lazy loading would show up as N+1
+            suffix = int(time.time() * 1000)
+            senders = [Hospital(name=f'Budget Hospital {i}_{suffix}', verification_code=f'BUD{i}_{suffix}', is_test=True)
+                       for i in range(count)]
+            db.session.add_all(senders)
+            db.session.commit()
+            for i, sender in enumerate(senders):
+                db.session.add(ReferralRequest(
+                    requesting_hospital_id=sender.id,
+                    target_hospital_id=hospital1_id,
+                    patient_age=30 + i,
+                    reason_for_referral=f'Budget referral {i}',
+                    urgency_level='Medium',
+                    status='Pending'
+                ))
+                db.session.add(PatientTransfer(
+                    referral_request_id=app.config['REFERRAL_ID'],
+                    from_hospital_id=sender.id,
+                    to_hospital_id=hospital1_id,
+                    patient_name=f'Budget Patient {i}',
+                    status='En Route'
+                ))
+            db.session.commit()
+    
+    def test_pending_referrals_budget(self, authenticated_client, query_budget):
+        self._add_referrals(authenticated_client.application, 10)
+        with query_budget(4):
+            response = authenticated_client.get('/referrals/api/pending-referrals')
+        assert response.status_code == 200
+        assert len(json.loads(response.data)['referrals']) >= 10
+    
+    def test_all_referrals_budget(self, authenticated_client, query_budget):
+        self._add_referrals(authenticated_client.application, 10)
+        with query_budget(4):
+            response = authenticated_client.get('/referrals/api/all-referrals')
+        assert response.status_code == 200
+        assert len(json.loads(response.data)['referrals']) >= 10
+    
+    def test_active_transfers_budget(self, authenticated_client, query_budget):
+        self._add_referrals(authenticated_client.application, 10)
+        with query_budget(3):
+            response = authenticated_client.get('/transfers/api/active-transfers')
+        assert response.status_code == 200
+        assert len(json.loads(response.data)['transfers']) >= 10
+    
+    def test_debug_hospital_settings_budget(self, client, query_budget):
+        with query_budget(3):
+            response = client.get('/referrals/debug/hospital-settings')
+        assert response.status_code == 200
+        assert json.loads(response.data)['hospitals']
+
+@pytest.mark.integration
+class TestIdentityCache:
+    """Test the Flask-Login identity cache."""
+    
+    def _create_user(self, app):
+        unique = int(time.time() * 1000)
+        user = User(hospital_id=app.config['HOSPITAL1_ID'], email=f'identity{unique}@test.com',
+                    employee_id=f'ID{unique}', name='Identity User', role='nurse',
+                    is_approved=True, is_verified=True)
+        user.set_password('testpass123')
+        db.session.add(user)
+        db.session.commit()
+        return user.get_id()
+    
+    def _user_queries(self, statements):
+        return [s for s in statements if 'FROM users' in s]
+    
+    def test_warm_identity_skips_user_lookup(self, client, query_budget):
+        """Test that a cached identity is served without touching the users table."""
+        from app.models import load_user, Admin
+        app = client.application
+        with app.app_context():
+            user_id = self._create_user(app)
+            timezone = Hospital.query.get(app.config['HOSPITAL1_ID']).timezone
+            load_user(user_id)
+        with app.app_context():
+            with query_budget(0) as statements:
+                identity = load_user(user_id)
+            assert identity.get_id() == user_id
+            assert identity.role == 'nurse'
+            assert identity.hospital_id == app.config['HOSPITAL1_ID']
+            assert identity.hospital_timezone == timezone
+            assert isinstance(identity, User)
+            assert not isinstance(identity, Admin)
+            # Fields outside the snapshot fall back to the database row
+            assert identity.hospital.id == app.config['HOSPITAL1_ID']
+    
+    def test_password_change_evicts_identity(self, client, query_budget):
+        """Test that updating the user row forces the next load to hit the database."""
+        from app.models import load_user
+        app = client.application
+        with app.app_context():
+            user_id = self._create_user(app)
+            identity = load_user(user_id)
+            identity.check_password('testpass123')
+            user = db.session.get(User, int(user_id.split('-')[1]))
+            user.set_password('newpass456')
+            db.session.commit()
+        with app.app_context():
+            with query_budget(5) as statements:
+                identity = load_user(user_id)
+            assert len(self._user_queries(statements)) == 1
+            assert identity.check_password('newpass456')
+    
+    def test_removed_user_is_not_loaded(self, client):
+        """Test that a deleted user no longer resolves to an identity."""
+        from app.models import load_user
+        app = client.application
+        with app.app_context():
+            user_id = self._create_user(app)
+            assert load_user(user_id) is not None
+            db.session.delete(db.session.get(User, int(user_id.split('-')[1])))
+            db.session.commit()
+            assert load_user(user_id) is None
+
+@pytest.mark.integration
+class TestConditionalRequests:
+    """Test ETag/304 handling on the polled JSON APIs."""
+    
+    def test_unchanged_beds_answer_304_without_queries(self, authenticated_client, query_budget):
+        """Test that revalidating an unchanged resource skips the view and the database."""
+        from app.cache_versions import version_tracker
+        version_tracker.check_interval = 60
+        first = authenticated_client.get('/admissions/api/available-beds')
+        assert first.status_code == 200
+        etag = first.headers['ETag']
+        assert first.headers['Cache-Control'] == 'private, no-cache'
+        with query_budget(0):
+            second = authenticated_client.get('/admissions/api/available-beds', headers={'If-None-Match': etag})
+        assert second.status_code == 304
+        assert second.headers['ETag'] == etag
+        assert second.data == b''
+    
+    def test_bed_change_invalidates_etag(self, authenticated_client):
+        """Test that adding a bed to the hospital produces a new ETag and body."""
+        from app.cache_versions import version_tracker
+        from app.models import Bed
+        version_tracker.check_interval = 60
+        app = authenticated_client.application
+        first = authenticated_client.get('/admissions/api/available-beds')
+        with app.app_context():
+            bed_number = (db.session.query(db.func.max(Bed.bed_number)).scalar() or 0) + 1000
+            db.session.add(Bed(hospital_id=app.config['HOSPITAL1_ID'], bed_number=bed_number, is_occupied=False))
+            db.session.commit()
+        second = authenticated_client.get('/admissions/api/available-beds',
+                                          headers={'If-None-Match': first.headers['ETag']})
+        assert second.status_code == 200
+        assert second.headers['ETag'] != first.headers['ETag']
+        assert json.loads(second.data)['count'] == json.loads(first.data)['count'] + 1
+    
+    def test_settings_update_invalidates_etag(self, authenticated_client):
+        """Test that saving settings changes the settings ETag."""
+        first = authenticated_client.get('/user/api/settings')
+        assert first.status_code == 200
+        volume = json.loads(first.data)['settings']['audio_volume']
+        authenticated_client.post('/user/api/settings', json={'audio_volume': (volume or 50) // 2 + 1})
+        second = authenticated_client.get('/user/api/settings', headers={'If-None-Match': first.headers['ETag']})
+        assert second.status_code == 200
+        assert second.headers['ETag'] != first.headers['ETag']
+
+@pytest.mark.integration
+class TestGeoJSONAssets:
+    """Test the precompressed, multi-resolution map boundary."""
+    
+    def test_encoding_negotiation(self, client):
+        """Test that the best accepted precompressed variant is served."""
+        import gzip
+        plain = client.get('/user/kisumu-geojson', headers={'Accept-Encoding': 'identity'})
+        assert plain.status_code == 200
+        assert 'Content-Encoding' not in plain.headers
+        assert json.loads(plain.data)['type'] == 'GeometryCollection'
+        
+        gzipped = client.get('/user/kisumu-geojson', headers={'Accept-Encoding': 'gzip'})
+        assert gzipped.headers['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(gzipped.data) == plain.data
+        assert 'Accept-Encoding' in gzipped.headers['Vary']
+        
+        brotli_response = client.get('/user/kisumu-geojson', headers={'Accept-Encoding': 'gzip, br'})
+        assert brotli_response.headers['Content-Encoding'] == 'br'
+        assert len(brotli_response.data) < len(gzipped.data) < len(plain.data)
+    
+    def test_zoom_tiers_and_immutable_urls(self, client):
+        """Test that lower zoom levels get lighter geometry from content-hashed URLs."""
+        app = client.application
+        with app.test_request_context():
+            from app.routes.user_routes import geojson_url
+            low_url, full_url = geojson_url('kisumu', zoom=8), geojson_url('kisumu', zoom=15)
+        low = client.get(low_url, headers={'Accept-Encoding': 'identity'})
+        full = client.get(full_url, headers={'Accept-Encoding': 'identity'})
+        assert low.status_code == full.status_code == 200
+        assert len(low.data) < len(full.data)
+        assert 'immutable' in low.headers['Cache-Control']
+        assert client.get('/user/kisumu-geojson').headers['Cache-Control'] == 'public, no-cache'
+
+@pytest.mark.integration
+class TestStaticAssets:
+    """Test fingerprinted, precompressed static assets."""
+    
+    def test_pages_reference_fingerprinted_assets(self, authenticated_client):
+        """Test that templates emit hashed, immutable asset URLs."""
+        import re
+        html = authenticated_client.get('/admissions/admissions').data.decode()
+        urls = re.findall(r'/static/dist/[\w./-]+', html)
+        assert any(re.search(r'js/base\.bundle\.[0-9a-f]{12}\.js$', url) for url in urls)
+        assert any(re.search(r'css/styles\.[0-9a-f]{12}\.css$', url) for url in urls)
+        assert "js/notifications.js" not in html
+        for url in urls:
+            response = authenticated_client.get(url, headers={'Accept-Encoding': 'br, gzip'})
+            assert response.status_code == 200
+            assert response.headers['Content-Encoding'] == 'br'
+            assert response.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+    
+    def test_source_mode_serves_bundle_sources(self, client):
+        """Test that ASSETS_USE_SOURCES expands bundles to their original files."""
+        from app.assets import asset_urls
+        app = client.application
+        app.config['ASSETS_USE_SOURCES'] = True
+        try:
+            with app.test_request_context():
+                assert asset_urls('js/base.bundle.js') == ['/static/js/main.js', '/static/js/notifications.js']
+        finally:
+            app.config.pop('ASSETS_USE_SOURCES')
+
+@pytest.mark.integration
+class TestHospitalRegistry:
+    """Test the in-memory hospital metadata registry."""
+    
+    def test_warm_lookup_skips_database(self, client, query_budget):
+        """Test that a warm registry serves records without queries."""
+        from app.hospital_registry import hospital_registry
+        app = client.application
+        with app.app_context():
+            hospital_registry.check_interval = 60
+            hospital_registry.get(app.config['HOSPITAL1_ID'])
+            with query_budget(0):
+                record = hospital_registry.get(app.config['HOSPITAL1_ID'])
+                names = [h.name for h in hospital_registry.all(include_test=False)]
+            assert record.name in names or record.is_test
+            with pytest.raises(AttributeError):
+                record.name = 'Renamed'
+    
+    def test_update_bumps_version_and_reloads(self, client):
+        """Test that editing a hospital bumps the shared version and refreshes records."""
+        from app.hospital_registry import hospital_registry
+        from app.models import CacheVersion
+        app = client.application
+        with app.app_context():
+            hospital_registry.check_interval = 60
+            hospital_id = app.config['HOSPITAL1_ID']
+            original = hospital_registry.get(hospital_id).notification_duration
+            before = hospital_registry._shared_version()
+            hospital = db.session.get(Hospital, hospital_id)
+            hospital.notification_duration = original + 5
+            db.session.commit()
+            assert db.session.get(CacheVersion, 'hospitals').version == before + 1
+            assert hospital_registry.get(hospital_id).notification_duration == original + 5
+            hospital.notification_duration = original
+            db.session.commit()
+    
+    def test_new_hospital_is_listed(self, client):
+        """Test that a newly added hospital appears without waiting for the check interval."""
+        from app.hospital_registry import hospital_registry
+        app = client.application
+        with app.app_context():
+            hospital_registry.check_interval = 60
+            hospital_registry.all()
+            unique = int(time.time() * 1000)
+            hospital = Hospital(name=f'Registry {unique}', verification_code=f'REG{unique}',
+                                latitude=-1.9, longitude=30.1, level='District', is_test=True)
+            db.session.add(hospital)
+            db.session.commit()
+            assert hospital.id in [h.id for h in hospital_registry.all()]
+            assert hospital.id not in [h.id for h in hospital_registry.all(include_test=False)]
+
+@pytest.mark.integration
+class TestMetricsAPI:
+    """Test the Prometheus metrics endpoint."""
+    
+    def test_metrics_record_endpoint_queries(self, authenticated_client, monkeypatch):
+        """Test that per-endpoint request and query metrics are exported."""
+        from app.metrics import request_query_count
+        before = request_query_count.count(endpoint='referral.pending_referrals')
+        response = authenticated_client.get('/referrals/api/pending-referrals')
+        assert response.status_code == 200
+        assert request_query_count.count(endpoint='referral.pending_referrals') == before + 1
+        
+        assert authenticated_client.get('/metrics').status_code == 401
+        app = authenticated_client.application
+        monkeypatch.setitem(app.config, 'METRICS_TOKEN', 'scrape-secret')
+        assert authenticated_client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+        response = authenticated_client.get('/metrics', headers={'Authorization': 'Bearer scrape-secret'})
+        assert response.status_code == 200
+        assert response.mimetype == 'text/plain'
+        body = response.get_data(as_text=True)
+        assert '# TYPE icuconnect_request_duration_seconds histogram' in body
+        assert 'icuconnect_request_queries_count{endpoint="referral.pending_referrals"}' in body
+        assert 'icuconnect_request_db_seconds_bucket{endpoint="referral.pending_referrals",le="+Inf"}' in body
+    
+    def test_metrics_open_to_admins(self, client):
+        """Test that a logged-in admin can read the metrics without the scrape token."""
+        from app.models import Admin
+        app = client.application
+        with app.app_context():
+            email = Admin.query.filter_by(hospital_id=app.config['HOSPITAL1_ID']).first().email
+        assert client.get('/metrics').status_code == 401
+        login_as_user(client, email)
+        assert client.get('/metrics').status_code == 200
+
+class RecordingTransport:
+    """Stand-in for Flask-Mail that records deliveries instead of talking SMTP."""
+    
+    def __init__(self, fail_on=None, refuse_connect=False):
+        self.connections = 0
+        self.sent = []
+        self.fail_on = fail_on
+        self.refuse_connect = refuse_connect
+    
+    def connect(self):
+        from contextlib import contextmanager
+        
+        @contextmanager
+        def connection():
+            if self.refuse_connect:
+                raise ConnectionRefusedError('SMTP server unavailable')
+            self.connections += 1
+            yield self
+        return connection()
+    
+    def send(self, message):
+        if self.fail_on and self.fail_on in message.recipients:
+            raise RuntimeError(f'Recipient refused: {self.fail_on}')
+        self.sent.append(message)
+
+@pytest.mark.integration
+class TestEmailOutbox:
+    """Test the email outbox and its background dispatcher."""
+    
+    def _dispatcher(self, transport, **kwargs):
+        from app.email_outbox import EmailDispatcher
+        dispatcher = EmailDispatcher(**kwargs)
+        dispatcher.transport = transport
+        return dispatcher
+    
+    def _clear_outbox(self):
+        from app.models import EmailOutbox
+        EmailOutbox.query.delete()
+        db.session.commit()
+    
+    def test_signup_queues_email_without_sending(self, client):
+        """Test that signup only writes to the outbox."""
+        from app.models import EmailOutbox
+        unique = int(time.time() * 1000)
+        with client.application.app_context():
+            self._clear_outbox()
+            hospital = Hospital(name=f'Outbox Hospital {unique}', verification_code=f'OUT{unique}')
+            db.session.add(hospital)
+            db.session.commit()
+            hospital_id = hospital.id
+        
+        response = client.post('/auth/signup', data={
+            'email': f'outbox{unique}@example.com',
+            'password': 'Testpass123!',
+            'name': 'Outbox User',
+            'hospital': hospital_id,
+            'employee_id': f'EMP{unique}'
+        })
+        assert response.status_code == 200
+        with client.application.app_context():
+            queued = EmailOutbox.query.filter_by(status='pending').all()
+            assert any(f'outbox{unique}@example.com' in e.recipients for e in queued)
+    
+    def test_batch_is_sent_over_one_connection(self, client):
+        """Test that a batch of emails shares a single SMTP connection."""
+        from app.email_outbox import enqueue_email
+        from app.models import EmailOutbox
+        transport = RecordingTransport()
+        with client.application.app_context():
+            self._clear_outbox()
+            for i in range(3):
+                enqueue_email(f'Batch {i}', [f'batch{i}@example.com'], 'Hello')
+            assert self._dispatcher(transport).dispatch_batch() == 3
+            assert transport.connections == 1
+            assert len(transport.sent) == 3
+            assert EmailOutbox.query.filter_by(status='sent').count() == 3
+    
+    def test_duplicate_email_is_dropped(self, client):
+        """Test that an identical email queued twice is only stored once."""
+        from app.email_outbox import enqueue_email
+        from app.models import EmailOutbox
+        with client.application.app_context():
+            self._clear_outbox()
+            assert enqueue_email('Approved', ['dup@example.com'], 'Welcome') is not None
+            assert enqueue_email('Approved', ['dup@example.com'], 'Welcome') is None
+            assert EmailOutbox.query.count() == 1
+    
+    def test_failed_delivery_backs_off_then_gives_up(self, client):
+        """Test retry with backoff and the final failed state."""
+        from datetime import datetime
+        from app.email_outbox import enqueue_email
+        transport = RecordingTransport(fail_on='bad@example.com')
+        dispatcher = self._dispatcher(transport, max_attempts=2, backoff=60)
+        with client.application.app_context():
+            self._clear_outbox()
+            good = enqueue_email('Retry', ['good@example.com'], 'Hi')
+            bad = enqueue_email('Retry', ['bad@example.com'], 'Hi')
+            dispatcher.dispatch_batch()
+            assert good.status == 'sent'
+            assert bad.status == 'pending' and bad.attempts == 1
+            assert bad.next_attempt_at > datetime.utcnow()
+            
+            # Not due yet, so nothing is picked up
+            assert dispatcher.dispatch_batch() == 0
+            bad.next_attempt_at = datetime.utcnow()
+            db.session.commit()
+            dispatcher.dispatch_batch()
+            assert bad.status == 'failed' and bad.attempts == 2
+            assert 'Recipient refused' in bad.last_error
+    
+    def test_connection_failure_retries_whole_batch(self, client):
+        """Test that an unreachable server leaves every email queued for retry."""
+        from app.email_outbox import enqueue_email
+        from app.models import EmailOutbox
+        dispatcher = self._dispatcher(RecordingTransport(refuse_connect=True))
+        with client.application.app_context():
+            self._clear_outbox()
+            enqueue_email('Down', ['a@example.com'], 'Hi')
+            enqueue_email('Down', ['b@example.com'], 'Hi')
+            assert dispatcher.dispatch_batch() == 2
+            rows = EmailOutbox.query.all()
+            assert all(e.status == 'pending' and e.attempts == 1 for e in rows)
+
 @pytest.mark.integration
 class TestErrorHandling:
     """Test error handling in API endpoints."""
@@ -94,6 +94,28 @@ class TestUser:
                 user = User.query.first()
             user_id = user.get_id()
             assert user_id.startswith('user-')
+    
+    def test_password_rehash_on_check(self, app):
+        """Test that a hash made with old parameters is upgraded after a successful check."""
+        from app.passwords import configure_password_hashing
+        with app.app_context():
+            user = User(email=f'rehash{TEST_RUN_ID}@test.com', name='Rehash', employee_id=f'RH{TEST_RUN_ID}')
+            app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+            configure_password_hashing(app)
+            try:
+                user.set_password('testpass123')
+                assert user.password_hash.startswith('pbkdf2:sha256:1000$')
+                
+                app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:2000'
+                configure_password_hashing(app)
+                assert user.check_password('wrongpass') == False
+                assert user.password_hash.startswith('pbkdf2:sha256:1000$')
+                assert user.check_password('testpass123') == True
+                assert user.password_hash.startswith('pbkdf2:sha256:2000$')
+                assert user.check_password('testpass123') == True
+            finally:
+                app.config.pop('PASSWORD_HASH_METHOD')
+                configure_password_hashing(app)
 
 @pytest.mark.unit
 class TestUserSettings:
@@ -604,4 +626,43 @@ class TestDischarge:
             db.session.add(discharge)
             db.session.commit()
             
-            assert discharge.notes == 'Patient had excellent recovery with no complications' 
\ No newline at end of file
+            assert discharge.notes == 'Patient had excellent recovery with no complications' 
+
+@pytest.mark.unit
+class TestTimezoneConversion:
+    """Test the cached timezone lookups and batch conversion helpers."""
+    
+    def test_timezone_objects_are_cached(self, client):
+        """Test that hospitals share one cached timezone object per zone."""
+        app = client.application
+        with app.app_context():
+            hospital = db.session.get(Hospital, app.config['HOSPITAL1_ID'])
+            assert hospital.get_timezone() is hospital.get_timezone()
+            assert hospital.get_timezone().zone == hospital.timezone
+    
+    def test_batch_conversion_matches_scalar(self, client):
+        """Test that vectorized conversion gives the same results as the scalar helpers."""
+        from app.utils import to_local_time, to_utc_time, to_local_times, to_utc_times, format_local_times
+        app = client.application
+        with app.app_context():
+            hospital = db.session.get(Hospital, app.config['HOSPITAL1_ID'])
+            values = [datetime(2024, 1, 1, 12, 0), None, datetime(2024, 6, 30, 23, 45)]
+            assert to_local_times(values, hospital) == [to_local_time(v, hospital) for v in values]
+            assert to_utc_times(values, hospital) == [to_utc_time(v, hospital) for v in values]
+            expected = [to_local_time(v, hospital).strftime('%Y-%m-%d %H:%M') if v else None for v in values]
+            assert format_local_times(values, '%Y-%m-%d %H:%M', hospital) == expected
+            assert to_local_times([], hospital) == []
+    
+    def test_request_hospital_context(self, client):
+        """Test that conversions inside a request use the logged-in user's hospital."""
+        from flask_login import login_user
+        from app.utils import get_local_timezone, get_request_hospital
+        app = client.application
+        with app.app_context(), app.test_request_context():
+            user = User.query.filter_by(hospital_id=app.config['HOSPITAL1_ID']).first()
+            hospital = db.session.get(Hospital, app.config['HOSPITAL1_ID'])
+            login_user(user)
+            assert get_local_timezone().zone == hospital.timezone
+            assert get_request_hospital().name == hospital.name
+        with app.app_context(), app.test_request_context():
+            assert get_local_timezone().zone == 'Africa/Kigali'
@@ -612,4 +612,538 @@ class TestStressTesting:
             end_time = time.time()
                 
             # Should complete within 30 seconds
-            assert (end_time - start_time) < 30.0
\ No newline at end of file
+            assert (end_time - start_time) < 30.0
+@pytest.mark.performance
+class TestHubMonitor:
+    """Eventlet hub lag watchdog."""
+    
+    def test_blocking_call_is_detected(self, app, caplog):
+        """A call that holds the hub is counted and its stack is captured."""
+        import eventlet
+        from eventlet import patcher
+        from app.hub_monitor import HubMonitor, hub_blocks
+        real_time = patcher.original('time')
+        monitor = HubMonitor(interval=0.02, threshold=0.1)
+        monitor.start()
+        try:
+            eventlet.sleep(0.1)
+            blocks_before = hub_blocks.value()
+            
+            real_time.sleep(0.4)  # blocks every greenlet, like a sync SMTP call would
+            
+            eventlet.sleep(0.1)
+            assert hub_blocks.value() == blocks_before + 1
+            assert 'test_blocking_call_is_detected' in caplog.text
+            assert max(monitor.samples) >= 0.3
+            percentiles = monitor.percentiles()
+            assert percentiles[0.5] <= percentiles[0.99]
+        finally:
+            monitor.stop()
+
+
+@pytest.mark.performance
+class TestStartup:
+    """Boot only checks the schema revision; setup is the init-db command."""
+    
+    # Added by the migrations after the baseline revision; create_all() databases from before lack them
+    POST_BASELINE_TABLES = {'email_outbox', 'cache_versions', 'staff_presence'}
+    POST_BASELINE_COLUMNS = {('discharges', 'admission_id'), ('referral_requests', 'offer_group'),
+                             ('beds', 'reserved_until'), ('beds', 'reserved_for_referral_id')}
+    
+    @pytest.fixture
+    def empty_app(self, tmp_path, monkeypatch):
+        """An app on its own empty sqlite database."""
+        from app import create_app
+        monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'init.db'}")
+        return create_app({'TESTING': True})
+    
+    def _baseline_metadata(self):
+        """The models as of the baseline revision, without any of the hot query indexes."""
+        from sqlalchemy import MetaData, Table, UniqueConstraint
+        metadata = MetaData()
+        for table in db.metadata.sorted_tables:
+            if table.name in self.POST_BASELINE_TABLES:
+                continue
+            columns = [column._copy() for column in table.columns
+                       if (table.name, column.name) not in self.POST_BASELINE_COLUMNS]
+            constraints = [UniqueConstraint(*constraint.columns.keys(), name=constraint.name)
+                           for constraint in table.constraints if isinstance(constraint, UniqueConstraint)]
+            Table(table.name, metadata, *columns, *constraints)
+        return metadata
+    
+    def _count_queries(self, app, statements):
+        from sqlalchemy import event
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *args: statements.append(statement))
+    
+    def test_init_db_then_cheap_schema_check(self, empty_app):
+        """init-db builds an empty database at the migration head and the boot check is a single query."""
+        from app.schema import check_schema_version, database_revisions, migration_heads
+        result = empty_app.test_cli_runner().invoke(args=['init-db'])
+        assert result.exception is None, result.output
+        with empty_app.app_context():
+            assert database_revisions() == migration_heads(empty_app)
+            assert Hospital.query.filter_by(name='System Hospital').first() is not None
+            statements = []
+            self._count_queries(empty_app, statements)
+            assert check_schema_version(empty_app)
+            assert len(statements) == 1
+    
+    def test_init_db_upgrades_unstamped_baseline_database(self, empty_app):
+        """A create_all() database from before migrations were tracked is stamped at the baseline and upgraded."""
+        from sqlalchemy import inspect
+        from app.schema import check_schema_version, database_revisions, migration_heads
+        with empty_app.app_context():
+            self._baseline_metadata().create_all(db.engine)
+            db.engine.dispose()
+        result = empty_app.test_cli_runner().invoke(args=['init-db'])
+        assert result.exception is None, result.output
+        with empty_app.app_context():
+            assert database_revisions() == migration_heads(empty_app)
+            inspector = inspect(db.engine)
+            assert self.POST_BASELINE_TABLES <= set(inspector.get_table_names())
+            for table, column in self.POST_BASELINE_COLUMNS:
+                assert column in {c['name'] for c in inspector.get_columns(table)}
+            assert 'idx_bed_reserved_until' in {index['name'] for index in inspector.get_indexes('beds')}
+            assert check_schema_version(empty_app)
+    
+    def test_outdated_schema_is_reported(self, client, monkeypatch):
+        """A database without the migration head is reported instead of being changed at boot."""
+        from app.schema import check_schema_version
+        app = client.application
+        warnings = []
+        monkeypatch.setattr(app.logger, 'warning', warnings.append)
+        with app.app_context():
+            assert not check_schema_version(app)
+        assert 'flask init-db' in warnings[0]
+
+
+@pytest.mark.performance
+class TestForecastArtifacts:
+    """Forecast model and dataset shared through memory-mapped files."""
+    
+    def test_dataset_is_memory_mapped_read_only(self, tmp_path):
+        """The occupancy series is backed by read-only mapped arrays with the workbook's data."""
+        import numpy as np
+        import pandas as pd
+        from app.forecast_artifacts import ForecastArtifacts, DATASET_PATH
+        artifacts = ForecastArtifacts(cache_dir=str(tmp_path)).load()
+        assert artifacts.loaded
+        occupancy = artifacts.get_occupancy()
+        assert isinstance(occupancy.values.base, np.memmap)
+        assert not occupancy.values.flags.writeable
+        df = pd.read_excel(DATASET_PATH)
+        assert occupancy.sum() == df['total_ped_icu_patients'].sum()
+        # A second process maps the existing files instead of re-parsing the workbook
+        mtime = (tmp_path / 'occupancy.npy').stat().st_mtime
+        assert ForecastArtifacts(cache_dir=str(tmp_path)).get_occupancy().equals(occupancy)
+        assert (tmp_path / 'occupancy.npy').stat().st_mtime == mtime
+    
+    def test_trend_served_from_preloaded_artifacts(self, client):
+        """Prediction endpoints work from the preloaded artifacts."""
+        from app.forecast_artifacts import forecast_artifacts
+        forecast_artifacts.load()
+        response = client.get(f"/api/icu_trend?hospital_id={client.application.config['HOSPITAL1_ID']}")
+        assert response.status_code == 200
+        weeks = response.get_json()['weekly_occupancy']
+        assert len(weeks) == 5 and weeks[-1]['predicted']
+
+
+@pytest.mark.performance
+class TestSingleFlight:
+    """Identical concurrent computations run once and share the result."""
+    
+    def test_concurrent_duplicates_share_one_call(self):
+        """Ten concurrent callers trigger one computation; later callers hit the TTL cache."""
+        import eventlet
+        from app.single_flight import SingleFlight, flight_requests
+        flight = SingleFlight('test-coalesce', ttl=60)
+        calls = []
+        
+        def compute():
+            calls.append(1)
+            eventlet.sleep(0.1)
+            return 42
+        
+        pool = eventlet.GreenPool()
+        results = list(pool.imap(lambda _: flight.do(('trend', 1), compute), range(10)))
+        assert results == [42] * 10
+        assert len(calls) == 1
+        assert flight_requests.value(name='test-coalesce', outcome='miss') == 1
+        assert flight_requests.value(name='test-coalesce', outcome='coalesced') == 9
+        
+        assert flight.do(('trend', 1), compute) == 42
+        assert flight_requests.value(name='test-coalesce', outcome='hit') == 1
+        assert flight.do(('trend', 2), compute) == 42
+        assert len(calls) == 2
+    
+    def test_errors_reach_every_waiter_and_are_not_cached(self):
+        """A failure is raised to all waiters and the next call retries."""
+        import eventlet
+        from app.single_flight import SingleFlight
+        flight = SingleFlight('test-errors', ttl=60)
+        calls = []
+        
+        def fail():
+            calls.append(1)
+            eventlet.sleep(0.05)
+            raise ValueError('model unavailable')
+        
+        def attempt(_):
+            try:
+                flight.do('key', fail)
+            except ValueError as e:
+                return str(e)
+        
+        results = list(eventlet.GreenPool().imap(attempt, range(5)))
+        assert results == ['model unavailable'] * 5
+        assert len(calls) == 1
+        assert attempt(None) == 'model unavailable'
+        assert len(calls) == 2
+    
+    def test_endpoint_served_from_cache(self, client, query_budget):
+        """A repeated dashboard request within the TTL is answered without touching the database."""
+        from app.routes.prediction_routes import prediction_flight
+        prediction_flight.clear()
+        url = f"/api/current_occupancy?hospital_id={client.application.config['HOSPITAL1_ID']}"
+        first = client.get(url)
+        assert first.status_code == 200
+        with query_budget(0):
+            second = client.get(url)
+        assert second.status_code == 200
+        assert second.get_json() == first.get_json()
+        prediction_flight.clear()
+
+
+@pytest.mark.performance
+class TestBedUpdateCoalescing:
+    """Bursts of bed changes go out as one bed_stats_update broadcast."""
+    
+    def _coalescer(self, client, **kwargs):
+        from app.bed_updates import BedUpdateCoalescer
+        events = []
+        coalescer = BedUpdateCoalescer(emit=lambda event, payload: events.append((time.monotonic(), payload)), **kwargs)
+        coalescer._app = client.application
+        return coalescer, events
+    
+    def test_burst_is_merged_per_hospital(self, client):
+        """Twenty updates across two hospitals inside the window produce one event."""
+        import eventlet
+        from app.bed_updates import bed_update_events
+        app = client.application
+        hospital_ids = [app.config['HOSPITAL1_ID'], app.config['HOSPITAL2_ID']]
+        coalescer, events = self._coalescer(client, window=0.05, max_latency=1)
+        merged = bed_update_events.value(outcome='merged')
+        emitted = bed_update_events.value(outcome='emitted')
+        
+        for i in range(20):
+            coalescer.publish(hospital_ids[i % 2])
+        assert events == []
+        eventlet.sleep(0.2)
+        
+        assert len(events) == 1
+        payload = events[0][1]
+        assert [s['hospital_id'] for s in payload['hospital_stats']] == sorted(hospital_ids)
+        assert {h['id'] for h in payload['hospitals']} >= set(hospital_ids)
+        assert bed_update_events.value(outcome='merged') - merged == 20
+        assert bed_update_events.value(outcome='emitted') - emitted == 1
+    
+    def test_steady_stream_is_flushed_within_max_latency(self, client):
+        """Updates arriving faster than the window still go out every max_latency seconds."""
+        import eventlet
+        coalescer, events = self._coalescer(client, window=0.1, max_latency=0.25)
+        hospital_id = client.application.config['HOSPITAL1_ID']
+        start = time.monotonic()
+        while time.monotonic() - start < 0.6:
+            coalescer.publish(hospital_id)
+            eventlet.sleep(0.02)
+        stopped = time.monotonic()
+        eventlet.sleep(0.2)
+        
+        # The window alone would hold everything until the stream stops
+        assert len(events) >= 2
+        assert events[0][0] < stopped
+    
+    def test_admission_broadcasts_hospital_stats(self, authenticated_client, monkeypatch):
+        """An admission publishes this hospital's new counts (inline with a zero window)."""
+        import json
+        from app.bed_updates import bed_updates
+        events = []
+        monkeypatch.setattr(bed_updates, 'window', 0)
+        monkeypatch.setattr(bed_updates, 'emit', lambda event, payload: events.append((event, payload)))
+        response = authenticated_client.post('/admissions/api/admit', data=json.dumps({
+            'patient_name': 'Burst Patient', 'bed_number': 4, 'doctor': 'Dr. Test',
+            'reason': 'Test', 'age': 30, 'gender': 'Female', 'priority': 'High'
+        }), content_type='application/json')
+        assert response.status_code == 200
+        
+        assert len(events) == 1
+        event, payload = events[0]
+        assert event == 'bed_stats_update'
+        [stats] = payload['hospital_stats']
+        assert stats['hospital_id'] == authenticated_client.application.config['HOSPITAL1_ID']
+        pin = next(h for h in payload['hospitals'] if h['id'] == stats['hospital_id'])
+        assert (pin['beds'], pin['available']) == (stats['total_beds'], stats['available_beds'])
+
+
+@pytest.mark.performance
+class TestSocketCodec:
+    """Clients that negotiate MessagePack get binary broadcasts; everyone else JSON."""
+    
+    def test_negotiation_picks_room(self, client, monkeypatch):
+        """Only an explicit msgpack request (with msgpack enabled) joins the msgpack room."""
+        from app import socket_codec
+        joined = []
+        monkeypatch.setattr(socket_codec, 'join_room', joined.append)
+        app = client.application
+        with app.test_request_context():
+            assert socket_codec.negotiate({'serializer': 'msgpack'}) == 'msgpack'
+            assert socket_codec.negotiate(None) == 'json'
+            assert socket_codec.negotiate('msgpack') == 'json'
+            monkeypatch.setitem(app.config, 'SOCKETIO_MSGPACK', False)
+            assert socket_codec.negotiate({'serializer': 'msgpack'}) == 'json'
+        assert joined == [socket_codec.MSGPACK_ROOM] + [socket_codec.JSON_ROOM] * 3
+    
+    def test_broadcast_encodes_once_per_serializer(self, client, monkeypatch):
+        """A broadcast sends JSON to one room and a smaller MessagePack attachment to the other."""
+        import json
+        import msgpack
+        from app import socket_codec
+        from app.bed_updates import bed_snapshot
+        sent = []
+        monkeypatch.setattr(socket_codec.socketio, 'emit', lambda event, data, to: sent.append((event, data, to)))
+        app = client.application
+        with app.app_context():
+            payload = bed_snapshot({app.config['HOSPITAL1_ID']})
+            socket_codec.broadcast('bed_stats_update', payload)
+        
+        (_, as_json, json_room), (_, as_msgpack, msgpack_room) = sent
+        assert (json_room, msgpack_room) == (socket_codec.JSON_ROOM, socket_codec.MSGPACK_ROOM)
+        assert as_json == payload
+        assert msgpack.unpackb(as_msgpack) == payload
+        assert len(as_msgpack) < len(json.dumps(payload, separators=(',', ':')))
+    
+    def test_hospital_events_reach_only_that_hospital(self, client, monkeypatch):
+        """Referral notifications go to the target hospital's rooms, one per serializer."""
+        from app import socket_codec
+        from app.event_replay import notify_hospital
+        joined, sent = [], []
+        monkeypatch.setattr(socket_codec, 'join_room', joined.append)
+        monkeypatch.setattr(socket_codec.socketio, 'emit', lambda event, data, to: sent.append((event, to)))
+        app = client.application
+        hospital_id = app.config['HOSPITAL2_ID']
+        with app.test_request_context():
+            socket_codec.negotiate({'serializer': 'msgpack'}, hospital_id)
+            notify_hospital(hospital_id, 'new_referral', {'id': 1, 'target_hospital_id': hospital_id})
+        assert joined == [socket_codec.MSGPACK_ROOM, f'hospital:{hospital_id}:msgpack']
+        assert sent == [('new_referral', f'hospital:{hospital_id}:json'),
+                        ('new_referral', f'hospital:{hospital_id}:msgpack')]
+
+
+@pytest.mark.performance
+class TestSocketBackpressure:
+    """Slow clients get bounded queues: snapshots are folded, stalled clients dropped."""
+    
+    def _connect(self, eio_sid):
+        from engineio.socket import Socket
+        from app import socketio
+        socket = Socket(socketio.server.eio, eio_sid)
+        socketio.server.eio.sockets[eio_sid] = socket
+        socketio.server.manager.connect(eio_sid, '/')
+        return socket
+    
+    def test_unsent_snapshot_is_replaced(self, client):
+        """A client that has not polled holds one bed_stats_update, the latest."""
+        from app import socketio
+        from app.socket_backpressure import backpressure_events
+        superseded = backpressure_events.value(action='superseded')
+        slow = self._connect('eio-slow')
+        
+        for i in range(5):
+            socketio.emit('bed_stats_update', {'version': i})
+        socketio.emit('new_referral', {'id': 1})
+        socketio.emit('bed_stats_update', {'version': 5})
+        
+        assert [p.data for p in slow.queue.queue] == [
+            '2["bed_stats_update",{"version":5}]', '2["new_referral",{"id":1}]']
+        assert backpressure_events.value(action='superseded') - superseded == 5
+        
+        slow.poll()
+        socketio.emit('bed_stats_update', {'version': 6})
+        assert [p.data for p in slow.queue.queue] == ['2["bed_stats_update",{"version":6}]']
+    
+    def test_stalled_client_is_disconnected(self, client, monkeypatch):
+        """A client whose queue reaches the limit is dropped; clients that keep up are not."""
+        from app import socketio
+        from app.socket_backpressure import backpressure_events
+        monkeypatch.setattr(socketio.server.manager, 'max_queue', 5)
+        disconnected = backpressure_events.value(action='disconnected')
+        stalled = self._connect('eio-stalled')
+        healthy = self._connect('eio-healthy')
+        
+        for i in range(8):
+            socketio.emit('new_referral', {'id': i})
+            healthy.poll()
+        
+        assert stalled.closed
+        assert 'eio-stalled' not in socketio.server.eio.sockets
+        assert not healthy.closed
+        assert backpressure_events.value(action='disconnected') - disconnected == 1
+
+
+@pytest.mark.performance
+class TestWorkerPool:
+    """Bounded worker pool for CPU-bound work."""
+    
+    def test_job_runs_off_the_hub(self):
+        """A CPU-bound job runs on a worker while other greenlets keep running."""
+        import eventlet
+        from eventlet import patcher
+        from app.worker_pool import WorkerPool
+        real_time = patcher.original('time')
+        pool = WorkerPool('Test pool', max_workers=1, max_queue=0, timeout=5)
+        ticks = []
+        
+        def ticker():
+            for _ in range(5):
+                ticks.append(1)
+                eventlet.sleep(0.02)
+        
+        eventlet.spawn(ticker)
+        assert pool.run(lambda: real_time.sleep(0.3) or 42) == 42
+        assert len(ticks) >= 3
+        assert pool.pending == 0
+    
+    def test_full_queue_is_rejected(self):
+        """Callers beyond workers + queue are turned away immediately."""
+        import eventlet
+        from eventlet import patcher
+        from app.worker_pool import WorkerPool, PoolBusy
+        real_time = patcher.original('time')
+        pool = WorkerPool('Test pool', max_workers=1, max_queue=1, timeout=5)
+        running = [eventlet.spawn(pool.run, real_time.sleep, 0.2) for _ in range(2)]
+        eventlet.sleep(0)
+        with pytest.raises(PoolBusy):
+            pool.run(lambda: None)
+        for job in running:
+            job.wait()
+        assert pool.run(lambda: 'ok') == 'ok'
+    
+    def test_reconfigure_keeps_jobs_in_flight(self):
+        """Changing the limits while jobs run neither loses their count nor their slots."""
+        import eventlet
+        from eventlet import patcher
+        from app.worker_pool import WorkerPool, PoolBusy
+        real_time = patcher.original('time')
+        pool = WorkerPool('Test pool', max_workers=2, max_queue=0, timeout=5)
+        running = [eventlet.spawn(pool.run, real_time.sleep, 0.2) for _ in range(2)]
+        eventlet.sleep(0)
+        pool.configure(max_workers=1)
+        assert pool.pending == 2
+        with pytest.raises(PoolBusy):
+            pool.run(lambda: None)
+        for job in running:
+            job.wait()
+        assert pool.pending == 0
+        assert pool.run(lambda: 'ok') == 'ok'
+        assert pool._slots.balance == 1
+    
+    def test_slow_job_times_out(self):
+        """A job that overruns the deadline raises PoolTimeout."""
+        from eventlet import patcher
+        from app.worker_pool import WorkerPool, PoolTimeout
+        real_time = patcher.original('time')
+        pool = WorkerPool('Test pool', max_workers=1, max_queue=1, timeout=0.1)
+        with pytest.raises(PoolTimeout):
+            pool.run(real_time.sleep, 0.5)
+
+
+@pytest.mark.performance
+class TestLoginThroughput:
+    """Benchmark of concurrent logins with password hashing on the worker pool."""
+    
+    def test_concurrent_logins_keep_hub_responsive(self, app):
+        """Concurrent logins hash off the hub, so other greenlets keep running."""
+        import eventlet
+        from eventlet import patcher
+        real_time = patcher.original('time')
+        test_id = int(real_time.time() * 1000) % 100000
+        logins = 24
+        with app.app_context():
+            hospital = Hospital(name=f'Login Bench {test_id}', verification_code=f'LB{test_id}', is_test=True)
+            db.session.add(hospital)
+            db.session.commit()
+            user = User(
+                hospital_id=hospital.id,
+                email=f'bench{test_id}@test.com',
+                name='Bench User',
+                employee_id=f'LB{test_id}',
+                is_verified=True,
+                is_approved=True
+            )
+            user.set_password('Benchpass123!')
+            db.session.add(user)
+            db.session.commit()
+        
+        gaps = []
+        done = []
+        
+        def ticker():
+            last = real_time.monotonic()
+            while len(done) < logins:
+                eventlet.sleep(0.01)
+                now = real_time.monotonic()
+                gaps.append(now - last)
+                last = now
+        
+        def login():
+            client = app.test_client()
+            response = client.post('/auth/login', data={
+                'email': f'bench{test_id}@test.com',
+                'password': 'Benchpass123!'
+            })
+            done.append(response.status_code)
+        
+        start = real_time.monotonic()
+        watcher = eventlet.spawn(ticker)
+        pool = eventlet.GreenPool(logins)
+        for _ in range(logins):
+            pool.spawn(login)
+        pool.waitall()
+        elapsed = real_time.monotonic() - start
+        watcher.wait()
+        
+        print(f"\n{logins} concurrent logins in {elapsed:.2f}s "
+              f"({logins / elapsed:.1f} logins/s), worst hub gap {max(gaps) * 1000:.0f}ms")
+        assert done == [302] * logins
+        # A single inline scrypt/pbkdf2 hash holds the hub for tens of milliseconds or more
+        assert max(gaps) < 0.5
+    
+    def test_busy_hash_pool_keeps_the_submitted_page(self, client, monkeypatch):
+        """A saturated hash pool answers 503 on the form that was posted, in both blueprints."""
+        from app import passwords
+        from app.models import Admin
+        from app.worker_pool import PoolBusy
+        app = client.application
+        with app.app_context():
+            email = app.config['TEST_EMAIL_PATTERN'].format('1')
+            user = User.query.filter_by(email=email).first()
+            user.verification_token = 'user-reset-token'
+            admin = Admin.query.first()
+            admin.reset_token = 'admin-reset-token'
+            db.session.commit()
+        
+        def busy(*args, **kwargs):
+            raise PoolBusy('Password hashing is busy, please retry shortly')
+        monkeypatch.setattr(passwords.hash_pool, 'run', busy)
+        form = {'password': 'Newpass123!', 'confirm_password': 'Newpass123!'}
+        for url in ('/auth/reset-password/user-reset-token', '/admin/reset-password/admin-reset-token'):
+            response = client.post(url, data=form)
+            assert response.status_code == 503
+            assert b'Password reset is busy' in response.data
+            assert b'New Password' in response.data
+        response = client.post('/auth/login', data={'email': email, 'password': 'Newpass123!'})
+        assert response.status_code == 503
+        assert b'Login is busy' in response.data
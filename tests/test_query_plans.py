@@ -0,0 +1,155 @@
+import pytest
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+from app import db
+from app.models import Bed, Admission, Discharge, User, Admin
+
+
+def explain(query):
+    """Return the SQLite query plan details for a SQLAlchemy query."""
+    compiled = query.statement.compile(dialect=db.engine.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = db.session.connection().exec_driver_sql(
+        'EXPLAIN QUERY PLAN ' + str(compiled), params
+    ).fetchall()
+    return [row[-1] for row in rows]
+
+
+def assert_index_search(plan, table, index_name=None):
+    """Assert the plan looks rows up in `table` through an index instead of a full scan."""
+    searches = [step for step in plan if step.startswith(f'SEARCH {table} ') and 'INDEX' in step]
+    assert searches, f"Expected an index search on {table}, got plan: {plan}"
+    assert not any(step == f'SCAN {table}' for step in plan), f"Full table scan on {table}: {plan}"
+    if index_name:
+        assert any(index_name in step for step in searches), f"Expected {index_name} in plan: {plan}"
+
+
+@pytest.fixture
+def seeded_app(client):
+    """Seed a large dataset so the planner has realistic statistics."""
+    app = client.application
+    with app.app_context():
+        hospital_ids = [app.config['HOSPITAL1_ID'], app.config['HOSPITAL2_ID'], app.config['HOSPITAL3_ID']]
+        base_time = datetime.utcnow() - timedelta(days=365)
+        suffix = uuid.uuid4().hex[:8]
+
+        db.session.execute(insert(Bed), [
+            {'hospital_id': hid, 'bed_number': 100 + n, 'is_occupied': n % 3 == 0}
+            for hid in hospital_ids for n in range(300)
+        ])
+        bed_ids = [bed.id for bed in Bed.query.all()]
+        db.session.execute(insert(Admission), [
+            {
+                'hospital_id': hospital_ids[i % 3],
+                'patient_name': f'Patient {i}',
+                'bed_id': bed_ids[i % len(bed_ids)],
+                'doctor': 'Dr. Test',
+                'reason': 'Load test',
+                'status': 'Active' if i % 10 == 0 else 'Discharged',
+                'admission_time': base_time + timedelta(minutes=i * 7),
+            }
+            for i in range(6000)
+        ])
+        db.session.execute(insert(Discharge), [
+            {
+                'hospital_id': hospital_ids[i % 3],
+                'patient_name': f'Patient {i}',
+                'bed_number': 100 + i % 300,
+                'admission_time': base_time + timedelta(minutes=i * 7),
+                'discharge_time': base_time + timedelta(minutes=i * 7, days=3),
+                'discharging_doctor': 'Dr. Test',
+                'discharge_type': 'Recovered',
+            }
+            for i in range(5000)
+        ])
+        db.session.execute(insert(User), [
+            {
+                'hospital_id': hospital_ids[i % 3],
+                'email': f'seed_user_{i}_{suffix}@test.com',
+                'employee_id': f'SEED{i}',
+                'name': f'Seed User {i}',
+                'is_verified': False,
+                'verification_token': f'token-{i}',
+            }
+            for i in range(1000)
+        ])
+        db.session.execute(insert(Admin), [
+            {
+                'hospital_id': hospital_ids[i % 3],
+                'email': f'seed_admin_{i}_{suffix}@test.com',
+                'reset_token': f'reset-{i}',
+            }
+            for i in range(500)
+        ])
+        db.session.commit()
+        db.session.connection().exec_driver_sql('ANALYZE')
+        yield app
+
+
+@pytest.mark.performance
+class TestHotQueryPlans:
+    """Each hot query in the routes must be served by an index, not a table scan."""
+
+    def test_active_admissions_by_hospital(self, seeded_app):
+        with seeded_app.app_context():
+            hospital_id = seeded_app.config['HOSPITAL1_ID']
+            plan = explain(Admission.query.filter(
+                Admission.hospital_id == hospital_id,
+                Admission.status == 'Active'
+            ))
+            assert_index_search(plan, 'admissions')
+
+    def test_admissions_by_hospital_and_time(self, seeded_app):
+        with seeded_app.app_context():
+            hospital_id = seeded_app.config['HOSPITAL1_ID']
+            week_ago = datetime.utcnow() - timedelta(days=7)
+            plan = explain(Admission.query.filter(
+                Admission.hospital_id == hospital_id,
+                Admission.admission_time >= week_ago
+            ))
+            assert_index_search(plan, 'admissions', 'idx_admission_hospital_time')
+
+    def test_available_beds_by_hospital(self, seeded_app):
+        with seeded_app.app_context():
+            hospital_id = seeded_app.config['HOSPITAL1_ID']
+            plan = explain(Bed.query.filter_by(hospital_id=hospital_id, is_occupied=False))
+            assert_index_search(plan, 'beds')
+
+    def test_expired_reservation_sweep(self, seeded_app):
+        with seeded_app.app_context():
+            plan = explain(Bed.query.filter(Bed.reserved_until <= datetime.utcnow()))
+            assert_index_search(plan, 'beds', 'idx_bed_reserved_until')
+
+    def test_discharge_history_by_hospital(self, seeded_app):
+        with seeded_app.app_context():
+            hospital_id = seeded_app.config['HOSPITAL1_ID']
+            plan = explain(Discharge.query.filter_by(hospital_id=hospital_id)
+                           .order_by(Discharge.discharge_time.desc()))
+            assert_index_search(plan, 'discharges', 'idx_discharge_hospital_time')
+
+    def test_duplicate_discharge_check(self, seeded_app):
+        with seeded_app.app_context():
+            hospital_id = seeded_app.config['HOSPITAL1_ID']
+            plan = explain(Discharge.query.filter_by(admission_id=42))
+            assert_index_search(plan, 'discharges', 'idx_discharge_admission')
+
+    def test_legacy_discharge_patient_lookup(self, seeded_app):
+        with seeded_app.app_context():
+            hospital_id = seeded_app.config['HOSPITAL1_ID']
+            plan = explain(Discharge.query.filter_by(
+                hospital_id=hospital_id,
+                patient_name='Patient 42',
+                admission_time=datetime.utcnow()
+            ))
+            assert_index_search(plan, 'discharges', 'idx_discharge_patient_lookup')
+
+    def test_verification_token_lookup(self, seeded_app):
+        with seeded_app.app_context():
+            plan = explain(User.query.filter_by(verification_token='token-42'))
+            assert_index_search(plan, 'users', 'idx_user_verification_token')
+
+    def test_reset_token_lookup(self, seeded_app):
+        with seeded_app.app_context():
+            plan = explain(Admin.query.filter_by(reset_token='reset-42'))
+            assert_index_search(plan, 'admins', 'idx_admin_reset_token')